@@ -0,0 +1,35 @@
+"""
+授权码批量生成吞吐量基准
+"""
+import secrets
+
+from benchmarks.runner import benchmark
+
+BATCH_SIZE = 10000
+
+
+def _legacy_generate_license_key() -> str:
+    """逐字符调用 secrets.choice 的原始实现，作为对比基线"""
+    characters = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+    return '-'.join(''.join(secrets.choice(characters) for _ in range(4)) for _ in range(4))
+
+
+@benchmark("legacy secrets.choice loop[10k]", group="batch_generate", items=BATCH_SIZE)
+def bench_legacy_batch():
+    def call():
+        keys = set()
+        while len(keys) < BATCH_SIZE:
+            keys.add(_legacy_generate_license_key())
+    return call
+
+
+@benchmark("iter_license_key_chunks[10k]", group="batch_generate", items=BATCH_SIZE)
+def bench_iter_chunks():
+    from utils.license_generator import iter_license_key_chunks
+    return lambda: next(iter_license_key_chunks(BATCH_SIZE, BATCH_SIZE))
+
+
+@benchmark("generate_batch_license_keys[10k]", group="batch_generate", items=BATCH_SIZE)
+def bench_generate_batch():
+    from utils.license_generator import generate_batch_license_keys
+    return lambda: generate_batch_license_keys(BATCH_SIZE)
@@ -0,0 +1,280 @@
+"""
+授权验证热点路径的微基准
+"""
+import os
+import sys
+import time
+import atexit
+import tempfile
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+
+from benchmarks.runner import benchmark
+
+VALID_KEY = "ABCD-EFGH-JKLM-NP23"
+INVALID_KEY = "ABCD-EFGH-JKLM-NP2O"
+
+# 基准创建的临时数据库在进程退出时关闭并删除
+_cleanup = ExitStack()
+atexit.register(_cleanup.close)
+
+
+@benchmark("generate_license_key", group="generator")
+def bench_generate_license_key():
+    from utils.license_generator import generate_license_key
+    return generate_license_key
+
+
+@benchmark("validators.validate_license_key_format", group="validate")
+def bench_validators_format():
+    from utils.validators import validate_license_key_format
+    return lambda: validate_license_key_format(VALID_KEY)
+
+
+@benchmark("license_generator.validate_license_key_format", group="validate")
+def bench_generator_format():
+    from utils.license_generator import validate_license_key_format
+    return lambda: validate_license_key_format(VALID_KEY)
+
+
+@benchmark("license_generator.validate_license_key_format[invalid]", group="validate")
+def bench_generator_format_invalid():
+    from utils.license_generator import validate_license_key_format
+    return lambda: validate_license_key_format(INVALID_KEY)
+
+
+@benchmark("InputSanitizer.validate_license_key_format", group="validate")
+def bench_sanitizer_format():
+    from utils.security import InputSanitizer
+    return lambda: InputSanitizer.validate_license_key_format(VALID_KEY)
+
+
+@benchmark("key_format.is_valid_license_key", group="validate")
+def bench_is_valid():
+    from utils.key_format import is_valid_license_key
+    return lambda: is_valid_license_key(VALID_KEY)
+
+
+@benchmark("key_format.is_valid_license_key[invalid]", group="validate")
+def bench_is_valid_invalid():
+    from utils.key_format import is_valid_license_key
+    return lambda: is_valid_license_key(INVALID_KEY)
+
+
+@benchmark("key_format.is_valid_license_key[garbage]", group="validate")
+def bench_is_valid_garbage():
+    from utils.key_format import is_valid_license_key
+    garbage = "x" * 200
+    return lambda: is_valid_license_key(garbage)
+
+
+@benchmark("key_format.normalize_license_key[canonical]", group="validate")
+def bench_normalize_canonical():
+    from utils.key_format import normalize_license_key
+    return lambda: normalize_license_key(VALID_KEY)
+
+
+@benchmark("key_format.normalize_license_key[user input]", group="validate")
+def bench_normalize_user_input():
+    from utils.key_format import normalize_license_key
+    raw = " abcd efgh-jklmnp23 "
+    return lambda: normalize_license_key(raw)
+
+
+@benchmark("RateLimiter.is_allowed[single ip]", group="rate_limit")
+def bench_rate_limiter_single():
+    from utils.security import RateLimiter
+    limiter = RateLimiter(max_requests=10 ** 9, window_seconds=3600)
+    return lambda: limiter.is_allowed("203.0.113.7")
+
+
+@benchmark("RateLimiter.is_allowed[10k ips]", group="rate_limit")
+def bench_rate_limiter_many():
+    from utils.security import RateLimiter
+    limiter = RateLimiter(max_requests=10 ** 9, window_seconds=3600)
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(10000)]
+    state = {"i": 0}
+
+    def call():
+        i = state["i"]
+        state["i"] = (i + 1) % 10000
+        limiter.is_allowed(ips[i])
+    return call
+
+
+def _import_database_manager(database_url: str):
+    """
+    导入 DatabaseManager
+
+    database.connection 导入时会按 DATABASE_URL 创建全局管理器并检查结构版本，
+    导入期间临时指向已建表的基准数据库，之后恢复原值；全局管理器的连接池随临时数据库一起关闭
+    """
+    first_import = "database.connection" not in sys.modules
+    previous = os.environ.get("DATABASE_URL")
+    os.environ["DATABASE_URL"] = database_url
+    try:
+        from database import connection
+    finally:
+        if previous is None:
+            del os.environ["DATABASE_URL"]
+        else:
+            os.environ["DATABASE_URL"] = previous
+    if first_import:
+        # 退出时先停止线程池再关闭连接池（ExitStack 按注册的相反顺序执行）
+        _cleanup.callback(connection.db_manager.close)
+        _cleanup.callback(connection.async_db_manager.shutdown)
+    return connection.DatabaseManager
+
+
+def _database(rows: int):
+    """创建包含指定行数授权码的临时SQLite数据库"""
+    from database.migrations import upgrade
+    from utils.license_generator import generate_batch_license_keys
+
+    directory = _cleanup.enter_context(tempfile.TemporaryDirectory(prefix="bench-"))
+    database_url = f"sqlite:///{directory}/bench.db"
+    # 先建表，database.connection 导入时会检查结构版本
+    upgrade(database_url)
+    manager = _import_database_manager(database_url)(database_url)
+    _cleanup.callback(manager.close)
+    now = datetime.now()
+    with manager.transaction() as conn:
+        manager.insert_many(
+            conn, "licenses",
+            ["id", "license_key", "user_email", "plan_type", "start_date", "end_date", "end_ts", "is_active"],
+            [
+                (f"id-{i}", key, "bench@example.com", "365d", now.isoformat(),
+                 (now + timedelta(days=365)).isoformat(), int((now + timedelta(days=365)).timestamp()), True)
+                for i, key in enumerate(generate_batch_license_keys(rows))
+            ]
+        )
+    return manager
+
+
+class _StaticCursor:
+    """返回预取结果的游标，用于单独测量行转换开销"""
+
+    def __init__(self, description, rows):
+        self.description = description
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+def _row_conversion(rows: int):
+    from database.queries import VERIFY_COLUMNS
+    manager = _database(rows)
+    with manager.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {VERIFY_COLUMNS} FROM licenses", (int(time.time()),))
+        cursor = _StaticCursor(cursor.description, cursor.fetchall())
+    return lambda: manager._fetch_all(cursor)
+
+
+@benchmark("DatabaseManager._fetch_all[1 row]", group="database")
+def bench_row_conversion_single():
+    return _row_conversion(1)
+
+
+@benchmark("DatabaseManager._fetch_all[100 rows]", group="database")
+def bench_row_conversion_many():
+    return _row_conversion(100)
+
+
+@benchmark("DatabaseManager.execute_named[verify_license]", group="database")
+def bench_execute_named():
+    manager = _database(1000)
+    key = manager.execute_query("SELECT license_key FROM licenses LIMIT 1")[0]["license_key"]
+    return lambda: manager.execute_named("verify_license", (int(time.time()), key))
+
+
+def _license_row():
+    now = datetime.now()
+    return {
+        "user_email": "bench@example.com",
+        "plan_type": "365d",
+        "end_date": now + timedelta(days=365),
+    }
+
+
+@benchmark("LicenseVerifyResponse construct", group="response")
+def bench_response_construct():
+    from database.models import LicenseVerifyResponse, LicenseStatus
+    row = _license_row()
+    return lambda: LicenseVerifyResponse(
+        status=LicenseStatus.VALID,
+        plan_type=row["plan_type"],
+        end_date=row["end_date"],
+        user_email=row["user_email"],
+        message="授权码有效"
+    )
+
+
+@benchmark("LicenseVerifyResponse serialize", group="response")
+def bench_response_serialize():
+    from database.models import LicenseVerifyResponse, LicenseStatus
+    row = _license_row()
+    response = LicenseVerifyResponse(
+        status=LicenseStatus.VALID,
+        plan_type=row["plan_type"],
+        end_date=row["end_date"],
+        user_email=row["user_email"],
+        message="授权码有效"
+    )
+    return response.model_dump_json
+
+
+def _valid_response():
+    from database.models import LicenseVerifyResponse, LicenseStatus
+    row = _license_row()
+    return LicenseVerifyResponse(
+        status=LicenseStatus.VALID,
+        plan_type=row["plan_type"],
+        end_date=row["end_date"],
+        user_email=row["user_email"],
+        message="授权码有效"
+    )
+
+
+@benchmark("FastAPI response_model serialize", group="response")
+def bench_response_fastapi():
+    from fastapi.routing import serialize_response
+    from fastapi.responses import JSONResponse
+    from fastapi.utils import create_model_field
+    from database.models import LicenseVerifyResponse
+    field = create_model_field(name="Response", type_=LicenseVerifyResponse, mode="serialization")
+    response = _valid_response()
+
+    def call():
+        # serialize_response 在 is_coroutine=True 时不会挂起，直接驱动协程即可
+        coroutine = serialize_response(field=field, response_content=response)
+        try:
+            coroutine.send(None)
+        except StopIteration as done:
+            JSONResponse(done.value)
+    return call
+
+
+@benchmark("encode_verify_response[valid]", group="response")
+def bench_encode_valid():
+    from utils.verify_response import encode_verify_response
+    response = _valid_response()
+    return lambda: encode_verify_response(response)
+
+
+@benchmark("encode_verify_response[not_found]", group="response")
+def bench_encode_constant():
+    from utils.verify_response import encode_verify_response, NOT_FOUND_RESPONSE
+    return lambda: encode_verify_response(NOT_FOUND_RESPONSE)
+
+
+@benchmark("ValidLicenseResult construct+encode", group="response")
+def bench_valid_result():
+    from utils.verify_response import ValidLicenseResult, encode_verify_response
+    row = _license_row()
+    end_date = row["end_date"].isoformat()
+    end_ts = int(row["end_date"].timestamp())
+    return lambda: encode_verify_response(
+        ValidLicenseResult(row["plan_type"], end_date, end_ts, row["user_email"])
+    )
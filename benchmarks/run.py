@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+微基准测试入口
+自动加载 benchmarks/bench_*.py 中注册的基准
+
+用法:
+    python benchmarks/run.py
+    python benchmarks/run.py --filter validate --json results.json
+    python benchmarks/run.py --compare results.json
+"""
+import os
+import sys
+import json
+import glob
+import logging
+import argparse
+import importlib
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from benchmarks.runner import run_all, print_results
+
+
+def load_benchmarks():
+    """导入所有基准模块"""
+    for path in sorted(glob.glob(os.path.join(BENCHMARK_DIR, "bench_*.py"))):
+        module = os.path.splitext(os.path.basename(path))[0]
+        importlib.import_module(f"benchmarks.{module}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="授权系统微基准测试")
+    parser.add_argument("--filter", help="只执行名称或分组包含该字符串的基准")
+    parser.add_argument("--warmup", type=float, default=0.2, help="每个基准的预热时长，秒（默认: 0.2）")
+    parser.add_argument("--repeat", type=int, default=7, help="计时轮数（默认: 7）")
+    parser.add_argument("--min-time", type=float, default=0.05, help="每轮最短耗时，秒（默认: 0.05）")
+    parser.add_argument("--json", dest="json_path", help="将结果以JSON格式写入文件")
+    parser.add_argument("--compare", help="与之前保存的JSON结果对比")
+    args = parser.parse_args()
+
+    # 基准中的数据库初始化等日志会干扰结果输出
+    logging.disable(logging.WARNING)
+    load_benchmarks()
+
+    report = run_all(args.filter, warmup=args.warmup, repeat=args.repeat, min_time=args.min_time)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(report, baseline)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+微基准测试框架
+负责注册基准、预热、自动确定循环次数、统计计时结果以及输出JSON
+"""
+import gc
+import sys
+import time
+import platform
+import statistics
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Benchmark:
+    """已注册的基准"""
+
+    def __init__(self, name: str, group: str, factory: Callable[[], Callable[[], Any]], items: int = 1):
+        """
+        Args:
+            name: 基准名称
+            group: 分组名称
+            factory: 返回被测零参数可调用对象的工厂函数，准备工作在工厂中完成，不计入计时
+            items: 每次调用处理的条目数，用于计算吞吐量
+        """
+        self.name = name
+        self.group = group
+        self.factory = factory
+        self.items = items
+
+
+BENCHMARKS: List[Benchmark] = []
+
+
+def benchmark(name: str, group: str = "default", items: int = 1):
+    """
+    注册基准的装饰器
+
+    被装饰的函数返回需要计时的零参数可调用对象
+    """
+    def decorator(factory: Callable[[], Callable[[], Any]]):
+        if any(b.name == name for b in BENCHMARKS):
+            raise ValueError(f"基准已注册: {name}")
+        BENCHMARKS.append(Benchmark(name, group, factory, items))
+        return factory
+    return decorator
+
+
+def _time_loops(func: Callable[[], Any], loops: int) -> float:
+    """连续调用指定次数并返回总耗时（秒）"""
+    counter = time.perf_counter
+    start = counter()
+    for _ in range(loops):
+        func()
+    return counter() - start
+
+
+def _calibrate(func: Callable[[], Any], min_time: float) -> int:
+    """确定单轮循环次数，使每轮耗时不少于 min_time"""
+    loops = 1
+    while True:
+        elapsed = _time_loops(func, loops)
+        if elapsed >= min_time:
+            return loops
+        if elapsed <= 0:
+            loops *= 10
+        else:
+            loops = max(loops * 2, int(loops * min_time / elapsed * 1.2))
+
+
+def run_benchmark(bench: Benchmark, warmup: float = 0.2, repeat: int = 7,
+                  min_time: float = 0.05) -> Dict[str, Any]:
+    """
+    执行单个基准
+
+    Args:
+        bench: 基准
+        warmup: 预热时长（秒）
+        repeat: 计时轮数
+        min_time: 每轮最短耗时（秒）
+
+    Returns:
+        Dict[str, Any]: 单次调用耗时统计（纳秒）
+    """
+    func = bench.factory()
+
+    # 预热：填充缓存、触发惰性初始化
+    deadline = time.perf_counter() + warmup
+    while time.perf_counter() < deadline:
+        func()
+
+    loops = _calibrate(func, min_time)
+
+    samples = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            samples.append(_time_loops(func, loops) / loops * 1e9)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    median = statistics.median(samples)
+    return {
+        "name": bench.name,
+        "group": bench.group,
+        "loops": loops,
+        "repeat": repeat,
+        "min_ns": round(min(samples), 1),
+        "median_ns": round(median, 1),
+        "mean_ns": round(statistics.fmean(samples), 1),
+        "stdev_ns": round(statistics.stdev(samples), 1) if len(samples) > 1 else 0.0,
+        "max_ns": round(max(samples), 1),
+        "ops_per_sec": round(1e9 / median, 1) if median else None,
+        "items": bench.items,
+        "items_per_sec": round(bench.items * 1e9 / median, 1) if median else None,
+    }
+
+
+def run_all(name_filter: Optional[str] = None, **options) -> Dict[str, Any]:
+    """
+    执行已注册的基准
+
+    Args:
+        name_filter: 只执行名称或分组包含该字符串的基准
+        **options: 传给 run_benchmark 的参数
+
+    Returns:
+        Dict[str, Any]: 环境信息和全部结果
+    """
+    results = []
+    for bench in BENCHMARKS:
+        if name_filter and name_filter not in bench.name and name_filter not in bench.group:
+            continue
+        results.append(run_benchmark(bench, **options))
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "options": options,
+        "results": results,
+    }
+
+
+def _format_ns(value: float) -> str:
+    """按量级格式化纳秒耗时"""
+    if value >= 1e6:
+        return f"{value / 1e6:.2f}ms"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f}us"
+    return f"{value:.0f}ns"
+
+
+def print_results(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """
+    打印基准结果
+
+    Args:
+        report: run_all 的返回值
+        baseline: 用于对比的历史结果，按名称匹配中位数
+    """
+    previous = {r["name"]: r for r in (baseline or {}).get("results", [])}
+    print(f"Python {report['python']} ({report['implementation']}) on {report['platform']}")
+    header = f"{'benchmark':<58}{'median':>10}{'min':>10}{'stdev':>10}{'items/s':>14}"
+    if previous:
+        header += f"{'vs base':>10}"
+    print(header)
+
+    group = None
+    for result in report["results"]:
+        if result["group"] != group:
+            group = result["group"]
+            print(f"[{group}]")
+        line = (
+            f"  {result['name']:<56}{_format_ns(result['median_ns']):>10}"
+            f"{_format_ns(result['min_ns']):>10}{_format_ns(result['stdev_ns']):>10}"
+            f"{result['items_per_sec']:>14,.0f}"
+        )
+        base = previous.get(result["name"])
+        if base:
+            line += f"{base['median_ns'] / result['median_ns']:>9.2f}x"
+        print(line)
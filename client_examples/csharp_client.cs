@@ -4,6 +4,7 @@ C#客户端示例 - 软件授权验证
 using System;
 using System.Net.Http;
 using System.Text;
+using System.Text.RegularExpressions;
 using System.Threading.Tasks;
 using Newtonsoft.Json;
 
@@ -30,8 +31,35 @@ namespace LicenseClient
             _httpClient.DefaultRequestHeaders.Add("User-Agent", "LicenseClient/1.0");
         }
 
+        // 授权码格式（与服务端 utils/key_format.py 一致）: XXXX-XXXX-XXXX-XXXX，不含 0、1、I、O
+        private static readonly Regex LicenseKeyPattern = new Regex(
+            "^[A-HJ-NP-Z2-9]{4}(-[A-HJ-NP-Z2-9]{4}){3}$", RegexOptions.Compiled);
+
+        // 规范化用户输入的授权码（去掉空白、转换为大写、重新插入分隔符），格式无效时返回null
+        public static string NormalizeLicenseKey(string licenseKey)
+        {
+            string compact = Regex.Replace(licenseKey ?? "", @"[\s\-_]+", "").ToUpperInvariant();
+            if (compact.Length != 16)
+            {
+                return null;
+            }
+            string candidate = $"{compact.Substring(0, 4)}-{compact.Substring(4, 4)}-{compact.Substring(8, 4)}-{compact.Substring(12, 4)}";
+            return LicenseKeyPattern.IsMatch(candidate) ? candidate : null;
+        }
+
         public async Task<LicenseVerificationResult> VerifyLicenseAsync(string licenseKey)
         {
+            // 格式无效的授权码无需请求服务器
+            licenseKey = NormalizeLicenseKey(licenseKey);
+            if (licenseKey == null)
+            {
+                return new LicenseVerificationResult
+                {
+                    Status = "not_found",
+                    Message = "授权码格式无效"
+                };
+            }
+
             try
             {
                 string url = $"{_apiBaseUrl}/verify/{licenseKey}";
@@ -5,11 +5,16 @@ import java.io.*;
 import java.net.*;
 import java.time.LocalDateTime;
 import java.time.format.DateTimeFormatter;
+import java.util.regex.Pattern;
 import com.fasterxml.jackson.databind.ObjectMapper;
 import com.fasterxml.jackson.annotation.JsonProperty;
 
 public class LicenseClient {
     
+    // 授权码格式（与服务端 utils/key_format.py 一致）: XXXX-XXXX-XXXX-XXXX，不含 0、1、I、O
+    private static final Pattern LICENSE_KEY_PATTERN =
+        Pattern.compile("[A-HJ-NP-Z2-9]{4}(-[A-HJ-NP-Z2-9]{4}){3}");
+    
     private final String apiBaseUrl;
     private final ObjectMapper objectMapper;
     
@@ -51,7 +56,27 @@ public class LicenseClient {
         public void setMessage(String message) { this.message = message; }
     }
     
+    // 规范化用户输入的授权码（去掉空白、转换为大写、重新插入分隔符），格式无效时返回null
+    public static String normalizeLicenseKey(String licenseKey) {
+        String compact = (licenseKey == null ? "" : licenseKey).replaceAll("[\\s\\-_]+", "").toUpperCase();
+        if (compact.length() != 16) {
+            return null;
+        }
+        String candidate = compact.substring(0, 4) + "-" + compact.substring(4, 8) + "-"
+            + compact.substring(8, 12) + "-" + compact.substring(12, 16);
+        return LICENSE_KEY_PATTERN.matcher(candidate).matches() ? candidate : null;
+    }
+    
     public LicenseVerificationResult verifyLicense(String licenseKey) {
+        // 格式无效的授权码无需请求服务器
+        licenseKey = normalizeLicenseKey(licenseKey);
+        if (licenseKey == null) {
+            LicenseVerificationResult invalidResult = new LicenseVerificationResult();
+            invalidResult.setStatus("not_found");
+            invalidResult.setMessage("授权码格式无效");
+            return invalidResult;
+        }
+        
         try {
             String url = apiBaseUrl + "/verify/" + URLEncoder.encode(licenseKey, "UTF-8");
             URL apiUrl = new URL(url);
@@ -1,12 +1,18 @@
 """
 Python客户端示例 - 软件授权验证
 """
+import re
 import requests
 import sys
 import json
+import time
+import base64
 from datetime import datetime
 from typing import Optional, Dict, Any
 
+# 授权码格式（与服务端 utils/key_format.py 一致）: XXXX-XXXX-XXXX-XXXX，不含 0、1、I、O
+LICENSE_KEY_PATTERN = re.compile(r"[A-HJ-NP-Z2-9]{4}(?:-[A-HJ-NP-Z2-9]{4}){3}")
+
 
 class LicenseClient:
     """授权码验证客户端"""
@@ -25,6 +31,21 @@ class LicenseClient:
             'User-Agent': 'LicenseClient/1.0'
         })
     
+    @staticmethod
+    def normalize_license_key(license_key: str) -> Optional[str]:
+        """
+        规范化用户输入的授权码（去掉空白、转换为大写、重新插入分隔符）
+        
+        Args:
+            license_key: 用户输入的授权码
+            
+        Returns:
+            Optional[str]: 规范化后的授权码，格式无效时为None
+        """
+        compact = re.sub(r"[\s\-_]+", "", license_key or "").upper()
+        candidate = "-".join(compact[i:i + 4] for i in range(0, len(compact), 4))
+        return candidate if LICENSE_KEY_PATTERN.fullmatch(candidate) else None
+    
     def verify_license(self, license_key: str) -> Dict[str, Any]:
         """
         验证授权码
@@ -35,6 +56,11 @@ class LicenseClient:
         Returns:
             Dict[str, Any]: 验证结果
         """
+        # 格式无效的授权码无需请求服务器
+        license_key = self.normalize_license_key(license_key)
+        if license_key is None:
+            return {"status": "not_found", "message": "授权码格式无效"}
+        
         try:
             url = f"{self.api_base_url}/verify/{license_key}"
             response = self.session.get(url, timeout=10)
@@ -58,6 +84,68 @@ class LicenseClient:
                 "message": f"验证失败: {str(e)}"
             }
     
+    def verify_license_with_token(self, license_key: str) -> Dict[str, Any]:
+        """
+        验证授权码并获取可离线校验的签名令牌
+        
+        Args:
+            license_key: 授权码
+            
+        Returns:
+            Dict[str, Any]: 验证结果，有效时包含 token 字段
+        """
+        license_key = self.normalize_license_key(license_key)
+        if license_key is None:
+            return {"status": "not_found", "message": "授权码格式无效"}
+        
+        try:
+            url = f"{self.api_base_url}/verify/{license_key}"
+            response = self.session.get(url, params={"include_token": "true"}, timeout=10)
+            
+            if response.status_code == 200:
+                return response.json()
+            return {
+                "status": "error",
+                "message": f"API请求失败: {response.status_code}"
+            }
+        except requests.exceptions.RequestException as e:
+            return {
+                "status": "error",
+                "message": f"网络请求失败: {str(e)}"
+            }
+    
+    @staticmethod
+    def verify_token_offline(token: str, public_key_pem: str) -> Optional[Dict[str, Any]]:
+        """
+        使用服务器公钥离线校验令牌（服务器需使用 EdDSA 模式签发）
+        
+        令牌超过重新验证期限后需要重新调用 verify_license_with_token 联网验证
+        
+        Args:
+            token: 服务器返回的令牌
+            public_key_pem: GET /token/public-key 返回的公钥
+            
+        Returns:
+            Optional[Dict[str, Any]]: 令牌有效时返回载荷，否则返回None
+        """
+        from cryptography.exceptions import InvalidSignature
+        from cryptography.hazmat.primitives import serialization
+        
+        def b64decode(data: str) -> bytes:
+            return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+        
+        try:
+            encoded, signature = token.split(".")
+            public_key = serialization.load_pem_public_key(public_key_pem.encode("ascii"))
+            public_key.verify(b64decode(signature), encoded.encode("ascii"))
+            payload = json.loads(b64decode(encoded))
+        except (ValueError, InvalidSignature):
+            return None
+        
+        if payload.get("alg") != "EdDSA" or time.time() >= payload["rfr"]:
+            return None
+        return payload
+    
     def check_license_status(self, license_key: str) -> bool:
         """
         检查授权码状态（简化版本）
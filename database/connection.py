@@ -1,27 +1,66 @@
 """
 数据库连接管理
 支持SQLite（本地开发）和PostgreSQL（生产环境）
+
+数据库驱动在创建 DatabaseManager 时按 DATABASE_URL 导入，只使用一种数据库的进程不会加载另一种驱动
 """
 import os
-import sqlite3
-import psycopg2
+import time
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator, Dict, Any, List, Optional
+from functools import lru_cache, partial
+from typing import Generator, Dict, Any, List, Optional, Callable
 import logging
 
+from database.pool import ConnectionPool
+from database.migrations import SchemaVersionError, apply_migrations, get_schema_version, latest_version
+from database.queries import get_query, translate_placeholders
+from utils.metrics import db_queries_total, db_query_duration_seconds
+
 logger = logging.getLogger(__name__)
 
 
+class DatabaseBusyError(Exception):
+    """数据库请求排队已满"""
+    pass
+
+
+@lru_cache(maxsize=None)
+def _prepared_connection_class():
+    """创建PostgreSQL连接类（首次使用时才导入psycopg2）"""
+    import psycopg2.extensions
+    
+    class _PreparedConnection(psycopg2.extensions.connection):
+        """记录已在当前会话中创建的预处理语句的PostgreSQL连接"""
+        
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.prepared_statements = set()
+    
+    return _PreparedConnection
+
+
 class DatabaseManager:
     """数据库管理器"""
     
-    def __init__(self):
-        self.database_url = os.getenv("DATABASE_URL", "sqlite:///license_system.db")
+    def __init__(self, database_url: Optional[str] = None):
+        """
+        Args:
+            database_url: 数据库连接字符串，默认读取 DATABASE_URL
+        """
+        self.database_url = database_url or os.getenv("DATABASE_URL", "sqlite:///license_system.db")
         self.is_postgresql = self.database_url.startswith("postgresql://")
         
         if self.is_postgresql:
+            import psycopg2
+            import psycopg2.extensions
+            self._psycopg2 = psycopg2
             logger.info("Using PostgreSQL database")
         else:
+            import sqlite3
+            self._sqlite3 = sqlite3
             # SQLite配置
             if self.database_url.startswith("sqlite:///"):
                 self.db_path = self.database_url.replace("sqlite:///", "")
@@ -29,131 +68,449 @@ class DatabaseManager:
                 self.db_path = "license_system.db"
             logger.info("Using SQLite database")
         
-        # 初始化数据库
-        self._init_database()
+        # 连接池配置
+        self.pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+        self.pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+        self.pool_max_idle = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+        self.pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        # SQLite每个连接缓存的已编译语句数量
+        self.sqlite_cached_statements = int(os.getenv("DB_SQLITE_CACHED_STATEMENTS", "256"))
+        
+        # 数据库结构版本落后时是否在启动时自动迁移
+        self.auto_migrate = os.getenv("DB_AUTO_MIGRATE", "False").lower() == "true"
+        
+        # 服务端命名游标的编号
+        self._cursor_ids = itertools.count(1)
+        
+        self.pool = self._create_pool()
+        self._check_schema()
     
-    def _init_database(self):
-        """初始化数据库"""
+    def _connect(self):
+        """创建新的数据库连接"""
+        if self.is_postgresql:
+            return self._psycopg2.connect(self.database_url, connection_factory=_prepared_connection_class())
+        # 连接由连接池在线程间复用，同一时刻只会被一个线程使用
+        conn = self._sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.sqlite_cached_statements
+        )
+        conn.row_factory = self._sqlite3.Row  # 使结果可以像字典一样访问
+        # WAL 模式下读取不阻塞写入（导出、过滤器重建等长时间读取期间仍可生成授权码）
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+    
+    def _check_connection(self, conn) -> bool:
+        """检查连接是否可用"""
+        if self.is_postgresql and conn.closed:
+            return False
+        cursor = conn.cursor()
         try:
-            if self.is_postgresql:
-                # PostgreSQL初始化
-                with psycopg2.connect(self.database_url) as conn:
-                    with conn.cursor() as cursor:
-                        cursor.execute("""
-                            CREATE TABLE IF NOT EXISTS licenses (
-                                id VARCHAR(255) PRIMARY KEY,
-                                license_key VARCHAR(255) UNIQUE NOT NULL,
-                                user_email VARCHAR(255),
-                                plan_type VARCHAR(50) NOT NULL CHECK (plan_type IN ('trial1', 'trial3', '30d', '180d', '365d', 'lifetime')),
-                                start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                end_date TIMESTAMP,
-                                is_active BOOLEAN DEFAULT TRUE,
-                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                            )
-                        """)
-                        
-                        # 创建索引
-                        cursor.execute("CREATE INDEX IF NOT EXISTS idx_license_key ON licenses(license_key)")
-                        cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_email ON licenses(user_email)")
-                        cursor.execute("CREATE INDEX IF NOT EXISTS idx_plan_type ON licenses(plan_type)")
-                        cursor.execute("CREATE INDEX IF NOT EXISTS idx_is_active ON licenses(is_active)")
-                        cursor.execute("CREATE INDEX IF NOT EXISTS idx_end_date ON licenses(end_date)")
-                        
-                        conn.commit()
-            else:
-                # SQLite初始化
-                with sqlite3.connect(self.db_path) as conn:
-                    conn.execute("""
-                        CREATE TABLE IF NOT EXISTS licenses (
-                            id TEXT PRIMARY KEY,
-                            license_key TEXT UNIQUE NOT NULL,
-                            user_email TEXT,
-                            plan_type TEXT NOT NULL CHECK (plan_type IN ('trial1', 'trial3', '30d', '180d', '365d', 'lifetime')),
-                            start_date TEXT DEFAULT (datetime('now')),
-                            end_date TEXT,
-                            is_active BOOLEAN DEFAULT 1,
-                            created_at TEXT DEFAULT (datetime('now')),
-                            updated_at TEXT DEFAULT (datetime('now'))
-                        )
-                    """)
-                    
-                    # 创建索引
-                    conn.execute("CREATE INDEX IF NOT EXISTS idx_license_key ON licenses(license_key)")
-                    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_email ON licenses(user_email)")
-                    conn.execute("CREATE INDEX IF NOT EXISTS idx_plan_type ON licenses(plan_type)")
-                    conn.execute("CREATE INDEX IF NOT EXISTS idx_is_active ON licenses(is_active)")
-                    conn.execute("CREATE INDEX IF NOT EXISTS idx_end_date ON licenses(end_date)")
-                    
-                    conn.commit()
-            
-            logger.info("Database initialized successfully")
-        except Exception as e:
-            logger.error(f"Database initialization error: {e}")
-            raise
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        finally:
+            cursor.close()
+        if self.is_postgresql:
+            conn.rollback()
+        return True
+    
+    def _reset_connection(self, conn):
+        """归还连接前结束未完成的事务"""
+        if self.is_postgresql:
+            if conn.closed:
+                raise self._psycopg2.InterfaceError("connection already closed")
+            if conn.get_transaction_status() != self._psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        elif conn.in_transaction:
+            conn.rollback()
+    
+    def _create_pool(self) -> ConnectionPool:
+        """创建连接池"""
+        return ConnectionPool(
+            self._connect,
+            min_size=self.pool_min_size,
+            max_size=self.pool_max_size,
+            max_idle=self.pool_max_idle,
+            timeout=self.pool_timeout,
+            health_check=self._check_connection,
+            reset=self._reset_connection
+        )
+    
+    def _check_schema(self):
+        """
+        检查数据库结构版本，启动时只执行一次版本查询，不执行DDL
+        
+        版本落后时，设置了 DB_AUTO_MIGRATE 则执行迁移，否则拒绝启动
+        """
+        with self.pool.connection() as conn:
+            version = get_schema_version(conn, self.is_postgresql)
+            latest = latest_version()
+            if version == latest:
+                return
+            if version > latest:
+                logger.warning(f"Database schema version {version} is newer than expected {latest}")
+                return
+            if not self.auto_migrate:
+                raise SchemaVersionError(
+                    f"数据库结构版本 {version} 低于需要的版本 {latest}，"
+                    f"请运行 python -m database.migrations upgrade 或设置 DB_AUTO_MIGRATE=True"
+                )
+            applied = apply_migrations(conn, self.is_postgresql)
+            logger.info(f"Database schema migrated to version {latest} ({len(applied)} migrations applied)")
     
     @contextmanager
     def get_connection(self):
-        """获取数据库连接"""
-        conn = None
+        """从连接池获取数据库连接"""
+        with self.pool.connection() as conn:
+            try:
+                yield conn
+            except Exception as e:
+                logger.error(f"Database connection error: {e}")
+                raise
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        return self.pool.stats()
+    
+    def close(self):
+        """关闭连接池"""
+        self.pool.close()
+    
+    @contextmanager
+    def transaction(self):
+        """在同一连接上执行多条语句，正常结束时提交，出错时回滚"""
+        with self.get_connection() as conn:
+            yield conn
+            conn.commit()
+    
+    @contextmanager
+    def _observe(self, operation: str):
+        """记录语句执行次数和耗时"""
+        start = time.perf_counter()
+        outcome = "error"
         try:
+            yield
+            outcome = "ok"
+        finally:
+            db_query_duration_seconds.observe(time.perf_counter() - start, operation)
+            db_queries_total.inc(operation, outcome)
+    
+    def _run_query(self, conn, query: str, params: tuple = None) -> List[Dict[str, Any]]:
+        """在指定连接上执行查询"""
+        cursor = conn.cursor()
+        if params:
+            cursor.execute(translate_placeholders(query, self.is_postgresql), params)
+        else:
+            cursor.execute(query)
+        return self._fetch_all(cursor)
+    
+    def _fetch_all(self, cursor) -> List[Dict[str, Any]]:
+        """读取游标中的全部结果"""
+        if cursor.description:
             if self.is_postgresql:
-                conn = psycopg2.connect(self.database_url)
-                yield conn
+                # PostgreSQL返回字典格式
+                columns = [desc[0] for desc in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
             else:
-                conn = sqlite3.connect(self.db_path)
-                conn.row_factory = sqlite3.Row  # 使结果可以像字典一样访问
-                yield conn
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            logger.error(f"Database connection error: {e}")
-            raise
-        finally:
-            if conn:
-                conn.close()
+                # SQLite返回字典格式
+                return [dict(row) for row in cursor.fetchall()]
+        return []
+    
+    def execute_query(self, query: str, params: tuple = None, conn=None) -> List[Dict[str, Any]]:
+        """
+        执行查询并返回结果
+        
+        Args:
+            query: 查询语句
+            params: 查询参数
+            conn: 在 transaction() 中使用的连接，为空时从连接池获取
+        """
+        with self._observe("query"):
+            if conn is not None:
+                return self._run_query(conn, query, params)
+            with self.get_connection() as conn:
+                return self._run_query(conn, query, params)
     
-    def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
-        """执行查询并返回结果"""
+    def _execute_named(self, conn, name: str, params: tuple = None):
+        """
+        在指定连接上执行已注册的查询，返回游标
+        
+        PostgreSQL在每个连接上首次执行时创建服务端预处理语句，之后直接 EXECUTE；
+        SQLite依赖连接的语句缓存复用已编译的语句
+        """
+        query = get_query(name)
+        cursor = conn.cursor()
+        if not self.is_postgresql:
+            cursor.execute(query.sql, params or ())
+            return cursor
+        
+        if name not in conn.prepared_statements:
+            cursor.execute(query.prepare_sql)
+            conn.prepared_statements.add(name)
+        cursor.execute(query.execute_sql, params or ())
+        return cursor
+    
+    def execute_named(self, name: str, params: tuple = None, conn=None) -> List[Dict[str, Any]]:
+        """
+        执行已注册的查询并返回结果
+        
+        Args:
+            name: 查询名称（见 database/queries.py）
+            params: 查询参数
+            conn: 在 transaction() 中使用的连接，为空时从连接池获取
+        """
+        with self._observe(name):
+            if conn is not None:
+                return self._fetch_all(self._execute_named(conn, name, params))
+            with self.get_connection() as conn:
+                return self._fetch_all(self._execute_named(conn, name, params))
+    
+    def execute_named_update(self, name: str, params: tuple = None) -> int:
+        """执行已注册的写入语句并提交，返回影响的行数"""
+        with self._observe(name), self.get_connection() as conn:
+            cursor = self._execute_named(conn, name, params)
+            conn.commit()
+            return cursor.rowcount
+    
+    def iter_query(self, query: str, params: tuple = None, chunk_size: int = 1000) -> Generator[Dict[str, Any], None, None]:
+        """
+        分批读取查询结果，避免一次性加载所有行
+        
+        Args:
+            query: 查询语句
+            params: 查询参数
+            chunk_size: 每批读取的行数
+            
+        Yields:
+            Dict[str, Any]: 每一行数据
+        """
+        for rows in self.iter_query_chunks(query, params, chunk_size):
+            yield from rows
+    
+    def iter_query_chunks(self, query: str, params: tuple = None,
+                          chunk_size: int = 1000) -> Generator[List[Dict[str, Any]], None, None]:
+        """
+        分批读取查询结果，内存占用只与批大小有关
+        
+        PostgreSQL使用服务端命名游标，结果保留在数据库中按批取回；SQLite按批 fetchmany。
+        读取期间一直占用一个连接，生成器结束或关闭时归还
+        
+        Args:
+            query: 查询语句
+            params: 查询参数
+            chunk_size: 每批读取的行数
+            
+        Yields:
+            List[Dict[str, Any]]: 每批数据
+        """
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
+            if self.is_postgresql:
+                # 命名游标只在当前事务内有效，连接归还时由连接池回滚结束事务
+                cursor = conn.cursor(name=f"iter_{next(self._cursor_ids)}")
+                cursor.itersize = chunk_size
             else:
-                cursor.execute(query)
-            
-            if cursor.description:
-                if self.is_postgresql:
-                    # PostgreSQL返回字典格式
-                    columns = [desc[0] for desc in cursor.description]
-                    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+                cursor = conn.cursor()
+            try:
+                if params:
+                    cursor.execute(translate_placeholders(query, self.is_postgresql), params)
                 else:
-                    # SQLite返回字典格式
-                    return [dict(row) for row in cursor.fetchall()]
-            return []
+                    cursor.execute(query)
+                
+                columns = None
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    # 命名游标在第一次取回数据后才有列信息
+                    if columns is None:
+                        columns = [desc[0] for desc in cursor.description]
+                    yield [dict(zip(columns, row)) for row in rows]
+            finally:
+                cursor.close()
     
     def execute_update(self, query: str, params: tuple = None) -> int:
         """执行更新操作并返回影响的行数"""
-        with self.get_connection() as conn:
+        with self._observe("update"), self.get_connection() as conn:
             cursor = conn.cursor()
             if params:
-                cursor.execute(query, params)
+                cursor.execute(translate_placeholders(query, self.is_postgresql), params)
             else:
                 cursor.execute(query)
             conn.commit()
             return cursor.rowcount
     
+    def insert_many(self, conn, table: str, columns: List[str], rows: List[tuple],
+                    conflict_column: str = None, page_size: int = 1000) -> int:
+        """
+        批量插入多行数据（不提交，需在 transaction() 中使用）
+        
+        PostgreSQL使用 execute_values 生成多行 VALUES，SQLite使用 executemany
+        
+        Args:
+            conn: 数据库连接
+            table: 表名
+            columns: 列名列表
+            rows: 行数据列表
+            conflict_column: 唯一列，冲突的行会被跳过
+            page_size: PostgreSQL每条语句包含的行数
+            
+        Returns:
+            int: 实际插入的行数
+        """
+        if not rows:
+            return 0
+        
+        column_list = ", ".join(columns)
+        conflict = f" ON CONFLICT ({conflict_column}) DO NOTHING" if conflict_column else ""
+        cursor = conn.cursor()
+        try:
+            with self._observe("insert_many"):
+                if self.is_postgresql:
+                    from psycopg2.extras import execute_values
+                    inserted = execute_values(
+                        cursor,
+                        f"INSERT INTO {table} ({column_list}) VALUES %s{conflict} RETURNING 1",
+                        rows,
+                        page_size=page_size,
+                        fetch=True
+                    )
+                    return len(inserted)
+                
+                placeholders = ", ".join("?" for _ in columns)
+                cursor.executemany(
+                    f"INSERT INTO {table} ({column_list}) VALUES ({placeholders}){conflict}",
+                    rows
+                )
+                return cursor.rowcount
+        finally:
+            cursor.close()
+    
+    def delete_many(self, conn, table: str, column: str, values: List[Any], chunk_size: int = 500) -> int:
+        """
+        按列值批量删除多行数据（不提交，需在 transaction() 中使用）
+        
+        PostgreSQL使用数组参数一条语句完成，SQLite按 chunk_size 分批使用 IN 列表
+        
+        Args:
+            conn: 数据库连接
+            table: 表名
+            column: 匹配的列名
+            values: 列值列表
+            chunk_size: SQLite每条语句包含的值数量
+            
+        Returns:
+            int: 实际删除的行数
+        """
+        if not values:
+            return 0
+        
+        cursor = conn.cursor()
+        try:
+            with self._observe("delete_many"):
+                if self.is_postgresql:
+                    cursor.execute(f"DELETE FROM {table} WHERE {column} = ANY(%s)", (list(values),))
+                    return cursor.rowcount
+                
+                deleted = 0
+                for start in range(0, len(values), chunk_size):
+                    chunk = values[start:start + chunk_size]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", tuple(chunk))
+                    deleted += cursor.rowcount
+                return deleted
+        finally:
+            cursor.close()
+    
     def execute_insert(self, query: str, params: tuple = None) -> str:
         """执行插入操作并返回插入的ID"""
-        with self.get_connection() as conn:
+        with self._observe("insert"), self.get_connection() as conn:
             cursor = conn.cursor()
             if params:
-                cursor.execute(query, params)
+                cursor.execute(translate_placeholders(query, self.is_postgresql), params)
             else:
                 cursor.execute(query)
             conn.commit()
             return str(cursor.lastrowid) if cursor.lastrowid else None
 
 
+class AsyncDatabaseManager:
+    """
+    异步数据库访问接口
+    
+    将同步的数据库调用放到有界线程池中执行，避免阻塞事件循环
+    """
+    
+    def __init__(self, manager: DatabaseManager, max_workers: int = None, max_pending: int = None):
+        """
+        初始化异步数据库管理器
+        
+        Args:
+            manager: 同步数据库管理器
+            max_workers: 执行数据库调用的线程数，默认与连接池最大连接数一致
+            max_pending: 允许同时排队和执行的最大请求数，超出时立即拒绝
+        """
+        self.manager = manager
+        self.max_workers = max_workers or manager.pool_max_size
+        self.max_pending = max_pending or int(os.getenv("DB_MAX_PENDING", "100"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="db-worker"
+        )
+        self._pending = 0
+    
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        在数据库线程池中执行同步函数
+        
+        Args:
+            func: 同步函数
+            
+        Returns:
+            Any: 函数返回值
+        """
+        # 计数只在事件循环线程中修改，无需加锁
+        if self._pending >= self.max_pending:
+            raise DatabaseBusyError(f"数据库请求排队已满: {self.max_pending}")
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        finally:
+            self._pending -= 1
+    
+    async def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
+        """异步执行查询并返回结果"""
+        return await self.run(self.manager.execute_query, query, params)
+    
+    async def execute_update(self, query: str, params: tuple = None) -> int:
+        """异步执行更新操作并返回影响的行数"""
+        return await self.run(self.manager.execute_update, query, params)
+    
+    async def execute_insert(self, query: str, params: tuple = None) -> str:
+        """异步执行插入操作并返回插入的ID"""
+        return await self.run(self.manager.execute_insert, query, params)
+    
+    async def execute_named(self, name: str, params: tuple = None) -> List[Dict[str, Any]]:
+        """异步执行已注册的查询"""
+        return await self.run(self.manager.execute_named, name, params)
+    
+    async def execute_named_update(self, name: str, params: tuple = None) -> int:
+        """异步执行已注册的写入语句"""
+        return await self.run(self.manager.execute_named_update, name, params)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取线程池排队统计信息"""
+        return {
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "max_workers": self.max_workers
+        }
+    
+    def shutdown(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=True)
+
+
 # 全局数据库管理器实例
 db_manager = DatabaseManager()
+async_db_manager = AsyncDatabaseManager(db_manager)
@@ -0,0 +1,586 @@
+"""
+数据库结构迁移
+按版本号顺序执行的结构变更，已执行的版本记录在 schema_version 表中
+
+用法:
+    python -m database.migrations status            # 查看当前版本和待执行的迁移
+    python -m database.migrations upgrade           # 执行全部待执行的迁移
+    python -m database.migrations upgrade --target 1
+    python -m database.migrations sql --dialect postgresql > database/schema.sql
+
+应用启动时只查询一次当前版本（见 DatabaseManager），不会执行DDL；
+设置 DB_AUTO_MIGRATE=True 时启动过程中自动执行待执行的迁移
+"""
+import os
+import sys
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL 迁移使用的事务级咨询锁编号，防止多个进程同时执行迁移
+MIGRATION_LOCK_ID = 7_391_004
+
+
+class MigrationError(Exception):
+    """迁移执行失败"""
+    pass
+
+
+class SchemaVersionError(Exception):
+    """数据库结构版本低于当前代码需要的版本"""
+    pass
+
+
+class Migration:
+    """一个版本的结构变更"""
+
+    def __init__(self, version: int, description: str, sqlite: List[str], postgresql: List[str]):
+        """
+        Args:
+            version: 版本号，从1开始连续递增
+            description: 变更说明
+            sqlite: SQLite执行的语句列表
+            postgresql: PostgreSQL执行的语句列表
+        """
+        self.version = version
+        self.description = description
+        self.sqlite = sqlite
+        self.postgresql = postgresql
+
+    def statements(self, postgresql: bool) -> List[str]:
+        """获取指定数据库执行的语句"""
+        return self.postgresql if postgresql else self.sqlite
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def register_migration(version: int, description: str, sqlite: List[str], postgresql: List[str]) -> Migration:
+    """
+    注册迁移
+
+    Args:
+        version: 版本号，必须紧接上一个已注册的版本
+        description: 变更说明
+        sqlite: SQLite执行的语句列表
+        postgresql: PostgreSQL执行的语句列表
+
+    Returns:
+        Migration: 注册的迁移
+    """
+    expected = len(MIGRATIONS) + 1
+    if version != expected:
+        raise ValueError(f"迁移版本号不连续: {version}，应为 {expected}")
+    migration = Migration(version, description, sqlite, postgresql)
+    MIGRATIONS.append(migration)
+    return migration
+
+
+def latest_version() -> int:
+    """当前代码需要的数据库结构版本"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+# ---------------------------------------------------------------------------
+# 迁移定义（只能追加新版本，不能修改已发布的版本）
+# ---------------------------------------------------------------------------
+
+register_migration(
+    1, "licenses 表和基础索引",
+    sqlite=[
+        """
+        CREATE TABLE IF NOT EXISTS licenses (
+            id TEXT PRIMARY KEY,
+            license_key TEXT UNIQUE NOT NULL,
+            user_email TEXT,
+            plan_type TEXT NOT NULL CHECK (plan_type IN ('trial1', 'trial3', '30d', '180d', '365d', 'lifetime')),
+            start_date TEXT DEFAULT (datetime('now')),
+            end_date TEXT,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now'))
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_license_key ON licenses(license_key)",
+        "CREATE INDEX IF NOT EXISTS idx_user_email ON licenses(user_email)",
+        "CREATE INDEX IF NOT EXISTS idx_plan_type ON licenses(plan_type)",
+        "CREATE INDEX IF NOT EXISTS idx_is_active ON licenses(is_active)",
+        "CREATE INDEX IF NOT EXISTS idx_end_date ON licenses(end_date)",
+    ],
+    postgresql=[
+        """
+        CREATE TABLE IF NOT EXISTS licenses (
+            id VARCHAR(255) PRIMARY KEY,
+            license_key VARCHAR(255) UNIQUE NOT NULL,
+            user_email VARCHAR(255),
+            plan_type VARCHAR(50) NOT NULL CHECK (plan_type IN ('trial1', 'trial3', '30d', '180d', '365d', 'lifetime')),
+            start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            end_date TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_license_key ON licenses(license_key)",
+        "CREATE INDEX IF NOT EXISTS idx_user_email ON licenses(user_email)",
+        "CREATE INDEX IF NOT EXISTS idx_plan_type ON licenses(plan_type)",
+        "CREATE INDEX IF NOT EXISTS idx_is_active ON licenses(is_active)",
+        "CREATE INDEX IF NOT EXISTS idx_end_date ON licenses(end_date)",
+    ],
+)
+
+_SQLITE_UPDATED_AT_TRIGGER = """
+        CREATE TRIGGER IF NOT EXISTS update_licenses_updated_at
+        AFTER UPDATE ON licenses
+        FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE licenses SET updated_at = datetime('now') WHERE id = NEW.id;
+        END
+        """
+
+register_migration(
+    2, "更新记录时自动维护 updated_at",
+    sqlite=[_SQLITE_UPDATED_AT_TRIGGER],
+    postgresql=[
+        """
+        CREATE OR REPLACE FUNCTION update_updated_at_column()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.updated_at = NOW();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS update_licenses_updated_at ON licenses",
+        """
+        CREATE TRIGGER update_licenses_updated_at
+            BEFORE UPDATE ON licenses
+            FOR EACH ROW
+            EXECUTE FUNCTION update_updated_at_column()
+        """,
+    ],
+)
+
+
+# end_ts 为到期时间的 epoch 秒（UTC），由应用写入；直接修改 end_date 时由触发器同步。
+# 没有时区的 end_date 按本地时间换算：SQLite 使用应用进程的时区，PostgreSQL 使用会话的 TimeZone
+register_migration(
+    3, "到期时间 epoch 列 end_ts",
+    sqlite=[
+        "ALTER TABLE licenses ADD COLUMN end_ts INTEGER",
+        # 回填时暂停 updated_at 触发器，避免改写所有记录的更新时间
+        "DROP TRIGGER IF EXISTS update_licenses_updated_at",
+        "UPDATE licenses SET end_ts = CAST(strftime('%s', end_date, 'utc') AS INTEGER) WHERE end_date IS NOT NULL",
+        _SQLITE_UPDATED_AT_TRIGGER,
+        "CREATE INDEX IF NOT EXISTS idx_end_ts ON licenses(end_ts)",
+        """
+        CREATE TRIGGER IF NOT EXISTS sync_licenses_end_ts_insert
+        AFTER INSERT ON licenses
+        FOR EACH ROW WHEN NEW.end_ts IS NULL AND NEW.end_date IS NOT NULL
+        BEGIN
+            UPDATE licenses SET end_ts = CAST(strftime('%s', NEW.end_date, 'utc') AS INTEGER) WHERE id = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS sync_licenses_end_ts_update
+        AFTER UPDATE OF end_date ON licenses
+        FOR EACH ROW WHEN NEW.end_ts IS OLD.end_ts
+        BEGIN
+            UPDATE licenses SET end_ts = CAST(strftime('%s', NEW.end_date, 'utc') AS INTEGER) WHERE id = NEW.id;
+        END
+        """,
+    ],
+    postgresql=[
+        "ALTER TABLE licenses ADD COLUMN IF NOT EXISTS end_ts BIGINT",
+        "ALTER TABLE licenses DISABLE TRIGGER update_licenses_updated_at",
+        "UPDATE licenses SET end_ts = EXTRACT(EPOCH FROM end_date::timestamptz)::BIGINT WHERE end_date IS NOT NULL",
+        "ALTER TABLE licenses ENABLE TRIGGER update_licenses_updated_at",
+        "CREATE INDEX IF NOT EXISTS idx_end_ts ON licenses(end_ts)",
+        """
+        CREATE OR REPLACE FUNCTION sync_end_ts()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                IF NEW.end_ts IS NULL THEN
+                    NEW.end_ts = EXTRACT(EPOCH FROM NEW.end_date::timestamptz)::BIGINT;
+                END IF;
+            ELSIF NEW.end_date IS DISTINCT FROM OLD.end_date AND NEW.end_ts IS NOT DISTINCT FROM OLD.end_ts THEN
+                NEW.end_ts = EXTRACT(EPOCH FROM NEW.end_date::timestamptz)::BIGINT;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS sync_licenses_end_ts ON licenses",
+        """
+        CREATE TRIGGER sync_licenses_end_ts
+            BEFORE INSERT OR UPDATE OF end_date ON licenses
+            FOR EACH ROW
+            EXECUTE FUNCTION sync_end_ts()
+        """,
+    ],
+)
+
+
+# status 为物化的授权状态（valid / expired / disabled）：修改 is_active、plan_type、到期时间时由触发器重新计算，
+# 到期后由后台任务（main.sweep_expired_licenses）分批改为 expired。
+# 热点索引只覆盖 status = 'valid' 的记录，过期记录积累时索引大小不变；
+# UNIQUE(license_key) 自带的索引已覆盖按授权码查询，删除重复的 idx_license_key 和低基数的 idx_is_active / idx_plan_type
+_SQLITE_STATUS_EXPR = (
+    "CASE WHEN NOT NEW.is_active THEN 'disabled' "
+    "WHEN NEW.plan_type <> 'lifetime' AND NEW.end_ts < CAST(strftime('%s', 'now') AS INTEGER) THEN 'expired' "
+    "ELSE 'valid' END"
+)
+
+register_migration(
+    4, "物化授权状态 status 列和部分索引",
+    sqlite=[
+        "ALTER TABLE licenses ADD COLUMN status TEXT NOT NULL DEFAULT 'valid' "
+        "CHECK (status IN ('valid', 'expired', 'disabled'))",
+        "DROP TRIGGER IF EXISTS update_licenses_updated_at",
+        """
+        UPDATE licenses SET status = CASE WHEN NOT is_active THEN 'disabled'
+            WHEN plan_type <> 'lifetime' AND end_ts < CAST(strftime('%s', 'now') AS INTEGER) THEN 'expired'
+            ELSE 'valid' END
+        """,
+        _SQLITE_UPDATED_AT_TRIGGER,
+        "DROP INDEX IF EXISTS idx_license_key",
+        "DROP INDEX IF EXISTS idx_is_active",
+        "DROP INDEX IF EXISTS idx_plan_type",
+        "DROP INDEX IF EXISTS idx_end_date",
+        "DROP INDEX IF EXISTS idx_end_ts",
+        "CREATE INDEX IF NOT EXISTS idx_valid_end_ts ON licenses(end_ts) WHERE status = 'valid'",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sync_licenses_status_insert
+        AFTER INSERT ON licenses
+        FOR EACH ROW WHEN ({_SQLITE_STATUS_EXPR}) <> NEW.status
+        BEGIN
+            UPDATE licenses SET status = {_SQLITE_STATUS_EXPR} WHERE id = NEW.id;
+        END
+        """,
+        # 修改 end_date 时 sync_licenses_end_ts_update 会更新 end_ts，从而触发本触发器
+        f"""
+        CREATE TRIGGER IF NOT EXISTS sync_licenses_status_update
+        AFTER UPDATE OF is_active, plan_type, end_ts ON licenses
+        FOR EACH ROW WHEN ({_SQLITE_STATUS_EXPR}) <> NEW.status
+        BEGIN
+            UPDATE licenses SET status = {_SQLITE_STATUS_EXPR} WHERE id = NEW.id;
+        END
+        """,
+    ],
+    postgresql=[
+        "ALTER TABLE licenses ADD COLUMN IF NOT EXISTS status VARCHAR(16) NOT NULL DEFAULT 'valid' "
+        "CHECK (status IN ('valid', 'expired', 'disabled'))",
+        "ALTER TABLE licenses DISABLE TRIGGER update_licenses_updated_at",
+        """
+        UPDATE licenses SET status = CASE WHEN NOT is_active THEN 'disabled'
+            WHEN plan_type <> 'lifetime' AND end_ts < EXTRACT(EPOCH FROM NOW())::BIGINT THEN 'expired'
+            ELSE 'valid' END
+        """,
+        "ALTER TABLE licenses ENABLE TRIGGER update_licenses_updated_at",
+        "DROP INDEX IF EXISTS idx_license_key",
+        "DROP INDEX IF EXISTS idx_is_active",
+        "DROP INDEX IF EXISTS idx_plan_type",
+        "DROP INDEX IF EXISTS idx_end_date",
+        "DROP INDEX IF EXISTS idx_end_ts",
+        "CREATE INDEX IF NOT EXISTS idx_valid_end_ts ON licenses(end_ts) WHERE status = 'valid'",
+        """
+        CREATE OR REPLACE FUNCTION sync_license_status()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.status = CASE WHEN NOT NEW.is_active THEN 'disabled'
+                WHEN NEW.plan_type <> 'lifetime' AND NEW.end_ts < EXTRACT(EPOCH FROM NOW())::BIGINT THEN 'expired'
+                ELSE 'valid' END;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # 同一时机的触发器按名称顺序执行，sync_licenses_end_ts 先于本触发器同步 end_ts
+        "DROP TRIGGER IF EXISTS sync_licenses_status ON licenses",
+        """
+        CREATE TRIGGER sync_licenses_status
+            BEFORE INSERT OR UPDATE OF is_active, plan_type, end_date, end_ts ON licenses
+            FOR EACH ROW
+            EXECUTE FUNCTION sync_license_status()
+        """,
+    ],
+)
+
+# 授权码列表按 (created_at, id) 键集分页：按创建时间倒序扫描复合索引，翻页代价与页数无关。
+# 按邮箱筛选时使用 (user_email, created_at, id)，它同时覆盖原来的 idx_user_email
+_LIST_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_created_at_id ON licenses(created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_user_email_created_at ON licenses(user_email, created_at, id)",
+    "DROP INDEX IF EXISTS idx_user_email",
+]
+
+register_migration(
+    5, "授权码列表分页索引",
+    sqlite=_LIST_INDEXES,
+    postgresql=_LIST_INDEXES,
+)
+
+# ---------------------------------------------------------------------------
+# 执行
+# ---------------------------------------------------------------------------
+
+_SCHEMA_VERSION_DDL = {
+    False: """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT DEFAULT (datetime('now'))
+        )
+    """,
+    True: """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+}
+
+
+def _placeholder(postgresql: bool) -> str:
+    return "%s" if postgresql else "?"
+
+
+def _is_missing_table(error: Exception, postgresql: bool) -> bool:
+    """是否为 schema_version 表不存在的错误"""
+    if postgresql:
+        import psycopg2.errors
+        return isinstance(error, psycopg2.errors.UndefinedTable)
+    import sqlite3
+    return isinstance(error, sqlite3.OperationalError) and "no such table" in str(error)
+
+
+def get_schema_version(conn, postgresql: bool) -> int:
+    """
+    查询数据库当前的结构版本（只执行一条查询）
+
+    Args:
+        conn: 数据库连接
+        postgresql: 是否为PostgreSQL
+
+    Returns:
+        int: 已执行的最高版本号，未执行过任何迁移时为0
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        row = cursor.fetchone()
+    except Exception as e:
+        if not _is_missing_table(e, postgresql):
+            raise
+        row = None
+    finally:
+        cursor.close()
+    if postgresql:
+        conn.rollback()
+    return (row[0] if row else None) or 0
+
+
+def _begin(conn, postgresql: bool):
+    """开始迁移事务并获取迁移锁"""
+    cursor = conn.cursor()
+    try:
+        if postgresql:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        else:
+            # 立即获取写锁，其他进程的迁移会等待
+            if conn.in_transaction:
+                conn.commit()
+            cursor.execute("BEGIN IMMEDIATE")
+    finally:
+        cursor.close()
+
+
+def apply_migrations(conn, postgresql: bool, target: Optional[int] = None) -> List[Migration]:
+    """
+    执行待执行的迁移，每个版本在单独的事务中执行
+
+    Args:
+        conn: 数据库连接
+        postgresql: 是否为PostgreSQL
+        target: 目标版本，为空时执行到最新版本
+
+    Returns:
+        List[Migration]: 本次执行的迁移
+    """
+    target = latest_version() if target is None else target
+    applied = []
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(_SCHEMA_VERSION_DDL[postgresql])
+        conn.commit()
+
+        for migration in MIGRATIONS:
+            if migration.version > target:
+                break
+            _begin(conn, postgresql)
+            # 获取锁后重新读取版本，其他进程可能已经执行了该迁移
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+            current = cursor.fetchone()[0] or 0
+            if migration.version <= current:
+                conn.commit()
+                continue
+
+            try:
+                for statement in migration.statements(postgresql):
+                    cursor.execute(statement)
+                p = _placeholder(postgresql)
+                cursor.execute(
+                    f"INSERT INTO schema_version (version, description) VALUES ({p}, {p})",
+                    (migration.version, migration.description)
+                )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise MigrationError(f"迁移 {migration.version} ({migration.description}) 执行失败: {e}") from e
+
+            logger.info(f"Applied migration {migration.version}: {migration.description}")
+            applied.append(migration)
+    finally:
+        cursor.close()
+    return applied
+
+
+def migration_status(conn, postgresql: bool) -> Dict[str, Any]:
+    """
+    获取迁移状态
+
+    Returns:
+        Dict[str, Any]: 当前版本、最新版本、已执行和待执行的迁移
+    """
+    current = get_schema_version(conn, postgresql)
+    applied = []
+    if current:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT version, description, applied_at FROM schema_version ORDER BY version")
+            applied = [tuple(row) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    return {
+        "current_version": current,
+        "latest_version": latest_version(),
+        "applied": applied,
+        "pending": [(m.version, m.description) for m in MIGRATIONS if m.version > current],
+    }
+
+
+def render_sql(postgresql: bool) -> str:
+    """
+    生成建立最新结构的完整SQL（含版本记录），用于无法运行迁移命令的环境，如 Supabase SQL Editor
+
+    Returns:
+        str: SQL脚本
+    """
+    def dedent(statement: str) -> str:
+        lines = statement.lstrip("\n").rstrip().splitlines()
+        indent = min(len(line) - len(line.lstrip()) for line in lines if line.strip())
+        return "\n".join(line[indent:] for line in lines)
+
+    dialect = "PostgreSQL" if postgresql else "SQLite"
+    parts = [
+        f"-- 软件秘钥授权系统数据库表结构（{dialect}，版本 {latest_version()}）\n"
+        f"-- 由 python -m database.migrations sql 根据 database/migrations.py 生成，请勿手工修改",
+        dedent(_SCHEMA_VERSION_DDL[postgresql]) + ";",
+    ]
+    for migration in MIGRATIONS:
+        statements = "\n\n".join(dedent(s) + ";" for s in migration.statements(postgresql))
+        description = migration.description.replace("'", "''")
+        parts.append(
+            f"-- {migration.version}: {migration.description}\n{statements}\n\n"
+            f"INSERT INTO schema_version (version, description) VALUES ({migration.version}, '{description}')"
+            f"\nON CONFLICT (version) DO NOTHING;"
+        )
+    return "\n\n".join(parts) + "\n"
+
+
+def connect(database_url: Optional[str] = None) -> Tuple[Any, bool]:
+    """
+    按 DATABASE_URL 创建独立的数据库连接（不使用应用的连接池）
+
+    Returns:
+        Tuple[Any, bool]: (连接, 是否为PostgreSQL)
+    """
+    database_url = database_url or os.getenv("DATABASE_URL", "sqlite:///license_system.db")
+    if database_url.startswith("postgresql://"):
+        import psycopg2
+        return psycopg2.connect(database_url), True
+    import sqlite3
+    if database_url.startswith("sqlite:///"):
+        db_path = database_url.replace("sqlite:///", "")
+    else:
+        db_path = "license_system.db"
+    return sqlite3.connect(db_path), False
+
+
+def upgrade(database_url: Optional[str] = None, target: Optional[int] = None) -> List[Migration]:
+    """
+    连接数据库并执行待执行的迁移
+
+    Args:
+        database_url: 数据库连接字符串，为空时读取 DATABASE_URL
+        target: 目标版本，为空时执行到最新版本
+
+    Returns:
+        List[Migration]: 本次执行的迁移
+    """
+    conn, postgresql = connect(database_url)
+    try:
+        return apply_migrations(conn, postgresql, target)
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    import argparse
+    parser = argparse.ArgumentParser(description="数据库结构迁移")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = subparsers.add_parser("upgrade", help="执行待执行的迁移")
+    upgrade_parser.add_argument("--target", type=int, default=None, help="目标版本（默认: 最新）")
+    subparsers.add_parser("status", help="查看迁移状态")
+    sql_parser = subparsers.add_parser("sql", help="输出建立最新结构的完整SQL")
+    sql_parser.add_argument("--dialect", choices=["postgresql", "sqlite"], default="postgresql")
+    args = parser.parse_args(argv)
+
+    if args.command == "sql":
+        sys.stdout.write(render_sql(args.dialect == "postgresql"))
+        return 0
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if args.command == "upgrade":
+        try:
+            applied = upgrade(target=args.target)
+        except MigrationError as e:
+            print(f"❌ {e}")
+            return 1
+        for migration in applied:
+            print(f"✅ {migration.version}: {migration.description}")
+        if not applied:
+            print("数据库结构已是最新版本")
+        return 0
+
+    conn, postgresql = connect()
+    try:
+        status = migration_status(conn, postgresql)
+    finally:
+        conn.close()
+    print(f"当前版本: {status['current_version']}  最新版本: {status['latest_version']}")
+    for version, description, applied_at in status["applied"]:
+        print(f"  [x] {version}: {description} ({applied_at})")
+    for version, description in status["pending"]:
+        print(f"  [ ] {version}: {description}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
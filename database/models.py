@@ -2,11 +2,28 @@
 数据库模型定义
 """
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, EmailStr
+from typing import Annotated, Optional, List
+from pydantic import AfterValidator, BaseModel, Field, WithJsonSchema
 from enum import Enum
 
 
+def _validate_email(value: str) -> str:
+    """使用 pydantic 的邮箱校验，email_validator 在第一次校验时才导入"""
+    from pydantic.networks import validate_email
+    return validate_email(value)[1]
+
+
+# 与 pydantic.EmailStr 的校验结果和 OpenAPI 描述相同，但导入模型时不加载 email_validator
+EmailStr = Annotated[str, AfterValidator(_validate_email), WithJsonSchema({"type": "string", "format": "email"})]
+
+
+# 单次批量验证的最大授权码数量
+MAX_BATCH_VERIFY_KEYS = 1000
+
+# 单次批量生成的最大授权码数量
+MAX_BATCH_GENERATE_COUNT = 50000
+
+
 class PlanType(str, Enum):
     """授权类型枚举"""
     TRIAL1 = "trial1"      # 1天试用
@@ -25,6 +42,12 @@ class LicenseStatus(str, Enum):
     NOT_FOUND = "not_found"
 
 
+class ProfilingMode(str, Enum):
+    """性能分析模式枚举"""
+    CPROFILE = "cprofile"  # 函数级耗时统计
+    SAMPLER = "sampler"    # 线程栈采样
+
+
 class LicenseBase(BaseModel):
     """授权码基础模型"""
     license_key: str
@@ -68,12 +91,32 @@ class LicenseVerifyResponse(BaseModel):
     end_date: Optional[datetime] = None
     user_email: Optional[str] = None
     message: Optional[str] = None
+    token: Optional[str] = None  # 可离线校验的签名令牌，仅在请求时返回
+
+
+class LicenseBatchVerifyRequest(BaseModel):
+    """授权码批量验证请求模型"""
+    license_keys: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_VERIFY_KEYS)
+    include_token: bool = False
+
+
+class LicenseBatchVerifyResponse(BaseModel):
+    """授权码批量验证响应模型"""
+    results: List[LicenseVerifyResponse]
 
 
 class LicenseGenerateRequest(BaseModel):
     """授权码生成请求模型"""
     plan_type: PlanType
     user_email: Optional[EmailStr] = None
+    include_token: bool = False
+
+
+class LicenseBatchGenerateRequest(BaseModel):
+    """授权码批量生成请求模型"""
+    plan_type: PlanType
+    count: int = Field(..., ge=1, le=MAX_BATCH_GENERATE_COUNT)
+    user_email: Optional[EmailStr] = None
 
 
 class LicenseGenerateResponse(BaseModel):
@@ -83,3 +126,17 @@ class LicenseGenerateResponse(BaseModel):
     end_date: Optional[datetime] = None
     user_email: Optional[str] = None
     message: str
+    token: Optional[str] = None
+
+
+class LicenseTokenKeyResponse(BaseModel):
+    """令牌校验公钥响应模型"""
+    algorithm: str
+    public_key: Optional[str] = None
+
+
+class ProfilingStartRequest(BaseModel):
+    """开启性能分析请求模型"""
+    mode: ProfilingMode = ProfilingMode.CPROFILE
+    sample_rate: float = Field(0.1, gt=0, le=1)
+    duration: int = Field(60, ge=1, le=3600)
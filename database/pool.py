@@ -0,0 +1,276 @@
+"""
+数据库连接池
+为 PostgreSQL 和 SQLite 提供统一的线程安全连接池
+"""
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """连接池获取连接超时"""
+    pass
+
+
+class _PooledConnection:
+    """连接池中的连接记录"""
+
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn: Any):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """通用数据库连接池"""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 300.0,
+        timeout: float = 30.0,
+        health_check: Optional[Callable[[Any], bool]] = None,
+        reset: Optional[Callable[[Any], None]] = None,
+        health_check_interval: float = 30.0
+    ):
+        """
+        初始化连接池
+
+        Args:
+            connect: 创建新连接的工厂函数
+            min_size: 最少保持的空闲连接数
+            max_size: 最大连接数
+            max_idle: 超出最小连接数的空闲连接的最长保留时间（秒）
+            timeout: 获取连接的最长等待时间（秒）
+            health_check: 取出连接时的健康检查函数，返回False表示连接不可用
+            reset: 归还连接时的重置函数（如回滚未结束的事务）
+            health_check_interval: 空闲超过该时间（秒）的连接在取出时才做健康检查
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("连接池大小配置无效")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._health_check = health_check
+        self._reset = reset
+        self.health_check_interval = health_check_interval
+
+        self._idle: List[_PooledConnection] = []  # 后进先出，最近使用的连接在末尾
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        self._stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "reaped": 0,
+        }
+
+    def open(self):
+        """预热连接池，创建最少数量的连接"""
+        for _ in range(self.min_size):
+            record = self._create()
+            if record is None:
+                break
+            with self._cond:
+                self._idle.append(record)
+                self._cond.notify()
+
+    def _create(self) -> Optional[_PooledConnection]:
+        """在容量允许时创建新连接"""
+        with self._cond:
+            if self._size >= self.max_size:
+                return None
+            self._size += 1
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["connections_created"] += 1
+        return _PooledConnection(conn)
+
+    def _discard(self, record: _PooledConnection):
+        """关闭并丢弃连接"""
+        try:
+            record.conn.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+        with self._cond:
+            self._size -= 1
+            self._stats["connections_closed"] += 1
+            self._cond.notify()
+
+    def _is_healthy(self, record: _PooledConnection) -> bool:
+        """检查连接是否可用"""
+        if self._health_check is None:
+            return True
+        if time.monotonic() - record.last_used < self.health_check_interval:
+            return True
+        try:
+            return self._health_check(record.conn)
+        except Exception:
+            return False
+
+    def _reap_locked(self) -> List[_PooledConnection]:
+        """找出超过空闲时间的多余连接（需持有锁）"""
+        if self.max_idle is None or len(self._idle) <= self.min_size:
+            return []
+        deadline = time.monotonic() - self.max_idle
+        expired = []
+        # 最久未使用的连接在列表开头
+        while len(self._idle) > self.min_size and self._idle[0].last_used < deadline:
+            expired.append(self._idle.pop(0))
+        self._stats["reaped"] += len(expired)
+        return expired
+
+    def reap(self) -> int:
+        """
+        回收空闲过久的连接
+
+        Returns:
+            int: 回收的连接数
+        """
+        with self._cond:
+            expired = self._reap_locked()
+        for record in expired:
+            self._discard(record)
+        return len(expired)
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """
+        从连接池取出连接
+
+        Args:
+            timeout: 等待超时（秒），默认使用连接池配置
+
+        Returns:
+            Any: 数据库连接
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            record = None
+            expired = []
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("连接池已关闭")
+                expired = self._reap_locked()
+                if self._idle:
+                    record = self._idle.pop()
+                elif self._size >= self.max_size:
+                    self._stats["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        if not self._idle and self._size >= self.max_size:
+                            self._stats["timeouts"] += 1
+                            raise PoolTimeoutError(
+                                f"获取数据库连接超时（{timeout}s），连接池已满: {self.max_size}"
+                            )
+                    continue
+
+            for stale in expired:
+                self._discard(stale)
+
+            if record is None:
+                record = self._create()
+                if record is None:
+                    continue
+            elif not self._is_healthy(record):
+                with self._cond:
+                    self._stats["health_check_failures"] += 1
+                logger.warning("Discarding unhealthy pooled connection")
+                self._discard(record)
+                continue
+
+            with self._cond:
+                self._in_use[id(record.conn)] = record
+                self._stats["checkouts"] += 1
+            return record.conn
+
+    def release(self, conn: Any, discard: bool = False):
+        """
+        归还连接
+
+        Args:
+            conn: 数据库连接
+            discard: 是否直接丢弃该连接（如连接已损坏）
+        """
+        with self._cond:
+            record = self._in_use.pop(id(conn), None)
+        if record is None:
+            return
+
+        if not discard and self._reset is not None:
+            try:
+                self._reset(conn)
+            except Exception as e:
+                logger.warning(f"Failed to reset pooled connection: {e}")
+                discard = True
+
+        if discard or self._closed:
+            self._discard(record)
+            return
+
+        record.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(record)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """以上下文管理器方式使用连接"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            # 归还时由reset回滚未完成的事务，回滚失败的连接会被丢弃
+            self.release(conn)
+
+    def close(self):
+        """关闭连接池及所有空闲连接"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for record in idle:
+            self._discard(record)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接池统计信息
+
+        Returns:
+            Dict[str, Any]: 统计信息
+        """
+        with self._cond:
+            result = dict(self._stats)
+            result.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            })
+        return result
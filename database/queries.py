@@ -0,0 +1,176 @@
+"""
+热点查询注册表
+集中声明高频SQL语句，按数据库类型转换占位符；PostgreSQL上为每个连接创建服务端预处理语句
+"""
+from functools import lru_cache
+from typing import Dict, Optional
+
+
+def translate_placeholders(sql: str, postgresql: bool) -> str:
+    """
+    将 ? 占位符转换为当前数据库使用的格式
+
+    SQLite保持 ? 不变；PostgreSQL（psycopg2）转换为 %s，并将字面量 % 转义为 %%
+
+    Args:
+        sql: 使用 ? 占位符的SQL
+        postgresql: 是否为PostgreSQL
+
+    Returns:
+        str: 转换后的SQL
+    """
+    if not postgresql:
+        return sql
+    return _translate_for_psycopg2(sql)
+
+
+@lru_cache(maxsize=512)
+def _translate_for_psycopg2(sql: str) -> str:
+    """转换为psycopg2格式（结果按SQL文本缓存）"""
+    result = []
+    quote = None
+    for char in sql:
+        if char == "%":
+            result.append("%%")
+            continue
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "?":
+            result.append("%s")
+            continue
+        result.append(char)
+    return "".join(result)
+
+
+def _numbered_placeholders(sql: str) -> str:
+    """将 ? 占位符转换为PREPARE使用的 $1, $2 ..."""
+    result = []
+    quote = None
+    index = 0
+    for char in sql:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "?":
+            index += 1
+            result.append(f"${index}")
+            continue
+        result.append(char)
+    return "".join(result)
+
+
+class Query:
+    """已注册的查询语句"""
+
+    def __init__(self, name: str, sql: str, postgresql_sql: Optional[str] = None):
+        """
+        Args:
+            name: 语句名称，同时作为PostgreSQL预处理语句名
+            sql: 使用 ? 占位符的SQL
+            postgresql_sql: PostgreSQL专用SQL（同样使用 ? 占位符），为空时与sql相同
+        """
+        self.name = name
+        self.sql = sql
+        pg_sql = postgresql_sql or sql
+        self.param_count = pg_sql.count("?")
+        self.prepare_sql = f"PREPARE {name} AS {_numbered_placeholders(pg_sql)}"
+        placeholders = ", ".join(["%s"] * self.param_count)
+        self.execute_sql = f"EXECUTE {name} ({placeholders})" if self.param_count else f"EXECUTE {name}"
+
+
+QUERIES: Dict[str, Query] = {}
+
+
+def register_query(name: str, sql: str, postgresql_sql: Optional[str] = None) -> Query:
+    """
+    注册热点查询
+
+    Args:
+        name: 语句名称
+        sql: 使用 ? 占位符的SQL
+        postgresql_sql: PostgreSQL专用SQL
+
+    Returns:
+        Query: 注册的查询
+    """
+    if name in QUERIES:
+        raise ValueError(f"查询已注册: {name}")
+    query = Query(name, sql, postgresql_sql)
+    QUERIES[name] = query
+    return query
+
+
+def get_query(name: str) -> Query:
+    """按名称获取已注册的查询"""
+    try:
+        return QUERIES[name]
+    except KeyError:
+        raise KeyError(f"未注册的查询: {name}")
+
+
+# 授权状态：以物化的 status 列为准，到期后尚未被后台任务标记的记录按 end_ts 判断为过期。
+# 唯一的参数为当前时间的 epoch 秒
+LICENSE_STATUS_SQL = (
+    "CASE WHEN status = 'valid' AND plan_type <> 'lifetime' AND end_ts < ? THEN 'expired' "
+    "ELSE status END"
+)
+
+# 按授权状态筛选的条件，与 LICENSE_STATUS_SQL 的结果一致；参数为当前时间的 epoch 秒（disabled 无参数）
+LICENSE_STATUS_FILTERS = {
+    "valid": "status = 'valid' AND (plan_type = 'lifetime' OR end_ts IS NULL OR end_ts >= ?)",
+    "expired": "(status = 'expired' OR (status = 'valid' AND plan_type <> 'lifetime' AND end_ts < ?))",
+    "disabled": "status = 'disabled'",
+}
+
+# 授权码验证使用的列（包含一个当前时间参数）
+VERIFY_COLUMNS = f"license_key, user_email, plan_type, end_date, end_ts, {LICENSE_STATUS_SQL} AS status"
+
+# 授权码列表和导出使用的列（包含一个当前时间参数）
+LICENSE_ROW_COLUMNS = (
+    f"id, license_key, user_email, plan_type, {LICENSE_STATUS_SQL} AS status, "
+    "start_date, end_date, created_at, updated_at"
+)
+
+register_query("health_check", "SELECT 1")
+
+register_query(
+    "verify_license",
+    f"SELECT {VERIFY_COLUMNS} FROM licenses WHERE license_key = ?"
+)
+
+register_query(
+    "insert_license",
+    "INSERT INTO licenses (id, license_key, user_email, plan_type, start_date, end_date, end_ts, is_active) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# 到期报表：按 end_ts 范围扫描部分索引 idx_valid_end_ts
+register_query(
+    "expiring_licenses",
+    "SELECT license_key, user_email, plan_type, end_date, end_ts FROM licenses "
+    "WHERE status = 'valid' AND end_ts >= ? AND end_ts < ? ORDER BY end_ts LIMIT ?"
+)
+
+register_query(
+    "expiring_license_counts",
+    "SELECT plan_type, COUNT(*) AS count FROM licenses "
+    "WHERE status = 'valid' AND end_ts >= ? AND end_ts < ? GROUP BY plan_type"
+)
+
+# 过期清理：每次最多标记指定条数（参数：当前时间的 epoch 秒、批大小），同样只扫描 idx_valid_end_ts；
+# PostgreSQL 上跳过被其他事务锁定的行，多个实例可以同时清理
+_SWEEP_EXPIRED_SQL = (
+    "UPDATE licenses SET status = 'expired' WHERE id IN ("
+    "SELECT id FROM licenses WHERE status = 'valid' AND end_ts < ? AND plan_type <> 'lifetime' LIMIT ?{lock})"
+)
+
+register_query(
+    "sweep_expired_licenses",
+    _SWEEP_EXPIRED_SQL.format(lock=""),
+    _SWEEP_EXPIRED_SQL.format(lock=" FOR UPDATE SKIP LOCKED")
+)
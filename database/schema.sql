@@ -1,44 +1,141 @@
--- 软件秘钥授权系统数据库表结构
--- 适用于 Supabase PostgreSQL
+-- 软件秘钥授权系统数据库表结构（PostgreSQL，版本 5）
+-- 由 python -m database.migrations sql 根据 database/migrations.py 生成，请勿手工修改
 
--- 创建licenses表
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 1: licenses 表和基础索引
 CREATE TABLE IF NOT EXISTS licenses (
-    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
-    license_key TEXT UNIQUE NOT NULL,
-    user_email TEXT,
-    plan_type TEXT NOT NULL CHECK (plan_type IN ('trial1', 'trial3', '30d', '180d', '365d', 'lifetime')),
-    start_date TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    end_date TIMESTAMP WITH TIME ZONE,
+    id VARCHAR(255) PRIMARY KEY,
+    license_key VARCHAR(255) UNIQUE NOT NULL,
+    user_email VARCHAR(255),
+    plan_type VARCHAR(50) NOT NULL CHECK (plan_type IN ('trial1', 'trial3', '30d', '180d', '365d', 'lifetime')),
+    start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    end_date TIMESTAMP,
     is_active BOOLEAN DEFAULT TRUE,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- 创建索引以提高查询性能
 CREATE INDEX IF NOT EXISTS idx_license_key ON licenses(license_key);
+
 CREATE INDEX IF NOT EXISTS idx_user_email ON licenses(user_email);
+
 CREATE INDEX IF NOT EXISTS idx_plan_type ON licenses(plan_type);
+
 CREATE INDEX IF NOT EXISTS idx_is_active ON licenses(is_active);
+
 CREATE INDEX IF NOT EXISTS idx_end_date ON licenses(end_date);
 
--- 创建更新时间触发器
+INSERT INTO schema_version (version, description) VALUES (1, 'licenses 表和基础索引')
+ON CONFLICT (version) DO NOTHING;
+
+-- 2: 更新记录时自动维护 updated_at
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
 BEGIN
     NEW.updated_at = NOW();
     RETURN NEW;
 END;
-$$ language 'plpgsql';
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_licenses_updated_at ON licenses;
 
-CREATE TRIGGER update_licenses_updated_at 
-    BEFORE UPDATE ON licenses 
-    FOR EACH ROW 
+CREATE TRIGGER update_licenses_updated_at
+    BEFORE UPDATE ON licenses
+    FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
--- 插入示例数据（可选）
-INSERT INTO licenses (license_key, user_email, plan_type, end_date) VALUES
-('DEMO-TRIAL1-ABCD1234', 'demo@example.com', 'trial1', NOW() + INTERVAL '1 day'),
-('DEMO-TRIAL3-EFGH5678', 'demo@example.com', 'trial3', NOW() + INTERVAL '3 days'),
-('DEMO-30D-IJKL9012', 'demo@example.com', '30d', NOW() + INTERVAL '30 days'),
-('DEMO-LIFETIME-MNOP3456', 'demo@example.com', 'lifetime', NULL)
-ON CONFLICT (license_key) DO NOTHING;
+INSERT INTO schema_version (version, description) VALUES (2, '更新记录时自动维护 updated_at')
+ON CONFLICT (version) DO NOTHING;
+
+-- 3: 到期时间 epoch 列 end_ts
+ALTER TABLE licenses ADD COLUMN IF NOT EXISTS end_ts BIGINT;
+
+ALTER TABLE licenses DISABLE TRIGGER update_licenses_updated_at;
+
+UPDATE licenses SET end_ts = EXTRACT(EPOCH FROM end_date::timestamptz)::BIGINT WHERE end_date IS NOT NULL;
+
+ALTER TABLE licenses ENABLE TRIGGER update_licenses_updated_at;
+
+CREATE INDEX IF NOT EXISTS idx_end_ts ON licenses(end_ts);
+
+CREATE OR REPLACE FUNCTION sync_end_ts()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.end_ts IS NULL THEN
+            NEW.end_ts = EXTRACT(EPOCH FROM NEW.end_date::timestamptz)::BIGINT;
+        END IF;
+    ELSIF NEW.end_date IS DISTINCT FROM OLD.end_date AND NEW.end_ts IS NOT DISTINCT FROM OLD.end_ts THEN
+        NEW.end_ts = EXTRACT(EPOCH FROM NEW.end_date::timestamptz)::BIGINT;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sync_licenses_end_ts ON licenses;
+
+CREATE TRIGGER sync_licenses_end_ts
+    BEFORE INSERT OR UPDATE OF end_date ON licenses
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_end_ts();
+
+INSERT INTO schema_version (version, description) VALUES (3, '到期时间 epoch 列 end_ts')
+ON CONFLICT (version) DO NOTHING;
+
+-- 4: 物化授权状态 status 列和部分索引
+ALTER TABLE licenses ADD COLUMN IF NOT EXISTS status VARCHAR(16) NOT NULL DEFAULT 'valid' CHECK (status IN ('valid', 'expired', 'disabled'));
+
+ALTER TABLE licenses DISABLE TRIGGER update_licenses_updated_at;
+
+UPDATE licenses SET status = CASE WHEN NOT is_active THEN 'disabled'
+    WHEN plan_type <> 'lifetime' AND end_ts < EXTRACT(EPOCH FROM NOW())::BIGINT THEN 'expired'
+    ELSE 'valid' END;
+
+ALTER TABLE licenses ENABLE TRIGGER update_licenses_updated_at;
+
+DROP INDEX IF EXISTS idx_license_key;
+
+DROP INDEX IF EXISTS idx_is_active;
+
+DROP INDEX IF EXISTS idx_plan_type;
+
+DROP INDEX IF EXISTS idx_end_date;
+
+DROP INDEX IF EXISTS idx_end_ts;
+
+CREATE INDEX IF NOT EXISTS idx_valid_end_ts ON licenses(end_ts) WHERE status = 'valid';
+
+CREATE OR REPLACE FUNCTION sync_license_status()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.status = CASE WHEN NOT NEW.is_active THEN 'disabled'
+        WHEN NEW.plan_type <> 'lifetime' AND NEW.end_ts < EXTRACT(EPOCH FROM NOW())::BIGINT THEN 'expired'
+        ELSE 'valid' END;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sync_licenses_status ON licenses;
+
+CREATE TRIGGER sync_licenses_status
+    BEFORE INSERT OR UPDATE OF is_active, plan_type, end_date, end_ts ON licenses
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_license_status();
+
+INSERT INTO schema_version (version, description) VALUES (4, '物化授权状态 status 列和部分索引')
+ON CONFLICT (version) DO NOTHING;
+
+-- 5: 授权码列表分页索引
+CREATE INDEX IF NOT EXISTS idx_created_at_id ON licenses(created_at, id);
+
+CREATE INDEX IF NOT EXISTS idx_user_email_created_at ON licenses(user_email, created_at, id);
+
+DROP INDEX IF EXISTS idx_user_email;
+
+INSERT INTO schema_version (version, description) VALUES (5, '授权码列表分页索引')
+ON CONFLICT (version) DO NOTHING;
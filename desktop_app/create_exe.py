@@ -30,6 +30,7 @@ def create_exe():
         "--name=软件秘钥授权系统",        # 设置exe文件名
         "--icon=icon.ico",              # 设置图标（如果存在）
         "--add-data=requirements.txt;.", # 包含依赖文件
+        "--paths=..",                   # 引用上级目录的 utils/key_format.py
         "main.py"                       # 主程序文件
     ]
     
@@ -10,66 +10,138 @@ import sqlite3
 import uuid
 import hashlib
 import secrets
-import string
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import json
 import os
+import textwrap
 import sys
 from pathlib import Path
 
+# 与服务端共用授权码格式定义（utils/key_format.py 只依赖标准库）
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from utils.key_format import LICENSE_KEY_ALPHABET, normalize_license_key
+
 # 设置 customtkinter 主题
 ctk.set_appearance_mode("light")  # 可选: "light" 或 "dark"
 ctk.set_default_color_theme("blue")  # 可选: "blue", "green", "dark-blue"
 
+# 管理页每页显示的授权码数量
+LICENSE_PAGE_SIZE = 500
+# 单次最多生成的授权码数量
+GENERATE_MAX_COUNT = 1000
+# 导出时每批从数据库读取的行数
+EXPORT_BATCH_SIZE = 1000
+
 class LicenseManager:
-    """授权码管理器"""
+    """
+    授权码管理器
+    
+    整个程序运行期间使用同一个数据库连接（WAL 模式），语句文本固定，由 sqlite3 按连接缓存编译结果；
+    程序退出时调用 close() 关闭连接
+    """
+    
+    # 连接参数：WAL 下读写互不阻塞，synchronous=NORMAL 每次提交不再等待磁盘同步，
+    # 页缓存 64MB、内存映射 256MB，百万行数据库的常用页面常驻内存
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA temp_store=MEMORY",
+    )
+    
+    INSERT_SQL = """
+        INSERT INTO licenses (id, license_key, user_email, plan_type, end_date, is_active)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    VERIFY_SQL = """
+        SELECT id, license_key, user_email, plan_type, start_date, end_date, is_active
+        FROM licenses 
+        WHERE license_key = ?
+    """
+    # 按 (created_at, rowid) 倒序，同一秒内批量创建的授权码也有确定顺序，可按游标翻页
+    LIST_SQL = """
+        SELECT license_key, user_email, plan_type, start_date, end_date, is_active, created_at, rowid
+        FROM licenses 
+        ORDER BY created_at DESC, rowid DESC
+    """
+    PAGE_SQL = """
+        SELECT license_key, user_email, plan_type, start_date, end_date, is_active, created_at, rowid
+        FROM licenses 
+        WHERE (created_at, rowid) < (?, ?)
+        ORDER BY created_at DESC, rowid DESC
+        LIMIT ?
+    """
+    STATS_SQL = """
+        SELECT COUNT(*),
+               COALESCE(SUM(is_active), 0),
+               COALESCE(SUM(is_active AND end_date IS NOT NULL AND end_date < ?), 0)
+        FROM licenses
+    """
     
     def __init__(self, db_path: str = "licenses.db"):
         self.db_path = db_path
+        self.conn = sqlite3.connect(self.db_path)
+        for pragma in self.PRAGMAS:
+            self.conn.execute(pragma)
         self.init_database()
     
+    def close(self):
+        """关闭数据库连接"""
+        if self.conn is not None:
+            # 退出前更新查询规划器的统计信息
+            self.conn.execute("PRAGMA optimize")
+            self.conn.close()
+            self.conn = None
+    
     def init_database(self):
         """初始化数据库"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS licenses (
-                id TEXT PRIMARY KEY,
-                license_key TEXT UNIQUE NOT NULL,
-                user_email TEXT,
-                plan_type TEXT NOT NULL,
-                start_date TEXT DEFAULT (datetime('now')),
-                end_date TEXT,
-                is_active BOOLEAN DEFAULT 1,
-                created_at TEXT DEFAULT (datetime('now')),
-                updated_at TEXT DEFAULT (datetime('now'))
-            )
-        """)
-        
-        # 创建索引
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_license_key ON licenses(license_key)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_user_email ON licenses(user_email)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_plan_type ON licenses(plan_type)")
-        
-        conn.commit()
-        conn.close()
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS licenses (
+                    id TEXT PRIMARY KEY,
+                    license_key TEXT UNIQUE NOT NULL,
+                    user_email TEXT,
+                    plan_type TEXT NOT NULL,
+                    start_date TEXT DEFAULT (datetime('now')),
+                    end_date TEXT,
+                    is_active BOOLEAN DEFAULT 1,
+                    created_at TEXT DEFAULT (datetime('now')),
+                    updated_at TEXT DEFAULT (datetime('now'))
+                )
+            """)
+            
+            # 创建索引（license_key 的唯一约束已自带索引）
+            self.conn.execute("DROP INDEX IF EXISTS idx_license_key")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_user_email ON licenses(user_email)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_plan_type ON licenses(plan_type)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON licenses(created_at)")
     
     def generate_license_key(self) -> str:
         """生成授权码"""
-        # 生成16位随机字符串，每4位用-分隔
-        chars = string.ascii_uppercase + string.digits
+        # 生成16位随机字符串，每4位用-分隔，字符集与服务端一致
         key_parts = []
         for _ in range(4):
-            key_parts.append(''.join(secrets.choice(chars) for _ in range(4)))
+            key_parts.append(''.join(secrets.choice(LICENSE_KEY_ALPHABET) for _ in range(4)))
         return '-'.join(key_parts)
     
     def create_license(self, user_email: str, plan_type: str) -> Dict[str, Any]:
         """创建新授权码"""
-        license_key = self.generate_license_key()
-        license_id = str(uuid.uuid4())
-        
+        return self.create_licenses(user_email, plan_type, 1)[0]
+    
+    def create_licenses(self, user_email: str, plan_type: str, count: int) -> List[Dict[str, Any]]:
+        """
+        批量创建授权码，所有授权码在同一个事务中写入
+        
+        Args:
+            user_email: 用户邮箱
+            plan_type: 授权类型
+            count: 数量
+            
+        Returns:
+            List[Dict[str, Any]]: 创建的授权码信息
+        """
         # 计算结束日期
         end_date = None
         if plan_type != "lifetime":
@@ -83,38 +155,34 @@ class LicenseManager:
             days = days_map.get(plan_type, 30)
             end_date = (datetime.now() + timedelta(days=days)).isoformat()
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO licenses (id, license_key, user_email, plan_type, end_date, is_active)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (license_id, license_key, user_email, plan_type, end_date, True))
-        
-        conn.commit()
-        conn.close()
-        
-        return {
-            "license_key": license_key,
-            "user_email": user_email,
-            "plan_type": plan_type,
-            "end_date": end_date,
-            "created_at": datetime.now().isoformat()
-        }
+        rows = [
+            (str(uuid.uuid4()), self.generate_license_key(), user_email, plan_type, end_date, True)
+            for _ in range(count)
+        ]
+        with self.conn:
+            self.conn.executemany(self.INSERT_SQL, rows)
+        
+        created_at = datetime.now().isoformat()
+        return [
+            {
+                "license_key": row[1],
+                "user_email": user_email,
+                "plan_type": plan_type,
+                "end_date": end_date,
+                "created_at": created_at
+            }
+            for row in rows
+        ]
     
     def verify_license(self, license_key: str) -> Dict[str, Any]:
         """验证授权码"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, license_key, user_email, plan_type, start_date, end_date, is_active
-            FROM licenses 
-            WHERE license_key = ?
-        """, (license_key,))
+        # 规范化输入；早期版本生成的授权码可能包含 0、1、I、O
+        normalized = normalize_license_key(license_key, allow_legacy=True)
+        if normalized is None:
+            return {"status": "invalid", "message": "授权码格式无效"}
+        license_key = normalized
         
-        result = cursor.fetchone()
-        conn.close()
+        result = self.conn.execute(self.VERIFY_SQL, (license_key,)).fetchone()
         
         if not result:
             return {"status": "invalid", "message": "授权码不存在"}
@@ -149,39 +217,84 @@ class LicenseManager:
             "user_email": license_data["user_email"]
         }
     
-    def get_all_licenses(self) -> List[Dict[str, Any]]:
-        """获取所有授权码"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT license_key, user_email, plan_type, start_date, end_date, is_active, created_at
-            FROM licenses 
-            ORDER BY created_at DESC
-        """)
-        
-        results = cursor.fetchall()
-        conn.close()
-        
-        licenses = []
-        for result in results:
-            licenses.append({
-                "license_key": result[0],
-                "user_email": result[1],
-                "plan_type": result[2],
-                "start_date": result[3],
-                "end_date": result[4],
-                "is_active": bool(result[5]),
-                "created_at": result[6]
-            })
-        
-        return licenses
+    @staticmethod
+    def _license_row(result: tuple) -> Dict[str, Any]:
+        """将 LIST_SQL/PAGE_SQL 的一行转换为授权码信息"""
+        return {
+            "license_key": result[0],
+            "user_email": result[1],
+            "plan_type": result[2],
+            "start_date": result[3],
+            "end_date": result[4],
+            "is_active": bool(result[5]),
+            "created_at": result[6]
+        }
+    
+    def get_all_licenses(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取授权码，按创建时间倒序
+        
+        Args:
+            limit: 最多返回的条数，为空时返回全部
+        """
+        if limit is None:
+            cursor = self.conn.execute(self.LIST_SQL)
+        else:
+            cursor = self.conn.execute(self.LIST_SQL + " LIMIT ?", (limit,))
+        return [self._license_row(result) for result in cursor]
+    
+    def get_license_page(self, limit: int, after: Optional[Tuple[str, int]] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, int]]]:
+        """
+        按创建时间倒序分页获取授权码
+        
+        Args:
+            limit: 每页条数
+            after: 上一页返回的游标，为空时获取第一页
+            
+        Returns:
+            Tuple: (本页授权码, 下一页游标)，没有下一页时游标为空
+        """
+        # 多取一行判断是否还有下一页
+        if after is None:
+            rows = self.conn.execute(self.LIST_SQL + " LIMIT ?", (limit + 1,)).fetchall()
+        else:
+            rows = self.conn.execute(self.PAGE_SQL, (after[0], after[1], limit + 1)).fetchall()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1][6], rows[-1][7])
+        return [self._license_row(result) for result in rows], next_cursor
+    
+    def get_stats(self) -> Dict[str, int]:
+        """统计授权码数量（由数据库聚合，不加载记录）"""
+        # end_date 与 datetime.now().isoformat() 格式相同，可以直接按文本比较
+        total, active, expired = self.conn.execute(self.STATS_SQL, (datetime.now().isoformat(),)).fetchone()
+        return {"total": total, "active": active, "expired": expired}
     
-    def export_licenses(self, file_path: str):
-        """导出授权码到文件"""
-        licenses = self.get_all_licenses()
+    def export_licenses(self, file_path: str) -> int:
+        """
+        导出授权码到JSON文件
+        
+        分批读取并逐条写出，内存占用与授权码总数无关
+        
+        Returns:
+            int: 导出的授权码数量
+        """
+        cursor = self.conn.execute(self.LIST_SQL)
+        count = 0
         with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(licenses, f, ensure_ascii=False, indent=2)
+            f.write("[")
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                for result in rows:
+                    item = json.dumps(self._license_row(result), ensure_ascii=False, indent=2)
+                    f.write(("," if count else "") + "\n" + textwrap.indent(item, "  "))
+                    count += 1
+            f.write("\n]\n" if count else "]\n")
+        return count
 
 class LicenseApp(ctk.CTk):
     """主应用程序类"""
@@ -200,13 +313,17 @@ class LicenseApp(ctk.CTk):
         except:
             pass
         
-        # 初始化授权码管理器
+        # 初始化授权码管理器，关闭窗口时释放数据库连接
         self.license_manager = LicenseManager()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # 统计信息缓存，只在刷新和生成后重新汇总，翻页时不重复统计
+        self.stats = None
         
         # 创建界面
         self.create_widgets()
         
-        # 加载数据
+        # 加载数据和统计信息
         self.refresh_license_list()
     
     def create_widgets(self):
@@ -264,6 +381,12 @@ class LicenseApp(ctk.CTk):
         )
         self.plan_menu.pack(padx=20, pady=(0, 20))
         
+        # 生成数量
+        ctk.CTkLabel(input_frame, text="生成数量:", font=ctk.CTkFont(size=16)).pack(anchor="w", padx=20, pady=(0, 5))
+        self.count_entry = ctk.CTkEntry(input_frame, placeholder_text=f"1-{GENERATE_MAX_COUNT}", width=400, height=40)
+        self.count_entry.insert(0, "1")
+        self.count_entry.pack(padx=20, pady=(0, 20))
+        
         # 生成按钮
         self.generate_btn = ctk.CTkButton(
             input_frame,
@@ -353,6 +476,30 @@ class LicenseApp(ctk.CTk):
         )
         self.export_btn.pack(side="left", padx=10, pady=10)
         
+        # 翻页
+        self.next_page_btn = ctk.CTkButton(
+            toolbar_frame,
+            text="下一页 ▶",
+            command=self.next_license_page,
+            width=100
+        )
+        self.next_page_btn.pack(side="right", padx=10, pady=10)
+        
+        self.page_label = ctk.CTkLabel(toolbar_frame, text="")
+        self.page_label.pack(side="right", padx=10, pady=10)
+        
+        self.prev_page_btn = ctk.CTkButton(
+            toolbar_frame,
+            text="◀ 上一页",
+            command=self.prev_license_page,
+            width=100
+        )
+        self.prev_page_btn.pack(side="right", padx=10, pady=10)
+        
+        # 已浏览各页的起始游标，第一页为空
+        self.page_cursors = [None]
+        self.next_page_cursor = None
+        
         # 授权码列表
         list_frame = ctk.CTkFrame(tab)
         list_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
@@ -403,9 +550,6 @@ class LicenseApp(ctk.CTk):
         ctk.CTkLabel(settings_frame, text="统计信息:", font=ctk.CTkFont(size=16)).pack(anchor="w", padx=20, pady=(0, 5))
         self.stats_label = ctk.CTkLabel(settings_frame, text="")
         self.stats_label.pack(anchor="w", padx=20, pady=(0, 20))
-        
-        # 更新统计信息
-        self.update_stats()
     
     def generate_license(self):
         """生成授权码"""
@@ -421,10 +565,20 @@ class LicenseApp(ctk.CTk):
             return
         
         try:
-            result = self.license_manager.create_license(email, plan_type)
+            count = int(self.count_entry.get().strip() or "1")
+        except ValueError:
+            count = 0
+        if not 1 <= count <= GENERATE_MAX_COUNT:
+            messagebox.showerror("错误", f"生成数量需在 1-{GENERATE_MAX_COUNT} 之间")
+            return
+        
+        try:
+            # 多个授权码在同一个事务中写入
+            results = self.license_manager.create_licenses(email, plan_type, count)
+            result = results[0]
             
             # 显示结果
-            self.result_title.configure(text="✅ 授权码生成成功", text_color="green")
+            self.result_title.configure(text=f"✅ 成功生成 {count} 个授权码", text_color="green")
             
             plan_names = {
                 "trial1": "1天试用",
@@ -435,11 +589,12 @@ class LicenseApp(ctk.CTk):
                 "lifetime": "永久授权"
             }
             
-            result_text = f"""授权码: {result['license_key']}
-用户邮箱: {result['user_email']}
+            result_text = f"""用户邮箱: {result['user_email']}
 授权类型: {plan_names.get(plan_type, plan_type)}
 有效期至: {result['end_date'] if result['end_date'] else '永久'}
-创建时间: {result['created_at']}"""
+创建时间: {result['created_at']}
+授权码:
+""" + "\n".join(r['license_key'] for r in results)
             
             self.result_text.delete("1.0", "end")
             self.result_text.insert("1.0", result_text)
@@ -447,9 +602,8 @@ class LicenseApp(ctk.CTk):
             # 清空输入框
             self.email_entry.delete(0, "end")
             
-            # 刷新列表
+            # 刷新列表和统计信息
             self.refresh_license_list()
-            self.update_stats()
             
         except Exception as e:
             messagebox.showerror("错误", f"生成授权码失败: {str(e)}")
@@ -504,14 +658,42 @@ class LicenseApp(ctk.CTk):
             messagebox.showerror("错误", f"验证授权码失败: {str(e)}")
     
     def refresh_license_list(self):
-        """刷新授权码列表"""
+        """重新统计并刷新授权码列表，回到第一页"""
+        self.update_stats()
+        self.page_cursors = [None]
+        self.load_license_page()
+    
+    def next_license_page(self):
+        """显示下一页"""
+        if self.next_page_cursor is not None:
+            self.page_cursors.append(self.next_page_cursor)
+            self.load_license_page()
+    
+    def prev_license_page(self):
+        """显示上一页"""
+        if len(self.page_cursors) > 1:
+            self.page_cursors.pop()
+            self.load_license_page()
+    
+    def load_license_page(self):
+        """加载当前页的授权码"""
         try:
             # 清空现有数据
             for item in self.license_tree.get_children():
                 self.license_tree.delete(item)
             
-            # 获取所有授权码
-            licenses = self.license_manager.get_all_licenses()
+            # 每页只读取 LICENSE_PAGE_SIZE 条，不加载全部记录
+            licenses, self.next_page_cursor = self.license_manager.get_license_page(
+                LICENSE_PAGE_SIZE, self.page_cursors[-1]
+            )
+            # 总数使用刷新时缓存的统计信息
+            page = len(self.page_cursors)
+            page_text = f"第 {page} 页（每页 {LICENSE_PAGE_SIZE} 条）"
+            if self.stats is not None:
+                page_text += f"，共 {self.stats['total']} 条"
+            self.page_label.configure(text=page_text)
+            self.prev_page_btn.configure(state="normal" if page > 1 else "disabled")
+            self.next_page_btn.configure(state="normal" if self.next_page_cursor is not None else "disabled")
             
             plan_names = {
                 "trial1": "1天试用",
@@ -556,27 +738,30 @@ class LicenseApp(ctk.CTk):
             )
             
             if file_path:
-                self.license_manager.export_licenses(file_path)
-                messagebox.showinfo("成功", f"授权码已导出到: {file_path}")
+                count = self.license_manager.export_licenses(file_path)
+                messagebox.showinfo("成功", f"已导出 {count} 个授权码到: {file_path}")
                 
         except Exception as e:
             messagebox.showerror("错误", f"导出失败: {str(e)}")
     
+    def on_close(self):
+        """关闭窗口"""
+        self.license_manager.close()
+        self.destroy()
+    
     def change_theme(self, theme):
         """切换主题"""
         ctk.set_appearance_mode(theme)
     
     def update_stats(self):
-        """更新统计信息"""
+        """重新统计授权码数量并缓存"""
         try:
-            licenses = self.license_manager.get_all_licenses()
-            total = len(licenses)
-            active = sum(1 for l in licenses if l['is_active'])
-            expired = sum(1 for l in licenses if l['is_active'] and l['end_date'] and datetime.fromisoformat(l['end_date']) < datetime.now())
+            stats = self.license_manager.get_stats()
+            self.stats = stats
             
-            stats_text = f"""总授权码数: {total}
-有效授权码: {active}
-过期授权码: {expired}"""
+            stats_text = f"""总授权码数: {stats['total']}
+有效授权码: {stats['active']}
+过期授权码: {stats['expired']}"""
             
             self.stats_label.configure(text=stats_text)
             
@@ -1,38 +1,206 @@
 """
 软件秘钥授权系统 - FastAPI 主应用
 """
+import io
 import os
+import csv
+import json
+import base64
+import binascii
+import time
+import uuid
+import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Optional
-from fastapi import FastAPI, HTTPException, Depends, status
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Tuple
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 
+# 加载环境变量（需在导入项目模块之前，database/utils 中的全局实例在导入时读取配置）
+load_dotenv()
+
 from database.models import (
     LicenseVerifyResponse, LicenseGenerateRequest, LicenseGenerateResponse,
+    LicenseBatchVerifyRequest, LicenseBatchVerifyResponse, LicenseBatchGenerateRequest,
+    LicenseTokenKeyResponse, ProfilingStartRequest,
     LicenseStatus, PlanType
 )
-from database.connection import db_manager
-from utils.license_generator import generate_license_key
-from utils.validators import validate_license_key_format
-
-# 加载环境变量
-load_dotenv()
+from database.connection import db_manager, async_db_manager, DatabaseBusyError
+from database.queries import VERIFY_COLUMNS, LICENSE_ROW_COLUMNS, LICENSE_STATUS_FILTERS
+from utils.license_generator import (
+    generate_license_key, generate_batch_license_keys, iter_license_key_chunks
+)
+from utils.key_format import normalize_license_key
+from utils.verify_response import (
+    VERIFY_FAST_RESPONSE, INVALID_FORMAT_RESPONSE, NOT_FOUND_RESPONSE, DISABLED_RESPONSE, EXPIRED_RESPONSE,
+    PreEncodedJSONResponse, ValidLicenseResult, VerifyResult,
+    encode_verify_response, encode_batch_verify_response, to_verify_model,
+)
+from utils.cache import verify_cache
+from utils.bloom_filter import license_key_filter
+from utils.license_token import get_token_signer
+from utils.logging_config import setup_logging, stop_logging
+from utils.metrics import (
+    metrics_registry, license_verify_total, license_expiry_swept_total, CONTENT_TYPE as METRICS_CONTENT_TYPE
+)
+from utils.profiler import request_profiler
+from utils.security import verify_admin_token
+from middleware.metrics_middleware import MetricsMiddleware
+from middleware.security_middleware import ProfilingMiddleware
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
+# 配置日志（后台线程写出，常规事件按类型抽样）
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# 授权码过滤器增量同步和全量重建间隔（秒）
+KEY_FILTER_SYNC_INTERVAL = float(os.getenv("BLOOM_SYNC_INTERVAL", "10"))
+KEY_FILTER_REBUILD_INTERVAL = float(os.getenv("BLOOM_REBUILD_INTERVAL", "3600"))
+# 增量同步向前重叠扫描的时间（秒），需长于最长的写入事务：
+# created_at 在写入时确定而不是提交时，事务提交前读取的同步起点之前可能还有未提交的授权码
+KEY_FILTER_SYNC_OVERLAP = float(os.getenv("BLOOM_SYNC_OVERLAP", "300"))
+
+# 过期授权码清理间隔（秒，0 表示关闭）和每个事务标记的最大条数
+EXPIRY_SWEEP_INTERVAL = float(os.getenv("EXPIRY_SWEEP_INTERVAL", "60"))
+EXPIRY_SWEEP_BATCH_SIZE = int(os.getenv("EXPIRY_SWEEP_BATCH_SIZE", "1000"))
+
+def _shift_timestamp(value, seconds: float):
+    """将数据库返回的时间向前移动指定秒数（SQLite 返回文本，PostgreSQL 返回 datetime）"""
+    if isinstance(value, str):
+        return (datetime.fromisoformat(value) - timedelta(seconds=seconds)).isoformat(sep=" ")
+    return value - timedelta(seconds=seconds)
+
+
+def _rebuild_key_filter():
+    """
+    从数据库全量重建授权码过滤器
+    
+    Returns:
+        重建开始时的数据库时间，作为下次增量同步的起点
+    """
+    watermark = db_manager.execute_query("SELECT CURRENT_TIMESTAMP AS now")[0]['now']
+    total = db_manager.execute_query("SELECT COUNT(*) AS total FROM licenses")[0]['total']
+    keys = (row['license_key'] for row in db_manager.iter_query("SELECT license_key FROM licenses"))
+    license_key_filter.rebuild(keys, expected_count=total)
+    return watermark
+
+
+def _sync_key_filter(since):
+    """
+    将其他进程新写入的授权码同步到过滤器
+    
+    从上次同步起点向前重叠 KEY_FILTER_SYNC_OVERLAP 秒扫描，覆盖上次同步时仍未提交的事务
+    
+    Args:
+        since: 上次同步开始时的数据库时间
+        
+    Returns:
+        本次同步开始时的数据库时间
+    """
+    watermark = db_manager.execute_query("SELECT CURRENT_TIMESTAMP AS now")[0]['now']
+    rows = db_manager.iter_query(
+        "SELECT license_key FROM licenses WHERE created_at >= ?",
+        (_shift_timestamp(since, KEY_FILTER_SYNC_OVERLAP),)
+    )
+    license_key_filter.add_many(row['license_key'] for row in rows)
+    return watermark
+
+
+async def maintain_key_filter():
+    """
+    后台任务：启动时构建授权码过滤器，之后定期增量同步并全量重建
+
+    其他进程写入的授权码在下一次同步后才能通过过滤器，最长延迟 KEY_FILTER_SYNC_INTERVAL 秒
+    """
+    loop = asyncio.get_running_loop()
+    watermark = None
+    last_rebuild = 0.0
+    while True:
+        try:
+            if watermark is None or loop.time() - last_rebuild >= KEY_FILTER_REBUILD_INTERVAL:
+                watermark = await async_db_manager.run(_rebuild_key_filter)
+                last_rebuild = loop.time()
+            else:
+                watermark = await async_db_manager.run(_sync_key_filter, watermark)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"License key filter maintenance failed: {e}")
+        await asyncio.sleep(KEY_FILTER_SYNC_INTERVAL)
+
+
+async def _sweep_expired_once() -> int:
+    """
+    将已到期但仍标记为有效的授权码分批改为 expired
+    
+    每批一个事务，批次之间让出数据库线程池，避免长事务阻塞验证请求
+    
+    Returns:
+        int: 本轮标记的授权码数量
+    """
+    now = int(time.time())
+    total = 0
+    while True:
+        swept = await async_db_manager.execute_named_update(
+            "sweep_expired_licenses", (now, EXPIRY_SWEEP_BATCH_SIZE)
+        )
+        total += swept
+        if swept < EXPIRY_SWEEP_BATCH_SIZE:
+            break
+        await asyncio.sleep(0)
+    if total:
+        license_expiry_swept_total.inc(amount=total)
+        logger.info(f"Marked {total} licenses as expired")
+    return total
+
+
+async def sweep_expired_licenses():
+    """后台任务：定期将到期的授权码标记为 expired，保持部分索引只包含有效记录"""
+    while True:
+        try:
+            await _sweep_expired_once()
+        except asyncio.CancelledError:
+            raise
+        except DatabaseBusyError:
+            logger.warning("Expiry sweep skipped: database busy")
+        except Exception as e:
+            logger.error(f"Expiry sweep failed: {e}")
+        await asyncio.sleep(EXPIRY_SWEEP_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动后台任务，退出时释放数据库线程池和连接池"""
+    tasks = []
+    if license_key_filter.enabled:
+        tasks.append(asyncio.create_task(maintain_key_filter()))
+    if EXPIRY_SWEEP_INTERVAL > 0:
+        tasks.append(asyncio.create_task(sweep_expired_licenses()))
+    
+    yield
+    
+    for task in tasks:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    async_db_manager.shutdown()
+    db_manager.close()
+    stop_logging()
+
+
 # 创建FastAPI应用
 app = FastAPI(
     title="软件秘钥授权系统",
     description="支持多种授权类型的软件授权管理系统",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # 添加CORS中间件
@@ -44,6 +212,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 添加性能分析中间件（管理员开启后才会抽样请求）
+app.add_middleware(ProfilingMiddleware)
+
+# 添加指标中间件（最后添加的中间件最先执行，可以覆盖其他中间件的耗时）
+app.add_middleware(MetricsMiddleware)
+
+# 连接池和数据库线程池的实时状态
+metrics_registry.callback_gauge(
+    "db_pool_connections_in_use", "Database connections checked out from the pool",
+    lambda: db_manager.get_pool_stats()["in_use"]
+)
+metrics_registry.callback_gauge(
+    "db_executor_pending", "Database calls queued or running in the executor",
+    lambda: async_db_manager.get_stats()["pending"]
+)
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -57,6 +241,23 @@ PLAN_DAYS_MAPPING = {
     PlanType.LIFETIME: None  # 永久授权
 }
 
+# 批量验证时单条 IN 查询的最大参数数量（低于SQLite的变量上限）
+VERIFY_QUERY_CHUNK_SIZE = 500
+
+
+def _epoch(value: Optional[datetime]) -> Optional[int]:
+    """到期时间转换为写入 end_ts 列的 epoch 秒"""
+    return int(value.timestamp()) if value else None
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """校验管理接口令牌（X-Admin-Token 请求头）"""
+    if not verify_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="管理令牌无效"
+        )
+
 
 @app.get("/", response_model=dict)
 async def root():
@@ -68,21 +269,34 @@ async def root():
         "docs": "/docs",
         "endpoints": {
             "verify": "/verify/{license_key}",
-            "generate": "/generate"
+            "verify_batch": "/verify/batch",
+            "generate": "/generate",
+            "generate_batch": "/generate/batch",
+            "metrics": "/metrics"
         }
     }
 
 
+@app.get("/metrics", response_class=Response)
+async def metrics():
+    """Prometheus格式的运行指标"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/health", response_model=dict)
 async def health_check():
     """健康检查接口"""
     try:
         # 测试数据库连接
-        db_manager.execute_query("SELECT 1")
+        await async_db_manager.execute_named("health_check")
         return {
             "status": "healthy",
             "timestamp": datetime.now().isoformat(),
-            "database": "connected"
+            "database": "connected",
+            "pool": db_manager.get_pool_stats(),
+            "executor": async_db_manager.get_stats(),
+            "cache": verify_cache.stats(),
+            "key_filter": license_key_filter.stats()
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -92,74 +306,229 @@ async def health_check():
         )
 
 
+def _build_verify_response(license_data: dict):
+    """
+    根据数据库记录生成验证结果
+    
+    Args:
+        license_data: 授权码记录，status 列为物化状态，尚未清理的到期记录已由数据库按 end_ts 判断为过期
+        
+    Returns:
+        tuple: (验证结果, 有效授权的到期时间epoch秒)
+    """
+    license_key = license_data['license_key']
+    license_status = license_data['status']
+    
+    if license_status == LicenseStatus.DISABLED:
+        logger.warning("License key disabled: %s", license_key, extra={"event": "verify.disabled"})
+        return DISABLED_RESPONSE, None
+    
+    if license_status == LicenseStatus.EXPIRED:
+        logger.warning("License key expired: %s", license_key, extra={"event": "verify.expired"})
+        return EXPIRED_RESPONSE, None
+    
+    # 授权码有效：到期时间直接使用数据库中的值，不解析为 datetime
+    logger.info("License key verified successfully: %s", license_key, extra={"event": "verify.valid"})
+    plan_type = license_data['plan_type']
+    end_ts = license_data['end_ts'] if plan_type != PlanType.LIFETIME.value else None
+    end_date = license_data['end_date']
+    if end_date is not None and not isinstance(end_date, str):
+        # PostgreSQL 返回 datetime，SQLite 返回写入时的 isoformat() 文本
+        end_date = end_date.isoformat()
+    return ValidLicenseResult(plan_type, end_date, end_ts, license_data['user_email']), end_ts
+
+
+def _require_token_signer():
+    """
+    获取令牌签发器，签名配置无效（如 SECRET_KEY 未设置）时返回503
+
+    在请求令牌的接口处理前调用，避免写入数据后才发现无法签发
+    """
+    try:
+        return get_token_signer()
+    except ValueError as e:
+        logger.error(f"License token signer unavailable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="离线验证令牌签名未配置"
+        )
+
+
+def _attach_token(response: VerifyResult, license_key: str) -> VerifyResult:
+    """为有效的验证结果附加签名令牌（返回副本，不修改缓存中的结果）"""
+    if response.status != LicenseStatus.VALID:
+        return response
+    token = get_token_signer().issue(license_key, response.plan_type, response.end_ts)
+    return response.with_token(token)
+
+
+def _fetch_licenses(license_keys: List[str]) -> Dict[str, dict]:
+    """
+    批量查询授权码记录
+    
+    Args:
+        license_keys: 授权码列表（已去重）
+        
+    Returns:
+        Dict[str, dict]: {授权码: 记录}
+    """
+    found = {}
+    now = int(time.time())
+    if db_manager.is_postgresql:
+        # PostgreSQL使用数组参数，一条查询完成
+        query = f"SELECT {VERIFY_COLUMNS} FROM licenses WHERE license_key = ANY(?)"
+        for row in db_manager.execute_query(query, (now, license_keys)):
+            found[row['license_key']] = row
+        return found
+    
+    for start in range(0, len(license_keys), VERIFY_QUERY_CHUNK_SIZE):
+        chunk = license_keys[start:start + VERIFY_QUERY_CHUNK_SIZE]
+        placeholders = ", ".join("?" for _ in chunk)
+        query = f"SELECT {VERIFY_COLUMNS} FROM licenses WHERE license_key IN ({placeholders})"
+        for row in db_manager.execute_query(query, (now, *chunk)):
+            found[row['license_key']] = row
+    return found
+
+
+async def _lookup_license(license_key: str) -> VerifyResult:
+    """按缓存、过滤器、数据库的顺序验证单个授权码（需已规范化）"""
+    # 优先使用缓存的验证结果
+    cached = verify_cache.get(license_key)
+    if cached is not None:
+        return cached
+    
+    # 过滤器未命中的授权码一定不存在，不查询数据库（过滤器构建完成前总是视为命中）
+    if not license_key_filter.might_contain(license_key):
+        logger.debug("License key rejected by filter: %s", license_key, extra={"event": "verify.filtered"})
+        verify_cache.set(license_key, NOT_FOUND_RESPONSE, negative=True)
+        return NOT_FOUND_RESPONSE
+    
+    results = await async_db_manager.execute_named("verify_license", (int(time.time()), license_key))
+    if not results:
+        logger.warning("License key not found: %s", license_key, extra={"event": "verify.not_found"})
+        response = NOT_FOUND_RESPONSE
+        verify_cache.set(license_key, response, negative=True)
+        return response
+    
+    response, end_ts = _build_verify_response(results[0])
+    # 缓存有效期不超过授权到期时间
+    verify_cache.set(license_key, response, end_ts=end_ts)
+    return response
+
+
 @app.get("/verify/{license_key}", response_model=LicenseVerifyResponse)
-async def verify_license(license_key: str):
+async def verify_license(license_key: str, include_token: bool = False):
     """
     验证授权码
     
     Args:
         license_key: 授权码
+        include_token: 是否在有效时返回可离线校验的签名令牌
         
     Returns:
         LicenseVerifyResponse: 验证结果
     """
+    if include_token:
+        _require_token_signer()
     try:
-        # 验证授权码格式
-        if not validate_license_key_format(license_key):
-            return LicenseVerifyResponse(
-                status=LicenseStatus.NOT_FOUND,
-                message="授权码格式无效"
-            )
+        # 规范化授权码（大小写、空白、分隔符），格式无效时不查询缓存和数据库
+        normalized = normalize_license_key(license_key)
+        if normalized is None:
+            response = INVALID_FORMAT_RESPONSE
+        else:
+            license_key = normalized
+            response = await _lookup_license(license_key)
+        license_verify_total.inc(response.status.value)
+        if include_token:
+            response = _attach_token(response, license_key)
+        if VERIFY_FAST_RESPONSE:
+            return PreEncodedJSONResponse(encode_verify_response(response))
+        return to_verify_model(response)
         
-        # 查询数据库
-        query = """
-        SELECT id, license_key, user_email, plan_type, start_date, end_date, is_active
-        FROM licenses 
-        WHERE license_key = ?
-        """
+    except DatabaseBusyError as e:
+        logger.warning(f"Database busy while verifying license key {license_key}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后再试"
+        )
+    except Exception as e:
+        logger.error(f"Error verifying license key {license_key}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="服务器内部错误"
+        )
+
+
+@app.post("/verify/batch", response_model=LicenseBatchVerifyResponse)
+async def verify_license_batch(request: LicenseBatchVerifyRequest):
+    """
+    批量验证授权码
+    
+    Args:
+        request: 待验证的授权码列表
         
-        results = db_manager.execute_query(query, (license_key,))
+    Returns:
+        LicenseBatchVerifyResponse: 与请求顺序一致的验证结果
+    """
+    if request.include_token:
+        _require_token_signer()
+    try:
+        results: List[Optional[VerifyResult]] = [None] * len(request.license_keys)
+        pending: Dict[str, List[int]] = {}
+        license_keys = [normalize_license_key(key) for key in request.license_keys]
         
-        if not results:
-            logger.warning(f"License key not found: {license_key}")
-            return LicenseVerifyResponse(
-                status=LicenseStatus.NOT_FOUND,
-                message="授权码不存在"
-            )
+        for index, license_key in enumerate(license_keys):
+            if license_key is None:
+                results[index] = INVALID_FORMAT_RESPONSE
+                continue
+            
+            cached = verify_cache.get(license_key)
+            if cached is not None:
+                results[index] = cached
+            elif not license_key_filter.might_contain(license_key):
+                # 过滤器未命中的授权码一定不存在，不查询数据库
+                results[index] = NOT_FOUND_RESPONSE
+            else:
+                pending.setdefault(license_key, []).append(index)
         
-        license_data = results[0]
+        # 剩余的授权码通过一次查询批量获取
+        if pending:
+            found = await async_db_manager.run(_fetch_licenses, list(pending))
+            for license_key, indexes in pending.items():
+                license_data = found.get(license_key)
+                if license_data is None:
+                    response = NOT_FOUND_RESPONSE
+                    verify_cache.set(license_key, response, negative=True)
+                else:
+                    response, end_ts = _build_verify_response(license_data)
+                    verify_cache.set(license_key, response, end_ts=end_ts)
+                for index in indexes:
+                    results[index] = response
         
-        # 检查是否被禁用
-        if not license_data['is_active']:
-            logger.warning(f"License key disabled: {license_key}")
-            return LicenseVerifyResponse(
-                status=LicenseStatus.DISABLED,
-                message="授权码已被禁用"
-            )
+        for response in results:
+            license_verify_total.inc(response.status.value)
         
-        # 检查是否过期（永久授权除外）
-        if license_data['plan_type'] != PlanType.LIFETIME and license_data['end_date']:
-            from datetime import datetime
-            end_date = datetime.fromisoformat(license_data['end_date'])
-            if datetime.now() > end_date:
-                logger.warning(f"License key expired: {license_key}")
-                return LicenseVerifyResponse(
-                    status=LicenseStatus.EXPIRED,
-                    message="授权码已过期"
-                )
-        
-        # 授权码有效
-        logger.info(f"License key verified successfully: {license_key}")
-        return LicenseVerifyResponse(
-            status=LicenseStatus.VALID,
-            plan_type=PlanType(license_data['plan_type']),
-            end_date=datetime.fromisoformat(license_data['end_date']) if license_data['end_date'] else None,
-            user_email=license_data['user_email'],
-            message="授权码验证成功"
+        logger.info(
+            "Batch verified %d license keys, %d queried from database",
+            len(request.license_keys), len(pending), extra={"event": "verify.batch"}
         )
+        if request.include_token:
+            results = [
+                _attach_token(response, license_key)
+                for response, license_key in zip(results, license_keys)
+            ]
+        if VERIFY_FAST_RESPONSE:
+            return PreEncodedJSONResponse(encode_batch_verify_response(results))
+        return LicenseBatchVerifyResponse(results=[to_verify_model(response) for response in results])
         
+    except DatabaseBusyError as e:
+        logger.warning(f"Database busy while batch verifying license keys: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后再试"
+        )
     except Exception as e:
-        logger.error(f"Error verifying license key {license_key}: {e}")
+        logger.error(f"Error batch verifying license keys: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="服务器内部错误"
@@ -177,6 +546,8 @@ async def generate_license(request: LicenseGenerateRequest):
     Returns:
         LicenseGenerateResponse: 生成的授权码信息
     """
+    if request.include_token:
+        _require_token_signer()
     try:
         # 生成唯一的授权码
         license_key = generate_license_key()
@@ -188,16 +559,10 @@ async def generate_license(request: LicenseGenerateRequest):
             end_date = datetime.now() + timedelta(days=days)
         
         # 插入数据库
-        insert_query = """
-        INSERT INTO licenses (id, license_key, user_email, plan_type, start_date, end_date, is_active)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """
-        
-        import uuid
         license_id = str(uuid.uuid4())
         
-        db_manager.execute_insert(
-            insert_query,
+        await async_db_manager.execute_named_update(
+            "insert_license",
             (
                 license_id,
                 license_key,
@@ -205,10 +570,15 @@ async def generate_license(request: LicenseGenerateRequest):
                 request.plan_type.value,
                 datetime.now().isoformat(),
                 end_date.isoformat() if end_date else None,
+                _epoch(end_date),
                 True
             )
         )
         
+        # 写入后使该授权码的缓存结果失效，并加入过滤器
+        verify_cache.invalidate(license_key)
+        license_key_filter.add(license_key)
+        
         logger.info(f"Generated new license key: {license_key} for plan: {request.plan_type}")
         
         return LicenseGenerateResponse(
@@ -216,9 +586,16 @@ async def generate_license(request: LicenseGenerateRequest):
             plan_type=request.plan_type,
             end_date=end_date,
             user_email=request.user_email,
-            message=f"成功生成{request.plan_type.value}授权码"
+            message=f"成功生成{request.plan_type.value}授权码",
+            token=get_token_signer().issue(license_key, request.plan_type.value, _epoch(end_date)) if request.include_token else None
         )
         
+    except DatabaseBusyError as e:
+        logger.warning(f"Database busy while generating license key: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后再试"
+        )
     except Exception as e:
         logger.error(f"Error generating license key: {e}")
         raise HTTPException(
@@ -227,6 +604,546 @@ async def generate_license(request: LicenseGenerateRequest):
         )
 
 
+# 批量生成时每次补发冲突授权码的最大重试次数
+BATCH_GENERATE_MAX_ATTEMPTS = 5
+# 批量生成时每批生成和写入的授权码数量
+BATCH_GENERATE_CHUNK_SIZE = 5000
+LICENSE_INSERT_COLUMNS = ["id", "license_key", "user_email", "plan_type", "start_date", "end_date", "end_ts", "is_active"]
+
+
+
+def _insert_license_chunk(conn, license_keys: List[str], plan_type: PlanType, user_email: Optional[str],
+                          start_value: str, end_value: Optional[str], end_ts: Optional[int]) -> List[str]:
+    """
+    写入一批授权码，与已有授权码冲突的行会被跳过，并重新生成补足
+    
+    Returns:
+        List[str]: 成功写入的授权码
+    """
+    issued: List[str] = []
+    pending = license_keys
+    
+    for _ in range(BATCH_GENERATE_MAX_ATTEMPTS):
+        rows = [
+            (str(uuid.uuid4()), key, user_email, plan_type.value, start_value, end_value, end_ts, True)
+            for key in pending
+        ]
+        inserted = db_manager.insert_many(
+            conn, "licenses", LICENSE_INSERT_COLUMNS, rows, conflict_column="license_key"
+        )
+        if inserted == len(rows):
+            issued.extend(pending)
+            return issued
+        
+        # 找出本批实际写入的行，其余授权码已存在，需要重新生成
+        written = set()
+        ids = [row[0] for row in rows]
+        for start in range(0, len(ids), VERIFY_QUERY_CHUNK_SIZE):
+            chunk = ids[start:start + VERIFY_QUERY_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            for row in db_manager.execute_query(
+                f"SELECT license_key FROM licenses WHERE id IN ({placeholders})",
+                tuple(chunk),
+                conn=conn
+            ):
+                written.add(row['license_key'])
+        issued.extend(key for key in pending if key in written)
+        
+        # 新生成的授权码如果仍与已有授权码冲突，会在下一轮被数据库唯一约束跳过
+        missing = len(pending) - len(written)
+        logger.warning(f"Regenerating {missing} colliding license keys")
+        pending = list(generate_batch_license_keys(missing))
+    
+    raise RuntimeError("无法生成足够数量的唯一授权码")
+
+
+def _delete_licenses(license_keys: List[str]):
+    """删除尚未交付的授权码（批量生成中途失败时撤销已提交的批次）"""
+    with db_manager.transaction() as conn:
+        db_manager.delete_many(conn, "licenses", "license_key", license_keys, chunk_size=VERIFY_QUERY_CHUNK_SIZE)
+
+
+def _issue_license_batch(plan_type: PlanType, user_email: Optional[str], count: int,
+                         start_date: datetime, end_date: Optional[datetime]) -> List[str]:
+    """
+    批量写入新授权码
+    
+    授权码分批生成和写入，每批单独提交，不会在整个批量生成期间占用写锁；
+    中途失败时删除本次已提交的授权码，调用方不会拿到部分结果
+    
+    Returns:
+        List[str]: 成功写入的授权码
+    """
+    start_value = start_date.isoformat()
+    end_value = end_date.isoformat() if end_date else None
+    end_ts = _epoch(end_date)
+    issued: List[str] = []
+    
+    try:
+        for license_keys in iter_license_key_chunks(count, BATCH_GENERATE_CHUNK_SIZE):
+            with db_manager.transaction() as conn:
+                issued.extend(_insert_license_chunk(
+                    conn, license_keys, plan_type, user_email, start_value, end_value, end_ts
+                ))
+    except Exception:
+        if issued:
+            try:
+                _delete_licenses(issued)
+            except Exception as e:
+                logger.error(f"Failed to roll back {len(issued)} committed license keys: {e}")
+        raise
+    
+    return issued
+
+
+def _stream_generated_licenses(license_keys: List[str], plan_type: PlanType,
+                               end_date: Optional[datetime], user_email: Optional[str]):
+    """以NDJSON格式逐行输出生成的授权码"""
+    end_value = end_date.isoformat() if end_date else None
+    for start in range(0, len(license_keys), 1000):
+        yield "".join(
+            json.dumps({
+                "license_key": key,
+                "plan_type": plan_type.value,
+                "end_date": end_value,
+                "user_email": user_email
+            }, ensure_ascii=False) + "\n"
+            for key in license_keys[start:start + 1000]
+        )
+
+
+@app.post("/generate/batch", response_class=StreamingResponse, dependencies=[Depends(require_admin)])
+async def generate_license_batch(request: LicenseBatchGenerateRequest):
+    """
+    批量生成授权码（管理接口）
+    
+    授权码分批提交，全部写入后以NDJSON格式流式返回，每行一个授权码
+    
+    Args:
+        request: 批量生成请求参数
+        
+    Returns:
+        StreamingResponse: application/x-ndjson 格式的授权码列表
+    """
+    try:
+        start_date = datetime.now()
+        end_date = None
+        if request.plan_type != PlanType.LIFETIME:
+            days = PLAN_DAYS_MAPPING[request.plan_type]
+            end_date = start_date + timedelta(days=days)
+        
+        license_keys = await async_db_manager.run(
+            _issue_license_batch,
+            request.plan_type,
+            request.user_email,
+            request.count,
+            start_date,
+            end_date
+        )
+        
+        # 写入后使这些授权码的缓存结果失效，并加入过滤器
+        for license_key in license_keys:
+            verify_cache.invalidate(license_key)
+        license_key_filter.add_many(license_keys)
+        
+        logger.info(f"Generated {len(license_keys)} license keys for plan: {request.plan_type}")
+        
+        return StreamingResponse(
+            _stream_generated_licenses(license_keys, request.plan_type, end_date, request.user_email),
+            media_type="application/x-ndjson",
+            headers={"X-License-Count": str(len(license_keys))}
+        )
+        
+    except DatabaseBusyError as e:
+        logger.warning(f"Database busy while generating license batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后再试"
+        )
+    except Exception as e:
+        logger.error(f"Error generating license batch: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="批量生成授权码失败"
+        )
+
+
+@app.get("/token/public-key", response_model=LicenseTokenKeyResponse)
+async def token_public_key():
+    """
+    获取离线校验令牌所需的公钥
+    
+    Returns:
+        LicenseTokenKeyResponse: 签名算法和PEM公钥（HMAC模式下公钥为空）
+    """
+    signer = _require_token_signer()
+    return LicenseTokenKeyResponse(
+        algorithm=signer.algorithm,
+        public_key=signer.public_key_pem()
+    )
+
+
+@app.get("/admin/profiling", response_model=dict, dependencies=[Depends(require_admin)])
+async def profiling_status():
+    """获取性能分析状态"""
+    return request_profiler.status()
+
+
+@app.post("/admin/profiling/start", response_model=dict, dependencies=[Depends(require_admin)])
+async def start_profiling(request: ProfilingStartRequest):
+    """
+    开启性能分析窗口
+    
+    Args:
+        request: 分析模式、抽样比例和窗口时长
+        
+    Returns:
+        dict: 分析状态
+    """
+    request_profiler.start(request.mode.value, request.sample_rate, request.duration)
+    return request_profiler.status()
+
+
+@app.post("/admin/profiling/stop", response_model=dict, dependencies=[Depends(require_admin)])
+async def stop_profiling():
+    """停止性能分析，保留已收集的结果"""
+    request_profiler.stop()
+    return request_profiler.status()
+
+
+@app.get("/admin/profiling/download", dependencies=[Depends(require_admin)])
+async def download_profile(format: str = "pstats"):
+    """
+    下载性能分析结果
+    
+    Args:
+        format: pstats、text 或 collapsed
+    """
+    try:
+        content, filename, media_type = request_profiler.export(format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# 到期报表单次返回的最大授权码数量
+EXPIRING_REPORT_MAX_LIMIT = 1000
+
+
+@app.get("/admin/reports/expiring", response_model=dict, dependencies=[Depends(require_admin)])
+async def expiring_licenses_report(days: int = 7, limit: int = 100):
+    """
+    即将到期的有效授权码报表（按 end_ts 范围扫描索引）
+    
+    Args:
+        days: 统计从现在起多少天内到期的授权码
+        limit: 返回的授权码明细数量上限
+        
+    Returns:
+        dict: 按授权类型汇总的数量和按到期时间排序的明细
+    """
+    if not 1 <= days <= 3650 or not 0 <= limit <= EXPIRING_REPORT_MAX_LIMIT:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="参数超出范围")
+    
+    start = int(time.time())
+    end = start + days * 86400
+    try:
+        counts = await async_db_manager.execute_named("expiring_license_counts", (start, end))
+        licenses = await async_db_manager.execute_named("expiring_licenses", (start, end, limit)) if limit else []
+    except DatabaseBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后再试"
+        )
+    
+    by_plan = {row['plan_type']: row['count'] for row in counts}
+    return {
+        "from": datetime.fromtimestamp(start).isoformat(),
+        "to": datetime.fromtimestamp(end).isoformat(),
+        "total": sum(by_plan.values()),
+        "by_plan": by_plan,
+        "licenses": [
+            {
+                "license_key": row['license_key'],
+                "user_email": row['user_email'],
+                "plan_type": row['plan_type'],
+                "end_date": row['end_date'],
+            }
+            for row in licenses
+        ],
+    }
+
+
+# 导出时每批从数据库读取的行数
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+# 每个进程同时进行的导出数量上限，超出时返回503
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+_export_slots = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+EXPORT_COLUMNS = [
+    "id", "license_key", "user_email", "plan_type", "status",
+    "start_date", "end_date", "created_at", "updated_at"
+]
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _db_timestamp(value: datetime) -> str:
+    """转换为与 created_at 列比较的时间文本，带时区的时间先转换为UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(sep=" ")
+
+
+def _license_filters(now: int, plan_type: Optional[PlanType] = None, license_status: Optional[LicenseStatus] = None,
+                     user_email: Optional[str] = None, created_from: Optional[datetime] = None,
+                     created_to: Optional[datetime] = None) -> Tuple[List[str], list]:
+    """
+    构造授权码列表的筛选条件
+    
+    Args:
+        now: 当前时间的 epoch 秒，用于判断尚未被清理的过期记录
+        
+    Returns:
+        tuple: (条件列表, 参数列表)
+        
+    Raises:
+        HTTPException: 状态不能用于筛选
+    """
+    conditions: List[str] = []
+    params: list = []
+    if plan_type is not None:
+        conditions.append("plan_type = ?")
+        params.append(plan_type.value)
+    if license_status is not None:
+        condition = LICENSE_STATUS_FILTERS.get(license_status.value)
+        if condition is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="不支持按该状态筛选")
+        conditions.append(condition)
+        params.extend([now] * condition.count("?"))
+    if user_email is not None:
+        conditions.append("user_email = ?")
+        params.append(user_email)
+    if created_from is not None:
+        conditions.append("created_at >= ?")
+        params.append(_db_timestamp(created_from))
+    if created_to is not None:
+        conditions.append("created_at < ?")
+        params.append(_db_timestamp(created_to))
+    return conditions, params
+
+
+def _export_value(value):
+    """数据库返回的时间统一输出为ISO格式"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_ndjson(rows: List[dict]) -> str:
+    return "".join(
+        json.dumps({column: _export_value(row[column]) for column in EXPORT_COLUMNS}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _encode_csv(rows: List[dict]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows([_export_value(row[column]) for column in EXPORT_COLUMNS] for row in rows)
+    return buffer.getvalue()
+
+
+def _export_query(conditions: List[str], keyset: bool) -> str:
+    """导出的分批查询：按 (created_at, id) 顺序，从上一批最后一行之后继续"""
+    if keyset:
+        conditions = conditions + ["(created_at, id) > (?, ?)"]
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {LICENSE_ROW_COLUMNS} FROM licenses{where} ORDER BY created_at, id LIMIT ?"
+
+
+async def _stream_license_export(first: List[dict], conditions: List[str], params: list, format: str):
+    """逐批读取并编码导出数据，每次只保留一批行；每批是独立的查询，批次之间不占用数据库连接"""
+    encode = _encode_csv if format == "csv" else _encode_ndjson
+    query = _export_query(conditions, keyset=True)
+    rows = first
+    try:
+        if format == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\n"
+        while rows:
+            yield encode(rows)
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                break
+            last = rows[-1]
+            rows = await async_db_manager.execute_query(
+                query, tuple(params + [last['created_at'], last['id'], EXPORT_CHUNK_SIZE])
+            )
+    except Exception as e:
+        # 响应头已经发出，只能中断连接
+        logger.error(f"License export aborted: {e}")
+        raise
+
+
+class _ExportResponse(StreamingResponse):
+    """导出响应：发送结束或客户端断开后释放导出名额"""
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            _export_slots.release()
+
+
+@app.get("/licenses/export", response_class=StreamingResponse, dependencies=[Depends(require_admin)])
+async def export_licenses(
+    format: str = "ndjson",
+    plan_type: Optional[PlanType] = None,
+    license_status: Optional[LicenseStatus] = Query(None, alias="status"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """
+    流式导出授权码（管理接口）
+    
+    按 (created_at, id) 键集分批查询，每批查询完即归还连接，
+    下载慢的客户端不会长期占用连接池或数据库事务；内存占用与导出行数无关
+    
+    Args:
+        format: ndjson 或 csv
+        plan_type: 按授权类型筛选
+        license_status: 按授权状态筛选（valid、expired、disabled）
+        created_from: 创建时间下限（包含）
+        created_to: 创建时间上限（不包含）
+        
+    Returns:
+        StreamingResponse: 按创建时间顺序输出的授权码
+    """
+    media_type = EXPORT_MEDIA_TYPES.get(format)
+    if media_type is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="format 只能为 ndjson 或 csv")
+    
+    now = int(time.time())
+    conditions, params = _license_filters(
+        now, plan_type=plan_type, license_status=license_status,
+        created_from=created_from, created_to=created_to
+    )
+    params = [now] + params
+    
+    if _export_slots.locked():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="导出任务过多，请稍后再试"
+        )
+    await _export_slots.acquire()
+    
+    # 先读取第一批，数据库繁忙时还能返回503
+    try:
+        first = await async_db_manager.execute_query(
+            _export_query(conditions, keyset=False), tuple(params + [EXPORT_CHUNK_SIZE])
+        )
+    except BaseException as e:
+        _export_slots.release()
+        if isinstance(e, DatabaseBusyError):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="服务繁忙，请稍后再试"
+            )
+        raise
+    
+    filename = f"licenses-{datetime.now().strftime('%Y%m%d%H%M%S')}.{format}"
+    return _ExportResponse(
+        _stream_license_export(first, conditions, params, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+# 授权码列表每页的默认和最大条数
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 500
+
+
+def _encode_cursor(row: dict) -> str:
+    """将一页最后一行的 (created_at, id) 编码为翻页游标"""
+    payload = json.dumps([_export_value(row['created_at']), row['id']], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    解码翻页游标
+    
+    Raises:
+        HTTPException: 游标无效
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, license_id = json.loads(payload)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor 无效")
+    if not isinstance(created_at, str) or not isinstance(license_id, str):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cursor 无效")
+    return created_at, license_id
+
+
+@app.get("/licenses", response_model=dict, dependencies=[Depends(require_admin)])
+async def list_licenses(
+    limit: int = LIST_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    plan_type: Optional[PlanType] = None,
+    license_status: Optional[LicenseStatus] = Query(None, alias="status"),
+    user_email: Optional[str] = Query(None, alias="email"),
+):
+    """
+    按创建时间倒序分页列出授权码（管理接口）
+    
+    使用 (created_at, id) 键集分页，从上一页最后一行继续扫描索引，任意页的代价只与每页条数有关
+    
+    Args:
+        limit: 每页条数
+        cursor: 上一页返回的 next_cursor，为空时返回第一页
+        plan_type: 按授权类型筛选
+        license_status: 按授权状态筛选（valid、expired、disabled）
+        user_email: 按用户邮箱筛选
+        
+    Returns:
+        dict: 当前页的授权码和下一页游标（没有更多数据时为 null）
+    """
+    if not 1 <= limit <= LIST_MAX_LIMIT:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="参数超出范围")
+    
+    now = int(time.time())
+    conditions, params = _license_filters(
+        now, plan_type=plan_type, license_status=license_status, user_email=user_email
+    )
+    if cursor:
+        conditions.append("(created_at, id) < (?, ?)")
+        params.extend(_decode_cursor(cursor))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    # 多取一行判断是否还有下一页
+    query = f"SELECT {LICENSE_ROW_COLUMNS} FROM licenses{where} ORDER BY created_at DESC, id DESC LIMIT ?"
+    
+    try:
+        rows = await async_db_manager.execute_query(query, tuple([now] + params + [limit + 1]))
+    except DatabaseBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后再试"
+        )
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "licenses": [{column: _export_value(row[column]) for column in EXPORT_COLUMNS} for row in rows],
+        "next_cursor": _encode_cursor(rows[-1]) if has_more else None,
+    }
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """全局异常处理器"""
@@ -0,0 +1,55 @@
+"""
+指标中间件
+"""
+import time
+
+from utils.metrics import (
+    http_requests_total,
+    http_requests_in_flight,
+    http_request_duration_seconds,
+)
+
+
+class MetricsMiddleware:
+    """
+    记录请求数量、处理中请求数和延迟
+
+    使用纯ASGI中间件，避免 BaseHTTPMiddleware 为每个请求创建额外任务
+    """
+
+    def __init__(self, app, exclude_paths=("/metrics",)):
+        """
+        Args:
+            app: ASGI应用
+            exclude_paths: 不记录的路径
+        """
+        self.app = app
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            http_requests_in_flight.dec(method)
+            # 使用路由模板而不是实际路径，避免授权码等路径参数造成标签膨胀
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            status = str(status_code)
+            http_requests_total.inc(method, route_path, status)
+            http_request_duration_seconds.observe(duration, method, route_path, status)
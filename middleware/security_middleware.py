@@ -9,6 +9,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from typing import Callable
 
 from utils.security import rate_limiter, input_sanitizer
+from utils.profiler import request_profiler
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +31,7 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         
         # 速率限制检查
         if not rate_limiter.is_allowed(client_ip):
-            logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+            logger.warning("Rate limit exceeded for IP: %s", client_ip, extra={"event": "security.rate_limited"})
             return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 content={
@@ -40,7 +41,10 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             )
         
         # 记录请求
-        logger.info(f"Request: {request.method} {request.url} from {client_ip}")
+        logger.info(
+            "Request: %s %s from %s", request.method, request.url, client_ip,
+            extra={"event": "http.request"}
+        )
         
         try:
             # 处理请求
@@ -115,7 +119,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         start_time = time.time()
         
         # 记录请求开始
-        logger.info(f"Request started: {request.method} {request.url}")
+        logger.info("Request started: %s %s", request.method, request.url, extra={"event": "http.request"})
         
         try:
             response = await call_next(request)
@@ -125,8 +129,9 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             
             # 记录请求完成
             logger.info(
-                f"Request completed: {request.method} {request.url} "
-                f"Status: {response.status_code} Time: {process_time:.3f}s"
+                "Request completed: %s %s Status: %s Time: %.3fs",
+                request.method, request.url, response.status_code, process_time,
+                extra={"event": "http.response"}
             )
             
             return response
@@ -138,3 +143,29 @@ class LoggingMiddleware(BaseHTTPMiddleware):
                 f"Error: {str(e)} Time: {process_time:.3f}s"
             )
             raise
+
+
+class ProfilingMiddleware:
+    """
+    性能分析中间件
+    
+    管理员开启分析后按比例抽样请求交给 request_profiler；未开启时只检查一个属性
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if not request_profiler.active or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        handle = request_profiler.begin()
+        if handle is None:
+            await self.app(scope, receive, send)
+            return
+        
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_profiler.end(handle)
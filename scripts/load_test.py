@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+并发压测脚本
+基于 asyncio 和 httpx，按请求配比对授权系统施压，统计吞吐量、错误率和延迟分布
+
+用法:
+    python scripts/load_test.py --url http://localhost:8000 --concurrency 500 --duration 60
+    python scripts/load_test.py --app main:app --concurrency 100 --duration 10
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import importlib
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.license_generator import generate_license_key
+
+
+DEFAULT_MIX = "verify_hit=70,verify_miss=20,generate=5,health=5"
+OPERATIONS = ("verify_hit", "verify_miss", "generate", "health")
+
+
+class LatencyHistogram:
+    """
+    对数分桶的延迟直方图
+
+    每个桶宽度约为1%，内存占用与请求数量无关
+    """
+
+    GROWTH = 1.01
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._log_growth = math.log(self.GROWTH)
+
+    def record(self, seconds: float):
+        """记录一次延迟（秒）"""
+        micros = max(seconds * 1e6, 1.0)
+        bucket = int(math.log(micros) / self._log_growth)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram"):
+        """合并另一个直方图"""
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        """
+        计算百分位延迟
+
+        Args:
+            p: 百分位（0-100）
+
+        Returns:
+            float: 延迟（秒），取所在桶的上界
+        """
+        if not self.count:
+            return 0.0
+        target = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(self.GROWTH ** (bucket + 1) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """生成毫秒为单位的统计摘要"""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3),
+            "min_ms": round(self.min * 1000, 3),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "p999_ms": round(self.percentile(99.9) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class OperationStats:
+    """单类请求的统计"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.status_codes: Dict[int, int] = {}
+
+    def record(self, seconds: float, status_code: Optional[int], ok: bool):
+        self.latency.record(seconds)
+        if status_code is not None:
+            self.status_codes[status_code] = self.status_codes.get(status_code, 0) + 1
+        if not ok:
+            self.errors += 1
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """
+    解析请求配比，如 verify_hit=70,verify_miss=20,generate=5,health=5
+
+    Returns:
+        Dict[str, float]: {请求类型: 权重}
+    """
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"未知的请求类型: {name}，可选: {', '.join(OPERATIONS)}")
+        mix[name] = float(weight)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("请求配比不能为空")
+    return mix
+
+
+class LoadTester:
+    """并发压测器"""
+
+    def __init__(self, client: httpx.AsyncClient, concurrency: int, duration: float,
+                 ramp_up: float, mix: Dict[str, float], seed_keys: int = 20):
+        """
+        Args:
+            client: HTTP客户端
+            concurrency: 并发数
+            duration: 压测时长（秒，不含预热数据准备）
+            ramp_up: 并发数从0增长到目标值的时间（秒）
+            mix: 请求配比
+            seed_keys: 压测前生成的授权码数量，用于验证命中请求
+        """
+        self.client = client
+        self.concurrency = concurrency
+        self.duration = duration
+        self.ramp_up = min(ramp_up, duration)
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.seed_keys = seed_keys
+        self.valid_keys: List[str] = []
+        self.stats: Dict[str, OperationStats] = {name: OperationStats() for name in OPERATIONS}
+        self.elapsed = 0.0
+
+    async def prepare(self):
+        """生成用于验证命中请求的授权码"""
+        if "verify_hit" not in self.operations:
+            return
+        for _ in range(self.seed_keys):
+            response = await self.client.post("/generate", json={"plan_type": "365d"})
+            response.raise_for_status()
+            self.valid_keys.append(response.json()["license_key"])
+
+    async def _request(self, operation: str):
+        """发送一次请求并记录结果"""
+        status_code = None
+        ok = False
+        start = time.perf_counter()
+        try:
+            if operation == "verify_hit":
+                response = await self.client.get(f"/verify/{random.choice(self.valid_keys)}")
+                ok = response.status_code == 200 and response.json().get("status") == "valid"
+            elif operation == "verify_miss":
+                response = await self.client.get(f"/verify/{generate_license_key()}")
+                ok = response.status_code == 200 and response.json().get("status") == "not_found"
+            elif operation == "generate":
+                response = await self.client.post("/generate", json={"plan_type": "30d"})
+                ok = response.status_code == 200
+            else:
+                response = await self.client.get("/health")
+                ok = response.status_code == 200
+            status_code = response.status_code
+        except httpx.HTTPError:
+            ok = False
+        self.stats[operation].record(time.perf_counter() - start, status_code, ok)
+
+    async def _worker(self, start_delay: float, deadline: float):
+        """单个并发用户：延迟启动后循环发送请求直到截止时间"""
+        await asyncio.sleep(start_delay)
+        while time.perf_counter() < deadline:
+            operation = random.choices(self.operations, self.weights)[0]
+            await self._request(operation)
+
+    async def run(self):
+        """执行压测"""
+        start = time.perf_counter()
+        deadline = start + self.duration
+        workers = [
+            self._worker(self.ramp_up * i / self.concurrency, deadline)
+            for i in range(self.concurrency)
+        ]
+        await asyncio.gather(*workers)
+        self.elapsed = time.perf_counter() - start
+
+    def report(self) -> Dict:
+        """汇总压测结果"""
+        total = LatencyHistogram()
+        requests = errors = 0
+        operations = {}
+        for name, stats in self.stats.items():
+            if not stats.latency.count:
+                continue
+            total.merge(stats.latency)
+            requests += stats.latency.count
+            errors += stats.errors
+            operations[name] = {
+                "requests": stats.latency.count,
+                "errors": stats.errors,
+                "error_rate": round(stats.errors / stats.latency.count, 4),
+                "status_codes": {str(k): v for k, v in sorted(stats.status_codes.items())},
+                "latency": stats.latency.summary(),
+            }
+        return {
+            "concurrency": self.concurrency,
+            "duration_s": round(self.elapsed, 3),
+            "requests": requests,
+            "errors": errors,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "throughput_rps": round(requests / self.elapsed, 2) if self.elapsed else 0.0,
+            "latency": total.summary(),
+            "operations": operations,
+        }
+
+
+def print_report(report: Dict):
+    """打印压测结果"""
+    print("\n=== 压测结果 ===")
+    print(f"并发数: {report['concurrency']}  时长: {report['duration_s']}s")
+    print(f"请求数: {report['requests']}  吞吐量: {report['throughput_rps']} req/s  "
+          f"错误率: {report['error_rate'] * 100:.2f}%")
+
+    header = f"{'类型':<12}{'请求数':>10}{'错误率':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'p999':>10}{'max':>10}"
+    print("\n" + header)
+    rows = list(report["operations"].items()) + [("total", {
+        "requests": report["requests"],
+        "error_rate": report["error_rate"],
+        "latency": report["latency"],
+    })]
+    for name, data in rows:
+        latency = data["latency"]
+        if not latency.get("count"):
+            continue
+        print(
+            f"{name:<12}{data['requests']:>10}{data['error_rate'] * 100:>9.2f}%"
+            f"{latency['p50_ms']:>8.2f}ms{latency['p95_ms']:>8.2f}ms"
+            f"{latency['p99_ms']:>8.2f}ms{latency['p999_ms']:>8.2f}ms{latency['max_ms']:>8.2f}ms"
+        )
+
+
+@asynccontextmanager
+async def open_client(url: Optional[str], app_path: Optional[str], concurrency: int):
+    """创建指向URL或进程内ASGI应用的HTTP客户端"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if url:
+        async with httpx.AsyncClient(base_url=url.rstrip("/"), limits=limits, timeout=30) as client:
+            yield client
+        return
+
+    module_name, _, attr = app_path.partition(":")
+    app = getattr(importlib.import_module(module_name), attr or "app")
+    transport = httpx.ASGITransport(app=app)
+    # ASGITransport不会触发lifespan，这里手动执行启动和关闭逻辑
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=30) as client:
+            yield client
+
+
+async def run_load_test(args) -> Dict:
+    """按命令行参数执行压测"""
+    async with open_client(args.url, args.app, args.concurrency) as client:
+        tester = LoadTester(
+            client,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            ramp_up=args.ramp_up,
+            mix=parse_mix(args.mix),
+            seed_keys=args.seed_keys
+        )
+        print("准备测试数据...")
+        await tester.prepare()
+        print(f"开始压测: 并发 {args.concurrency}，时长 {args.duration}s，预热 {tester.ramp_up}s")
+        await tester.run()
+        return tester.report()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="授权系统并发压测")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="API服务器地址，如 http://localhost:8000")
+    target.add_argument("--app", help="进程内ASGI应用，如 main:app")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发数（默认: 50）")
+    parser.add_argument("--duration", type=float, default=30, help="压测时长，秒（默认: 30）")
+    parser.add_argument("--ramp-up", type=float, default=5, help="并发数增长到目标值的时间，秒（默认: 5）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"请求配比（默认: {DEFAULT_MIX}）")
+    parser.add_argument("--seed-keys", type=int, default=20, help="用于验证命中请求的授权码数量（默认: 20）")
+    parser.add_argument("--json", dest="json_path", help="将结果以JSON格式写入文件")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args))
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.json_path}")
+
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 """
 数据库设置脚本
-用于初始化数据库表结构和示例数据
+执行数据库结构迁移并创建示例数据
 """
 import os
 import sys
-import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+import uuid
+from datetime import datetime, timedelta
+
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database.migrations import MigrationError, apply_migrations, connect, migration_status
+from database.queries import translate_placeholders
+from utils.license_generator import generate_license_key
+
 # 加载环境变量
 load_dotenv()
 
@@ -21,98 +28,57 @@ def get_database_connection():
         sys.exit(1)
     
     try:
-        conn = psycopg2.connect(database_url)
-        return conn
+        return connect(database_url)
     except Exception as e:
         print(f"数据库连接失败: {e}")
         sys.exit(1)
 
 
-def execute_sql_file(conn, file_path):
-    """执行SQL文件"""
+def run_migrations(conn, postgresql):
+    """执行数据库结构迁移"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
-        
-        cursor = conn.cursor()
-        cursor.execute(sql_content)
-        conn.commit()
-        cursor.close()
-        
-        print(f"✅ 成功执行: {file_path}")
+        applied = apply_migrations(conn, postgresql)
+        for migration in applied:
+            print(f"✅ 迁移 {migration.version}: {migration.description}")
         return True
         
-    except Exception as e:
-        print(f"❌ 执行失败 {file_path}: {e}")
-        conn.rollback()
+    except MigrationError as e:
+        print(f"❌ {e}")
         return False
 
 
-def create_sample_data(conn):
+def create_sample_data(conn, postgresql):
     """创建示例数据"""
+    now = datetime.now()
     sample_data = [
-        {
-            'license_key': 'DEMO-TRIAL1-ABCD1234',
-            'user_email': 'demo@example.com',
-            'plan_type': 'trial1',
-            'end_date': "NOW() + INTERVAL '1 day'"
-        },
-        {
-            'license_key': 'DEMO-TRIAL3-EFGH5678',
-            'user_email': 'demo@example.com',
-            'plan_type': 'trial3',
-            'end_date': "NOW() + INTERVAL '3 days'"
-        },
-        {
-            'license_key': 'DEMO-30D-IJKL9012',
-            'user_email': 'demo@example.com',
-            'plan_type': '30d',
-            'end_date': "NOW() + INTERVAL '30 days'"
-        },
-        {
-            'license_key': 'DEMO-180D-MNOP3456',
-            'user_email': 'demo@example.com',
-            'plan_type': '180d',
-            'end_date': "NOW() + INTERVAL '180 days'"
-        },
-        {
-            'license_key': 'DEMO-365D-QRST7890',
-            'user_email': 'demo@example.com',
-            'plan_type': '365d',
-            'end_date': "NOW() + INTERVAL '365 days'"
-        },
-        {
-            'license_key': 'DEMO-LIFETIME-UVWX1234',
-            'user_email': 'demo@example.com',
-            'plan_type': 'lifetime',
-            'end_date': 'NULL'
-        }
+        ('trial1', now + timedelta(days=1)),
+        ('trial3', now + timedelta(days=3)),
+        ('30d', now + timedelta(days=30)),
+        ('180d', now + timedelta(days=180)),
+        ('365d', now + timedelta(days=365)),
+        ('lifetime', None),
     ]
     
     try:
         cursor = conn.cursor()
         
-        for data in sample_data:
-            query = """
-            INSERT INTO licenses (license_key, user_email, plan_type, end_date)
-            VALUES (%(license_key)s, %(user_email)s, %(plan_type)s, %(end_date)s)
-            ON CONFLICT (license_key) DO NOTHING
-            """
-            
-            # 处理end_date
-            if data['end_date'] == 'NULL':
-                query = """
-                INSERT INTO licenses (license_key, user_email, plan_type, end_date)
-                VALUES (%(license_key)s, %(user_email)s, %(plan_type)s, NULL)
-                ON CONFLICT (license_key) DO NOTHING
-                """
-                cursor.execute(query, {
-                    'license_key': data['license_key'],
-                    'user_email': data['user_email'],
-                    'plan_type': data['plan_type']
-                })
-            else:
-                cursor.execute(query, data)
+        # 已有数据时不再重复创建
+        cursor.execute("SELECT COUNT(*) FROM licenses WHERE user_email = 'demo@example.com'")
+        if cursor.fetchone()[0]:
+            cursor.close()
+            print("示例数据已存在，跳过")
+            return True
+        
+        query = translate_placeholders(
+            "INSERT INTO licenses (id, license_key, user_email, plan_type, start_date, end_date, is_active) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            postgresql
+        )
+        for plan_type, end_date in sample_data:
+            cursor.execute(query, (
+                str(uuid.uuid4()), generate_license_key(), 'demo@example.com', plan_type,
+                now.isoformat(), end_date.isoformat() if end_date else None, True
+            ))
         
         conn.commit()
         cursor.close()
@@ -126,27 +92,21 @@ def create_sample_data(conn):
         return False
 
 
-def verify_setup(conn):
+def verify_setup(conn, postgresql):
     """验证设置"""
     try:
-        cursor = conn.cursor()
-        
-        # 检查表是否存在
-        cursor.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' AND table_name = 'licenses'
-        """)
-        
-        if not cursor.fetchone():
-            print("❌ licenses表不存在")
+        status = migration_status(conn, postgresql)
+        if status["pending"]:
+            print(f"❌ 数据库结构版本 {status['current_version']} 低于 {status['latest_version']}")
             return False
         
+        cursor = conn.cursor()
+        
         # 检查记录数量
         cursor.execute("SELECT COUNT(*) FROM licenses")
         count = cursor.fetchone()[0]
         
-        print(f"✅ 数据库设置完成，共有 {count} 条授权码记录")
+        print(f"✅ 数据库设置完成（结构版本 {status['current_version']}），共有 {count} 条授权码记录")
         
         # 显示示例授权码
         cursor.execute("""
@@ -174,30 +134,25 @@ def main():
     print("=== 数据库设置脚本 ===")
     
     # 获取数据库连接
-    conn = get_database_connection()
+    conn, postgresql = get_database_connection()
     
     try:
-        # 执行SQL文件
-        schema_file = "database/schema.sql"
-        if os.path.exists(schema_file):
-            if execute_sql_file(conn, schema_file):
-                print("✅ 数据库表结构创建成功")
-            else:
-                print("❌ 数据库表结构创建失败")
-                return
+        # 执行结构迁移
+        if run_migrations(conn, postgresql):
+            print("✅ 数据库表结构创建成功")
         else:
-            print(f"❌ 找不到文件: {schema_file}")
+            print("❌ 数据库表结构创建失败")
             return
         
         # 创建示例数据
-        if create_sample_data(conn):
+        if create_sample_data(conn, postgresql):
             print("✅ 示例数据创建成功")
         else:
             print("❌ 示例数据创建失败")
             return
         
         # 验证设置
-        if verify_setup(conn):
+        if verify_setup(conn, postgresql):
             print("\n🎉 数据库设置完成!")
         else:
             print("\n❌ 数据库设置验证失败")
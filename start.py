@@ -5,23 +5,24 @@
 """
 import os
 import sys
+import argparse
 import subprocess
+import importlib.util
 from pathlib import Path
 
 
 def check_requirements():
-    """检查依赖是否安装"""
-    try:
-        import fastapi
-        import uvicorn
-        import psycopg2
-        import dotenv
-        print("✅ 所有依赖已安装")
-        return True
-    except ImportError as e:
-        print(f"❌ 缺少依赖: {e}")
+    """检查依赖是否安装（只查找模块，不导入，避免拖慢启动）"""
+    missing = [
+        name for name in ("fastapi", "uvicorn", "psycopg2", "dotenv")
+        if importlib.util.find_spec(name) is None
+    ]
+    if missing:
+        print(f"❌ 缺少依赖: {', '.join(missing)}")
         print("请运行: pip install -r requirements.txt")
         return False
+    print("✅ 所有依赖已安装")
+    return True
 
 
 def check_env_file():
@@ -67,6 +68,29 @@ def setup_database():
         return False
 
 
+def migrate_database():
+    """
+    本地开发时把数据库结构升级到最新版本
+
+    只在未设置 DB_AUTO_MIGRATE 时执行；显式设置后由服务启动时按该配置处理
+    """
+    if os.getenv("DB_AUTO_MIGRATE") is not None:
+        return True
+    
+    try:
+        from database.migrations import upgrade
+        applied = upgrade()
+    except Exception as e:
+        print(f"❌ 数据库迁移失败: {e}")
+        return False
+    
+    if applied:
+        print(f"✅ 数据库结构已迁移（执行 {len(applied)} 个迁移）")
+    else:
+        print("✅ 数据库结构已是最新版本")
+    return True
+
+
 def start_server():
     """启动服务器"""
     print("🚀 启动服务器...")
@@ -86,8 +110,21 @@ def start_server():
         print(f"❌ 启动服务器失败: {e}")
 
 
+def import_report():
+    """输出启动导入耗时报告并检查预算"""
+    from utils.import_timing import main as import_timing_main
+    return import_timing_main(["--check"])
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="软件秘钥授权系统 - 快速启动")
+    parser.add_argument("--import-report", action="store_true", help="输出启动导入耗时报告并检查预算后退出")
+    args = parser.parse_args()
+    
+    if args.import_report:
+        sys.exit(import_report())
+    
     print("=== 软件秘钥授权系统 - 快速启动 ===\n")
     
     # 检查依赖
@@ -104,6 +141,10 @@ def main():
         if not setup_database():
             sys.exit(1)
     
+    # 本地开发时自动迁移数据库结构
+    if not migrate_database():
+        sys.exit(1)
+    
     # 启动服务器
     print("\n服务器将在 http://localhost:8000 启动")
     print("API文档: http://localhost:8000/docs")
@@ -0,0 +1,203 @@
+"""
+布隆过滤器
+用于在查询数据库前快速排除不存在的授权码
+"""
+import os
+import math
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """布隆过滤器"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """
+        初始化布隆过滤器
+
+        Args:
+            capacity: 预计元素数量
+            error_rate: 达到预计数量时的目标误判率
+        """
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于0")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate 必须在0和1之间")
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # m = -n*ln(p) / (ln2)^2, k = m/n * ln2
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> List[int]:
+        """计算元素对应的位位置（双重哈希）"""
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, item: str):
+        """添加元素"""
+        bits = self.bits
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        """判断元素是否可能存在，返回False时一定不存在"""
+        bits = self.bits
+        for pos in self._positions(item):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @property
+    def memory_bytes(self) -> int:
+        """位数组占用的内存（字节）"""
+        return len(self.bits)
+
+    def estimated_false_positive_rate(self) -> float:
+        """按当前元素数量估算的误判率"""
+        if self.count == 0:
+            return 0.0
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class LicenseKeyFilter:
+    """
+    已发放授权码的过滤器
+
+    在完成首次构建前不会拒绝任何授权码；重建时新写入的授权码会同步到新过滤器
+    """
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001, enabled: bool = True):
+        """
+        初始化授权码过滤器
+
+        Args:
+            capacity: 过滤器最小容量，重建时会按实际授权码数量扩容
+            error_rate: 目标误判率
+            enabled: 是否启用
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.enabled = enabled
+        self._filter: Optional[BloomFilter] = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._pending: List[str] = []
+        self.rejections = 0
+        self.rebuilds = 0
+
+    @property
+    def ready(self) -> bool:
+        """过滤器是否可用于拒绝请求"""
+        return self.enabled and self._filter is not None
+
+    def might_contain(self, license_key: str) -> bool:
+        """
+        判断授权码是否可能存在
+
+        Args:
+            license_key: 授权码
+
+        Returns:
+            bool: False表示授权码一定不存在
+        """
+        current = self._filter
+        if not self.enabled or current is None:
+            return True
+        if license_key in current:
+            return True
+        self.rejections += 1
+        return False
+
+    def add(self, license_key: str):
+        """记录新发放的授权码"""
+        self.add_many([license_key])
+
+    def add_many(self, license_keys: Iterable[str]):
+        """批量记录新发放的授权码"""
+        with self._lock:
+            for key in license_keys:
+                if self._rebuilding:
+                    self._pending.append(key)
+                if self._filter is not None:
+                    self._filter.add(key)
+
+    def rebuild(self, license_keys: Iterable[str], expected_count: int = 0):
+        """
+        用全部授权码重建过滤器
+
+        Args:
+            license_keys: 所有已发放的授权码
+            expected_count: 授权码数量，用于确定过滤器容量
+        """
+        capacity = max(self.capacity, int(expected_count * 1.2))
+        new_filter = BloomFilter(capacity, self.error_rate)
+
+        with self._lock:
+            self._rebuilding = True
+            self._pending = []
+        try:
+            for key in license_keys:
+                new_filter.add(key)
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+                self._pending = []
+            raise
+
+        with self._lock:
+            for key in self._pending:
+                new_filter.add(key)
+            self._pending = []
+            self._rebuilding = False
+            self._filter = new_filter
+            self.rebuilds += 1
+
+        logger.info(
+            f"License key filter rebuilt: {new_filter.count} keys, "
+            f"{new_filter.memory_bytes} bytes"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取过滤器统计信息
+
+        Returns:
+            Dict[str, Any]: 内存占用、误判率等信息
+        """
+        current = self._filter
+        result = {
+            "enabled": self.enabled,
+            "ready": current is not None,
+            "rejections": self.rejections,
+            "rebuilds": self.rebuilds,
+            "target_error_rate": self.error_rate,
+        }
+        if current is not None:
+            result.update({
+                "keys": current.count,
+                "capacity": current.capacity,
+                "memory_bytes": current.memory_bytes,
+                "num_hashes": current.num_hashes,
+                "estimated_error_rate": round(current.estimated_false_positive_rate(), 6),
+            })
+        return result
+
+
+# 全局实例
+license_key_filter = LicenseKeyFilter(
+    capacity=int(os.getenv("BLOOM_CAPACITY", "1000000")),
+    error_rate=float(os.getenv("BLOOM_ERROR_RATE", "0.001")),
+    enabled=os.getenv("BLOOM_FILTER_ENABLED", "True").lower() == "true"
+)
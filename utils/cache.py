@@ -0,0 +1,137 @@
+"""
+授权码验证结果缓存
+进程内有界缓存，支持TTL过期和LRU淘汰
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class VerifyResultCache:
+    """验证结果缓存"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0, negative_ttl: float = 10.0):
+        """
+        初始化缓存
+
+        Args:
+            max_size: 最大缓存条目数，超出时淘汰最久未使用的条目
+            ttl: 缓存有效期（秒）
+            negative_ttl: 授权码不存在结果的缓存有效期（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # {key: (expires_at, value)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """缓存是否启用"""
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        获取缓存结果
+
+        Args:
+            key: 授权码
+
+        Returns:
+            Optional[Any]: 缓存的结果，未命中或已过期时返回None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, end_ts: Optional[float] = None, negative: bool = False):
+        """
+        写入缓存
+
+        Args:
+            key: 授权码
+            value: 验证结果
+            end_ts: 授权到期时间（epoch秒），缓存有效期不会超过该时间
+            negative: 是否为授权码不存在的结果
+        """
+        if not self.enabled:
+            return
+
+        ttl = self.negative_ttl if negative else self.ttl
+        if end_ts is not None:
+            remaining = end_ts - time.time()
+            ttl = min(ttl, remaining)
+        if ttl <= 0:
+            return
+
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> bool:
+        """
+        使指定授权码的缓存失效，授权码被写入或修改后调用
+
+        Args:
+            key: 授权码
+
+        Returns:
+            bool: 是否存在被删除的缓存
+        """
+        with self._lock:
+            removed = self._data.pop(key, None) is not None
+            if removed:
+                self.invalidations += 1
+            return removed
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            Dict[str, Any]: 命中、未命中等统计
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# 全局实例
+verify_cache = VerifyResultCache(
+    max_size=int(os.getenv("VERIFY_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("VERIFY_CACHE_TTL", "60")),
+    negative_ttl=float(os.getenv("VERIFY_CACHE_NEGATIVE_TTL", "10"))
+)
@@ -0,0 +1,192 @@
+"""
+启动导入耗时分析
+在子进程中以 python -X importtime 导入应用模块，按模块和顶层包汇总耗时，并检查启动预算
+
+用法:
+    python -m utils.import_timing                 # 输出导入耗时报告
+    python -m utils.import_timing --check         # 超出预算时返回非零退出码
+    python start.py --import-report
+
+预算（见 docs/DEPLOYMENT.md）:
+    - 导入 main 的总耗时不超过 IMPORT_TIME_BUDGET_MS（默认 1500ms，受机器性能影响，CI 中按实际环境设置）
+    - LAZY_MODULES 中的模块不能在导入 main 时加载（与机器无关，始终检查）
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# 默认的启动导入耗时预算（毫秒）
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+# 只在使用对应功能时加载的模块，导入 main 时不能出现
+# （email_validator 由 fastapi.openapi.models 在安装时导入，不在应用控制范围内）
+LAZY_MODULES = (
+    "psycopg2",      # 仅 PostgreSQL
+    "cryptography",  # 仅 EdDSA 令牌
+    "cProfile",      # 仅性能分析
+    "pstats",
+    "httpx",         # 仅压测脚本
+)
+
+# 本项目的顶层包
+FIRST_PARTY_PACKAGES = ("main", "database", "utils", "middleware")
+
+
+class ImportRecord:
+    """单个模块的导入耗时"""
+
+    __slots__ = ("name", "self_us", "cumulative_us", "depth")
+
+    def __init__(self, name: str, self_us: int, cumulative_us: int, depth: int):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.depth = depth
+
+    @property
+    def package(self) -> str:
+        return self.name.split(".", 1)[0]
+
+
+def parse_importtime(output: str) -> List[ImportRecord]:
+    """
+    解析 -X importtime 的输出
+
+    Args:
+        output: 子进程的 stderr
+
+    Returns:
+        List[ImportRecord]: 按完成顺序排列的导入记录
+    """
+    records = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2]
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        records.append(ImportRecord(stripped.strip(), int(fields[0]), int(fields[1]), depth))
+    return records
+
+
+def measure_imports(module: str = "main", env: Optional[Dict[str, str]] = None) -> List[ImportRecord]:
+    """
+    在新的解释器中导入模块并记录各模块耗时
+
+    Args:
+        module: 要导入的模块
+        env: 额外的环境变量
+
+    Returns:
+        List[ImportRecord]: 导入记录
+
+    Raises:
+        RuntimeError: 导入失败
+    """
+    process_env = dict(os.environ)
+    process_env.update(env or {})
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=process_env
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def summarize(records: List[ImportRecord], module: str = "main") -> Dict:
+    """
+    汇总导入耗时
+
+    Returns:
+        Dict: 总耗时、按顶层包汇总的自身耗时、本项目模块的累计耗时和已加载的延迟模块
+    """
+    total_us = next((r.cumulative_us for r in records if r.name == module), 0)
+    by_package: Dict[str, int] = defaultdict(int)
+    for record in records:
+        by_package[record.package] += record.self_us
+
+    loaded = {record.name for record in records}
+    return {
+        "module": module,
+        "total_ms": total_us / 1000,
+        "packages": sorted(
+            ((package, us / 1000) for package, us in by_package.items()),
+            key=lambda item: item[1], reverse=True
+        ),
+        "first_party": [
+            (record.name, record.self_us / 1000, record.cumulative_us / 1000)
+            for record in sorted(records, key=lambda r: r.cumulative_us, reverse=True)
+            if record.package in FIRST_PARTY_PACKAGES and record.name != module
+        ],
+        "eager_lazy_modules": [name for name in LAZY_MODULES if name in loaded],
+    }
+
+
+def check_budget(summary: Dict, budget_ms: float = IMPORT_TIME_BUDGET_MS) -> List[str]:
+    """
+    检查启动导入预算
+
+    Returns:
+        List[str]: 违反预算的说明，为空表示通过
+    """
+    violations = []
+    if summary["total_ms"] > budget_ms:
+        violations.append(f"导入 {summary['module']} 耗时 {summary['total_ms']:.0f}ms，超出预算 {budget_ms:.0f}ms")
+    for name in summary["eager_lazy_modules"]:
+        violations.append(f"{name} 应延迟导入，但在导入 {summary['module']} 时被加载")
+    return violations
+
+
+def format_report(summary: Dict, top: int = 15) -> str:
+    """格式化导入耗时报告"""
+    lines = [f"导入 {summary['module']} 总耗时: {summary['total_ms']:.1f}ms", "", "按顶层包（自身耗时）:"]
+    for package, ms in summary["packages"][:top]:
+        lines.append(f"  {package:<32}{ms:>9.1f}ms")
+    lines += ["", "本项目模块（自身 / 累计）:"]
+    for name, self_ms, cumulative_ms in summary["first_party"][:top]:
+        lines.append(f"  {name:<32}{self_ms:>9.1f}ms {cumulative_ms:>9.1f}ms")
+    if summary["eager_lazy_modules"]:
+        lines += ["", "应延迟导入但已加载: " + ", ".join(summary["eager_lazy_modules"])]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="启动导入耗时分析")
+    parser.add_argument("--module", default="main", help="要导入的模块（默认: main）")
+    parser.add_argument("--top", type=int, default=15, help="每个列表显示的条目数")
+    parser.add_argument("--check", action="store_true", help="检查预算，超出时返回非零退出码")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_TIME_BUDGET_MS, help="总耗时预算（毫秒）")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = summarize(measure_imports(args.module), args.module)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+
+    violations = check_budget(summary, args.budget_ms) if args.check else []
+    if args.json:
+        print(json.dumps(dict(summary, violations=violations), ensure_ascii=False, indent=2))
+    else:
+        print(format_report(summary, args.top))
+        if args.check:
+            print()
+            for violation in violations:
+                print(f"❌ {violation}")
+            if not violations:
+                print(f"✅ 启动导入耗时在预算内（{args.budget_ms:.0f}ms）")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+授权码格式
+授权码字符集、格式校验和规范化的唯一实现，服务端、桌面端共用
+
+只依赖标准库，桌面端打包时可以直接引用
+"""
+import re
+from typing import Optional
+
+# 授权码字符集：大写字母和数字，排除容易混淆的 I、O、0、1
+LICENSE_KEY_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+# 格式: XXXX-XXXX-XXXX-XXXX
+LICENSE_KEY_LENGTH = 19
+
+_SEGMENT = "[A-HJ-NP-Z2-9]{4}"
+LICENSE_KEY_PATTERN = re.compile(f"{_SEGMENT}-{_SEGMENT}-{_SEGMENT}-{_SEGMENT}")
+
+# 早期桌面端生成的授权码使用全部大写字母和数字
+_LEGACY_SEGMENT = "[A-Z0-9]{4}"
+LEGACY_LICENSE_KEY_PATTERN = re.compile(
+    f"{_LEGACY_SEGMENT}-{_LEGACY_SEGMENT}-{_LEGACY_SEGMENT}-{_LEGACY_SEGMENT}"
+)
+
+# 规范化时移除的空白和分隔符
+_SEPARATORS = re.compile(r"[\s\-_]+")
+
+_match = LICENSE_KEY_PATTERN.fullmatch
+
+
+def is_valid_license_key(license_key: str) -> bool:
+    """
+    校验授权码格式
+
+    Args:
+        license_key: 授权码
+
+    Returns:
+        bool: 是否为 XXXX-XXXX-XXXX-XXXX 格式且只包含允许的字符
+    """
+    return type(license_key) is str and _match(license_key) is not None
+
+
+def normalize_license_key(license_key: str, allow_legacy: bool = False) -> Optional[str]:
+    """
+    规范化用户输入的授权码
+
+    去掉首尾和中间的空白、转换为大写，并按每4个字符重新插入分隔符，
+    如 " abcd efgh-jklmnp23 " -> "ABCD-EFGH-JKLM-NP23"
+
+    Args:
+        license_key: 用户输入的授权码
+        allow_legacy: 是否接受早期桌面端使用的 0、1、I、O 字符
+
+    Returns:
+        Optional[str]: 规范化后的授权码，格式无效时为None
+    """
+    if type(license_key) is not str:
+        return None
+    # 已经是规范格式时直接返回
+    if _match(license_key) is not None:
+        return license_key
+
+    compact = _SEPARATORS.sub("", license_key).upper()
+    if len(compact) != 16:
+        return None
+    candidate = f"{compact[:4]}-{compact[4:8]}-{compact[8:12]}-{compact[12:]}"
+    if _match(candidate) is not None:
+        return candidate
+    if allow_legacy and LEGACY_LICENSE_KEY_PATTERN.fullmatch(candidate) is not None:
+        return candidate
+    return None
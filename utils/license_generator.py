@@ -3,7 +3,32 @@
 """
 import secrets
 import string
-from typing import Set
+from typing import Iterator, List, Set
+
+from utils.key_format import LICENSE_KEY_ALPHABET, is_valid_license_key
+
+# 每个随机字节取低5位映射到32个字符；256是32的整数倍，因此每个字符的概率完全相同
+_BYTE_TO_KEY_CHAR = bytes(
+    LICENSE_KEY_ALPHABET.encode("ascii")[b % len(LICENSE_KEY_ALPHABET)] for b in range(256)
+)
+
+# 每个授权码在缓冲区中占20字节：16个字符、3个分隔符和1个换行符
+_KEY_STRIDE = 20
+
+
+def _random_keys(count: int) -> List[str]:
+    """
+    从CSPRNG一次读取 count 个授权码所需的随机字节并批量转换
+    
+    字符映射、插入分隔符和切分都由 bytes.translate、切片赋值和 str.split 在C层完成
+    """
+    buf = bytearray(secrets.token_bytes(_KEY_STRIDE * count).translate(_BYTE_TO_KEY_CHAR))
+    dashes = b"-" * count
+    buf[4::_KEY_STRIDE] = dashes
+    buf[9::_KEY_STRIDE] = dashes
+    buf[14::_KEY_STRIDE] = dashes
+    buf[19::_KEY_STRIDE] = b"\n" * count
+    return buf[:-1].decode("ascii").split("\n")
 
 
 def generate_license_key() -> str:
@@ -16,16 +41,31 @@ def generate_license_key() -> str:
     Returns:
         str: 生成的授权码
     """
-    # 使用大写字母和数字，排除容易混淆的字符
-    characters = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+    return _random_keys(1)[0]
+
+
+def iter_license_key_chunks(count: int, chunk_size: int = 10000) -> Iterator[List[str]]:
+    """
+    分批生成授权码，适合流式处理大批量生成
     
-    # 生成4组4位字符
-    segments = []
-    for _ in range(4):
-        segment = ''.join(secrets.choice(characters) for _ in range(4))
-        segments.append(segment)
+    每批一次性读取随机数并批量转换字符；同一批内不会重复，
+    不同批之间的重复概率可以忽略（80位随机数），需要严格唯一时由数据库唯一约束保证
     
-    return '-'.join(segments)
+    Args:
+        count: 生成总数
+        chunk_size: 每批数量
+        
+    Yields:
+        List[str]: 一批授权码
+    """
+    remaining = count
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        keys = list(dict.fromkeys(_random_keys(size)))
+        while len(keys) < size:
+            keys = list(dict.fromkeys(keys + _random_keys(size - len(keys))))
+        remaining -= size
+        yield keys
 
 
 def generate_batch_license_keys(count: int) -> Set[str]:
@@ -41,15 +81,15 @@ def generate_batch_license_keys(count: int) -> Set[str]:
     license_keys = set()
     
     while len(license_keys) < count:
-        key = generate_license_key()
-        license_keys.add(key)
+        for chunk in iter_license_key_chunks(count - len(license_keys)):
+            license_keys.update(chunk)
     
     return license_keys
 
 
 def validate_license_key_format(license_key: str) -> bool:
     """
-    验证授权码格式是否正确
+    验证授权码格式是否正确（见 utils/key_format.py）
     
     Args:
         license_key: 待验证的授权码
@@ -57,22 +97,7 @@ def validate_license_key_format(license_key: str) -> bool:
     Returns:
         bool: 格式是否正确
     """
-    if not license_key or not isinstance(license_key, str):
-        return False
-    
-    # 检查格式: XXXX-XXXX-XXXX-XXXX
-    parts = license_key.split('-')
-    if len(parts) != 4:
-        return False
-    
-    for part in parts:
-        if len(part) != 4:
-            return False
-        # 检查是否只包含允许的字符
-        if not all(c in "ABCDEFGHJKLMNPQRSTUVWXYZ23456789" for c in part):
-            return False
-    
-    return True
+    return is_valid_license_key(license_key)
 
 
 def get_license_key_entropy() -> int:
@@ -0,0 +1,206 @@
+"""
+授权令牌工具
+签发可在客户端离线校验的授权令牌，支持HMAC（共享密钥）和Ed25519（公私钥）两种签名方式
+"""
+import os
+import json
+import time
+import base64
+import logging
+from typing import Any, Dict, Optional
+
+from utils.security import SecurityManager, security_manager
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION = 1
+ALGORITHM_HMAC = "HS256"
+ALGORITHM_ED25519 = "EdDSA"
+# 载荷必需字段及其类型（exp 为空表示永久授权）
+REQUIRED_FIELDS = {"v": int, "alg": str, "key": str, "plan": str, "iat": int, "rfr": int}
+
+
+def _b64encode(data: bytes) -> str:
+    """URL安全的base64编码（去掉填充）"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    """URL安全的base64解码"""
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class LicenseTokenSigner:
+    """授权令牌签发器"""
+
+    def __init__(
+        self,
+        algorithm: str = ALGORITHM_HMAC,
+        security: Optional[SecurityManager] = None,
+        private_key_pem: Optional[bytes] = None,
+        refresh_seconds: int = 7 * 24 * 3600
+    ):
+        """
+        初始化令牌签发器
+
+        Args:
+            algorithm: 签名算法，HS256 或 EdDSA
+            security: HMAC模式使用的安全管理器
+            private_key_pem: EdDSA模式使用的Ed25519私钥（PEM格式），为空时生成临时密钥
+            refresh_seconds: 令牌需要重新联网验证的间隔（秒）
+
+        Raises:
+            ValueError: 算法不支持，或HMAC模式下 SECRET_KEY 未设置/为公开的默认值
+        """
+        if algorithm not in (ALGORITHM_HMAC, ALGORITHM_ED25519):
+            raise ValueError(f"不支持的令牌签名算法: {algorithm}")
+
+        self.algorithm = algorithm
+        self.refresh_seconds = refresh_seconds
+        self._security = security or security_manager
+        if algorithm == ALGORITHM_HMAC and self._security.insecure_key:
+            # 默认密钥是公开的，用它签名等于任何人都能伪造令牌
+            raise ValueError("HS256 令牌签名需要设置 SECRET_KEY，不能使用空值或默认值")
+        self._private_key = None
+        self._public_key = None
+
+        if algorithm == ALGORITHM_ED25519:
+            from cryptography.hazmat.primitives import serialization
+            from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+            if private_key_pem:
+                self._private_key = serialization.load_pem_private_key(private_key_pem, password=None)
+                if not isinstance(self._private_key, Ed25519PrivateKey):
+                    raise ValueError("令牌私钥必须是Ed25519私钥")
+            else:
+                logger.warning(
+                    "LICENSE_TOKEN_PRIVATE_KEY_FILE not set, using an ephemeral Ed25519 key; "
+                    "tokens will not verify after restart or across workers"
+                )
+                self._private_key = Ed25519PrivateKey.generate()
+            self._public_key = self._private_key.public_key()
+
+    def issue(self, license_key: str, plan_type: str, end_ts: Optional[int]) -> str:
+        """
+        签发授权令牌
+
+        Args:
+            license_key: 授权码
+            plan_type: 授权类型
+            end_ts: 授权到期时间epoch秒，永久授权为空
+
+        Returns:
+            str: 令牌，格式为 <payload>.<signature>
+        """
+        now = int(time.time())
+        refresh_at = now + self.refresh_seconds
+        if end_ts is not None:
+            refresh_at = min(refresh_at, end_ts)
+
+        payload = {
+            "v": TOKEN_VERSION,
+            "alg": self.algorithm,
+            "key": license_key,
+            "plan": plan_type,
+            "exp": end_ts,
+            "iat": now,
+            "rfr": refresh_at,
+        }
+        encoded = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        return f"{encoded}.{self._sign(encoded)}"
+
+    def _sign(self, encoded_payload: str) -> str:
+        """对编码后的载荷签名"""
+        if self.algorithm == ALGORITHM_HMAC:
+            return self._security.generate_hmac(encoded_payload)
+        return _b64encode(self._private_key.sign(encoded_payload.encode("ascii")))
+
+    def verify(self, token: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        校验令牌签名和有效期
+
+        Args:
+            token: 令牌
+            now: 当前时间戳，默认为系统时间
+
+        Returns:
+            Dict[str, Any]: 令牌载荷
+
+        Raises:
+            ValueError: 令牌格式错误、签名无效或已超过重新验证期限
+        """
+        try:
+            encoded, signature = token.split(".")
+            payload = json.loads(_b64decode(encoded))
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ValueError("令牌格式无效") from e
+        if not isinstance(payload, dict):
+            raise ValueError("令牌格式无效")
+
+        if payload.get("alg") != self.algorithm:
+            raise ValueError("令牌签名算法不匹配")
+
+        if self.algorithm == ALGORITHM_HMAC:
+            valid = self._security.verify_hmac(encoded, signature)
+        else:
+            from cryptography.exceptions import InvalidSignature
+            try:
+                self._public_key.verify(_b64decode(signature), encoded.encode("ascii"))
+                valid = True
+            except (InvalidSignature, ValueError):
+                valid = False
+        if not valid:
+            raise ValueError("令牌签名无效")
+
+        for field, field_type in REQUIRED_FIELDS.items():
+            value = payload.get(field)
+            # bool 是 int 的子类，需要单独排除
+            if not isinstance(value, field_type) or isinstance(value, bool):
+                raise ValueError(f"令牌字段无效: {field}")
+        exp = payload.get("exp")
+        if exp is not None and (not isinstance(exp, int) or isinstance(exp, bool)):
+            raise ValueError("令牌字段无效: exp")
+
+        now = time.time() if now is None else now
+        if now >= payload["rfr"]:
+            raise ValueError("令牌已超过重新验证期限")
+        return payload
+
+    def public_key_pem(self) -> Optional[str]:
+        """
+        获取用于离线校验的公钥
+
+        Returns:
+            Optional[str]: PEM格式公钥，HMAC模式下为空
+        """
+        if self._public_key is None:
+            return None
+        from cryptography.hazmat.primitives import serialization
+        return self._public_key.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode("ascii")
+
+
+def _load_private_key() -> Optional[bytes]:
+    """读取环境变量配置的令牌私钥文件"""
+    path = os.getenv("LICENSE_TOKEN_PRIVATE_KEY_FILE")
+    if not path:
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+
+_token_signer: Optional[LicenseTokenSigner] = None
+
+
+def get_token_signer() -> LicenseTokenSigner:
+    """获取全局令牌签发器（首次使用时按环境变量创建）"""
+    global _token_signer
+    if _token_signer is None:
+        _token_signer = LicenseTokenSigner(
+            algorithm=os.getenv("LICENSE_TOKEN_ALGORITHM", ALGORITHM_HMAC),
+            private_key_pem=_load_private_key(),
+            refresh_seconds=int(os.getenv("LICENSE_TOKEN_REFRESH_SECONDS", str(7 * 24 * 3600)))
+        )
+    return _token_signer
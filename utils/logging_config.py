@@ -0,0 +1,232 @@
+"""
+日志配置
+日志记录先放入内存队列，由后台线程格式化并写出，避免在事件循环上执行I/O；
+高频的常规事件按事件类型抽样并限制每秒条数，错误和安全事件始终输出
+
+使用方式：在日志调用中通过 extra={"event": "verify.valid"} 标记事件类型，
+并使用 %-style 参数（logger.info("... %s", value)），被丢弃的记录不会格式化消息
+"""
+import os
+import sys
+import time
+import queue
+import atexit
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import metrics_registry
+
+# 默认抽样规则 {事件类型: (抽样比例, 每秒最多输出条数)}
+DEFAULT_SAMPLE_RULES: Dict[str, Tuple[float, int]] = {
+    "http.request": (0.01, 10),
+    "http.response": (0.01, 10),
+    "verify.valid": (0.01, 10),
+    "verify.not_found": (0.1, 10),
+    "verify.expired": (1.0, 20),
+    "verify.disabled": (1.0, 20),
+    "verify.filtered": (0.01, 10),
+    "verify.batch": (0.1, 10),
+}
+
+# 始终输出的事件类型前缀
+ALWAYS_EMIT_PREFIXES = ("security.",)
+
+log_records_dropped_total = metrics_registry.counter(
+    "log_records_dropped_total", "Log records dropped by sampling, rate caps or a full queue",
+    ("event", "reason")
+)
+
+
+def _always_emit(record: logging.LogRecord) -> bool:
+    """错误和安全事件不能被抽样或丢弃"""
+    if record.levelno >= logging.ERROR:
+        return True
+    event = getattr(record, "event", None)
+    return bool(event) and event.startswith(ALWAYS_EMIT_PREFIXES)
+
+
+class _EventBudget:
+    """单个事件类型的抽样比例和每秒配额"""
+
+    __slots__ = ("sample_rate", "max_per_second", "second", "emitted")
+
+    def __init__(self, sample_rate: float, max_per_second: int):
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self.second = 0
+        self.emitted = 0
+
+
+class SamplingFilter(logging.Filter):
+    """
+    按事件类型抽样并限速的过滤器
+
+    只处理带有 event 属性且配置了规则的记录；计数不加锁，并发时配额可能有少量偏差
+    """
+
+    def __init__(self, rules: Optional[Dict[str, Tuple[float, int]]] = None):
+        """
+        Args:
+            rules: {事件类型: (抽样比例, 每秒最多输出条数)}，每秒条数为0表示不限
+        """
+        super().__init__()
+        self.budgets = {
+            event: _EventBudget(rate, cap)
+            for event, (rate, cap) in (rules or DEFAULT_SAMPLE_RULES).items()
+        }
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if event is None or _always_emit(record):
+            return True
+        budget = self.budgets.get(event)
+        if budget is None:
+            return True
+
+        if budget.sample_rate < 1.0 and random.random() >= budget.sample_rate:
+            log_records_dropped_total.inc(event, "sampled")
+            return False
+
+        if budget.max_per_second:
+            second = int(time.monotonic())
+            if second != budget.second:
+                budget.second = second
+                budget.emitted = 0
+            if budget.emitted >= budget.max_per_second:
+                log_records_dropped_total.inc(event, "rate_limited")
+                return False
+            budget.emitted += 1
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    只把记录放入队列的处理器
+
+    标准 QueueHandler 会在调用线程上格式化消息，这里推迟到后台线程；
+    入队从不等待：队列满时丢弃常规记录，错误和安全事件改为在调用线程上直接写出
+    """
+
+    def __init__(self, queue_: queue.Queue, fallback: logging.Handler):
+        """
+        Args:
+            queue_: 日志队列
+            fallback: 队列满时直接写出错误和安全事件的处理器
+        """
+        super().__init__(queue_)
+        self.fallback = fallback
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if _always_emit(record):
+                # 不能在事件循环上等待队列，直接写出（可能早于队列中较早的记录）
+                self.fallback.handle(record)
+            else:
+                log_records_dropped_total.inc(getattr(record, "event", None) or "", "queue_full")
+
+
+def parse_sample_rules(text: str) -> Dict[str, Tuple[float, int]]:
+    """
+    解析抽样规则，如 verify.valid=0.01:10,http.request=0:0
+
+    Returns:
+        Dict[str, Tuple[float, int]]: {事件类型: (抽样比例, 每秒最多输出条数)}
+    """
+    rules = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        event, _, spec = part.partition("=")
+        rate, _, cap = spec.partition(":")
+        rules[event.strip()] = (float(rate), int(cap or 0))
+    return rules
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[DeferredQueueHandler] = None
+# setup_logging 移除的原有处理器，停止后台线程时恢复
+_previous_handlers: List[logging.Handler] = []
+
+
+def _stream_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    return handler
+
+
+def setup_logging(level: Optional[str] = None) -> Optional[QueueListener]:
+    """
+    配置根日志记录器
+
+    环境变量：LOG_LEVEL、LOG_ASYNC（是否使用后台线程写日志）、LOG_QUEUE_SIZE、LOG_SAMPLE_RULES
+
+    Args:
+        level: 日志级别，为空时读取 LOG_LEVEL
+
+    Returns:
+        Optional[QueueListener]: 后台写日志的监听器，同步模式下为None
+    """
+    global _listener, _queue_handler, _previous_handlers
+    if _listener is not None:
+        return _listener
+
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    rules = dict(DEFAULT_SAMPLE_RULES)
+    rules.update(parse_sample_rules(os.getenv("LOG_SAMPLE_RULES", "")))
+
+    stream_handler = _stream_handler()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    previous_handlers = list(root.handlers)
+    for handler in previous_handlers:
+        root.removeHandler(handler)
+
+    if os.getenv("LOG_ASYNC", "True").lower() != "true":
+        stream_handler.addFilter(SamplingFilter(rules))
+        root.addHandler(stream_handler)
+        return None
+
+    queue_handler = DeferredQueueHandler(queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000"))), stream_handler)
+    # 在入队前过滤，被丢弃的记录不占用队列
+    queue_handler.addFilter(SamplingFilter(rules))
+    root.addHandler(queue_handler)
+    _queue_handler = queue_handler
+    # 没有原有处理器时，停止后台线程后改为同步写出
+    if not previous_handlers:
+        sync_handler = _stream_handler()
+        sync_handler.addFilter(SamplingFilter(rules))
+        previous_handlers = [sync_handler]
+    _previous_handlers = previous_handlers
+
+    _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """
+    写出队列中剩余的日志并停止后台线程
+
+    先从根日志记录器上移除队列处理器并恢复原有处理器，之后的日志直接写出，不会进入无人处理的队列
+    """
+    global _listener, _queue_handler, _previous_handlers
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    root = logging.getLogger()
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+        _queue_handler = None
+    for handler in _previous_handlers:
+        root.addHandler(handler)
+    _previous_handlers = []
+    listener.stop()
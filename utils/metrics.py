@@ -0,0 +1,264 @@
+"""
+运行指标
+以Prometheus文本格式导出请求、数据库和业务指标
+
+记录时只写入当前线程的分片，不需要加锁；导出时再汇总所有线程的分片
+"""
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """格式化标签，如 {method="GET",status="200"}"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """格式化数值"""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """
+    指标基类
+
+    每个线程持有独立的分片 {标签值: 数据}，分片只由所属线程写入
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        """获取当前线程的分片（每个线程首次记录时注册一次）"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _snapshots(self) -> List[dict]:
+        """复制所有分片（dict.copy 在GIL下是原子的）"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        """
+        增加计数
+
+        Args:
+            *labels: 按 labelnames 顺序的标签值
+            amount: 增加量
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        """汇总所有线程的计数"""
+        totals: Dict[Tuple[str, ...], float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        values = self.values()
+        if not values and not self.labelnames:
+            # 无标签的指标始终导出，便于告警规则区分"为0"和"不存在"
+            values = {(): 0}
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """可增可减的仪表（各线程的增减量相加）"""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        """减少数值"""
+        self.inc(*labels, amount=-amount)
+
+
+class CallbackGauge(_Metric):
+    """导出时通过回调读取当前值的仪表"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return self._header() + [f"{self.name} {_format_value(float(self.callback()))}"]
+
+
+class Histogram(_Metric):
+    """累积分布直方图"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        """
+        记录一次观测值
+
+        Args:
+            value: 观测值（秒）
+            *labels: 按 labelnames 顺序的标签值
+        """
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # [各桶计数..., +Inf桶计数, 总和]
+            state = [0] * (len(self.buckets) + 1) + [0.0]
+            shard[labels] = state
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def render(self) -> List[str]:
+        size = len(self.buckets) + 1
+        totals: Dict[Tuple[str, ...], list] = {}
+        for shard in self._snapshots():
+            for labels, state in shard.items():
+                total = totals.setdefault(labels, [0] * size + [0.0])
+                for i, value in enumerate(state):
+                    total[i] += value
+
+        lines = self._header()
+        bounds = self.buckets + (float("inf"),)
+        for labels, total in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, total):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标已注册: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """注册计数器"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """注册仪表"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def callback_gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> CallbackGauge:
+        """注册回调仪表"""
+        return self._register(CallbackGauge(name, documentation, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Optional[Iterable[float]] = None) -> Histogram:
+        """注册直方图"""
+        return self._register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+    def render(self) -> str:
+        """
+        生成Prometheus文本格式（0.0.4）
+
+        Returns:
+            str: 所有指标的文本
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 全局注册表和指标
+metrics_registry = MetricsRegistry()
+
+http_requests_total = metrics_registry.counter(
+    "http_requests_total", "HTTP requests processed", ("method", "route", "status")
+)
+http_requests_in_flight = metrics_registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed", ("method",)
+)
+http_request_duration_seconds = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+)
+db_queries_total = metrics_registry.counter(
+    "db_queries_total", "Database statements executed", ("operation", "outcome")
+)
+db_query_duration_seconds = metrics_registry.histogram(
+    "db_query_duration_seconds", "Database statement latency including connection checkout",
+    ("operation",)
+)
+rate_limit_rejections_total = metrics_registry.counter(
+    "rate_limit_rejections_total", "Requests rejected by the rate limiter"
+)
+rate_limit_storage_busy_total = metrics_registry.counter(
+    "rate_limit_storage_busy_total", "Rate limit checks that could not lock the shared storage",
+    ("outcome",)
+)
+license_verify_total = metrics_registry.counter(
+    "license_verify_total", "License verification outcomes", ("status",)
+)
+license_expiry_swept_total = metrics_registry.counter(
+    "license_expiry_swept_total", "Licenses marked expired by the background sweeper"
+)
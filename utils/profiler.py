@@ -0,0 +1,244 @@
+"""
+请求性能分析
+按比例抽样请求并在时间窗口内汇总分析结果，支持 cProfile 和线程栈采样两种方式
+
+未开启时中间件只检查一个属性，不产生额外开销；cProfile/pstats 在第一次分析请求时才导入
+"""
+import os
+import sys
+import time
+import random
+import marshal
+import threading
+import logging
+from io import StringIO
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODE_CPROFILE = "cprofile"
+MODE_SAMPLER = "sampler"
+
+
+class RequestProfiler:
+    """
+    请求性能分析器
+
+    cprofile 模式下同一时刻只分析一个请求（cProfile 按线程记录，事件循环上交替执行的其他协程也会计入）；
+    sampler 模式在有被抽样请求处理中时，定期采集所有线程的调用栈，输出折叠栈格式，可直接生成火焰图
+    """
+
+    def __init__(self, sample_interval: float = 0.005, max_stack_depth: int = 64):
+        """
+        Args:
+            sample_interval: sampler 模式的采样间隔（秒）
+            max_stack_depth: sampler 模式记录的最大栈深度
+        """
+        self.sample_interval = sample_interval
+        self.max_stack_depth = max_stack_depth
+        # 中间件只读取该属性判断是否需要分析
+        self.active = False
+        self.mode = MODE_CPROFILE
+        self.sample_rate = 0.0
+        self.started_at: Optional[float] = None
+        self.deadline = 0.0
+        self.profiled_requests = 0
+        self.samples = 0
+
+        self._lock = threading.Lock()
+        self._stats: Optional["pstats.Stats"] = None
+        self._stacks: Dict[str, int] = {}
+        self._busy = False
+        self._in_flight = 0
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self, mode: str = MODE_CPROFILE, sample_rate: float = 0.1, duration: float = 60):
+        """
+        开始新的分析窗口，之前的结果会被清空
+
+        Args:
+            mode: cprofile 或 sampler
+            sample_rate: 被分析请求的比例（0-1）
+            duration: 窗口时长（秒），到期后自动停止
+        """
+        if mode not in (MODE_CPROFILE, MODE_SAMPLER):
+            raise ValueError(f"不支持的分析模式: {mode}")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate 必须在0和1之间")
+
+        self.stop()
+        with self._lock:
+            self.mode = mode
+            self.sample_rate = sample_rate
+            self.started_at = time.time()
+            self.deadline = time.monotonic() + duration
+            self.profiled_requests = 0
+            self.samples = 0
+            self._stats = None
+            self._stacks = {}
+            self._busy = False
+            self._in_flight = 0
+            self.active = True
+
+        if mode == MODE_SAMPLER:
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+        logger.info(f"Profiling started: mode={mode} sample_rate={sample_rate} duration={duration}s")
+
+    def stop(self):
+        """停止分析，保留已收集的结果"""
+        if not self.active:
+            return
+        self.active = False
+        sampler, self._sampler = self._sampler, None
+        if sampler is not None and sampler is not threading.current_thread():
+            sampler.join()
+        logger.info(f"Profiling stopped: {self.profiled_requests} requests profiled")
+
+    def begin(self) -> Optional[Any]:
+        """
+        按抽样比例决定是否分析当前请求
+
+        Returns:
+            Optional[Any]: 需要分析时返回传给 end() 的句柄，否则为None
+        """
+        if time.monotonic() >= self.deadline:
+            self.stop()
+            return None
+        if random.random() >= self.sample_rate:
+            return None
+
+        with self._lock:
+            if not self.active:
+                return None
+            if self.mode == MODE_SAMPLER:
+                self._in_flight += 1
+                self.profiled_requests += 1
+                return MODE_SAMPLER
+            if self._busy:
+                return None
+            self._busy = True
+            self.profiled_requests += 1
+
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 已有其他分析工具在运行
+            with self._lock:
+                self._busy = False
+            return None
+        return profile
+
+    def end(self, handle: Any):
+        """结束对当前请求的分析并汇总结果"""
+        if handle == MODE_SAMPLER:
+            with self._lock:
+                self._in_flight -= 1
+            return
+
+        handle.disable()
+        import pstats
+        with self._lock:
+            self._busy = False
+            if self._stats is None:
+                self._stats = pstats.Stats(handle)
+            else:
+                self._stats.add(handle)
+
+    def _sample_loop(self):
+        """sampler 模式的采样线程"""
+        own_ident = threading.get_ident()
+        while self.active:
+            time.sleep(self.sample_interval)
+            if time.monotonic() >= self.deadline:
+                self.stop()
+                break
+            if not self._in_flight:
+                continue
+
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            collected = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                collected.append(self._collapse(names.get(ident, str(ident)), frame))
+
+            with self._lock:
+                self.samples += 1
+                for stack in collected:
+                    self._stacks[stack] = self._stacks.get(stack, 0) + 1
+
+    def _collapse(self, thread_name: str, frame) -> str:
+        """将调用栈转换为 线程;外层函数;...;内层函数 格式"""
+        frames = []
+        while frame is not None and len(frames) < self.max_stack_depth:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames))
+
+    def status(self) -> Dict[str, Any]:
+        """
+        获取分析状态
+
+        Returns:
+            Dict[str, Any]: 当前模式、抽样比例、剩余时间和已收集的数据量
+        """
+        if self.active and time.monotonic() >= self.deadline:
+            self.stop()
+        return {
+            "active": self.active,
+            "mode": self.mode,
+            "sample_rate": self.sample_rate,
+            "started_at": self.started_at,
+            "remaining_seconds": round(max(0.0, self.deadline - time.monotonic()), 1) if self.active else 0,
+            "profiled_requests": self.profiled_requests,
+            "samples": self.samples,
+            "unique_stacks": len(self._stacks),
+        }
+
+    def export(self, fmt: str) -> Tuple[bytes, str, str]:
+        """
+        导出分析结果
+
+        Args:
+            fmt: pstats（可用 pstats/snakeviz 打开）、text（按累计耗时排序的文本）或 collapsed（折叠栈）
+
+        Returns:
+            Tuple[bytes, str, str]: (内容, 文件名, 媒体类型)
+
+        Raises:
+            ValueError: 格式不支持或没有对应模式的数据
+        """
+        with self._lock:
+            stats = self._stats
+            stacks = dict(self._stacks)
+
+        if fmt == "collapsed":
+            if not stacks:
+                raise ValueError("没有栈采样数据，请使用 sampler 模式")
+            lines = [f"{stack} {count}" for stack, count in sorted(stacks.items())]
+            return ("\n".join(lines) + "\n").encode("utf-8"), "profile.collapsed", "text/plain; charset=utf-8"
+
+        if fmt not in ("pstats", "text"):
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        if stats is None:
+            raise ValueError("没有 cProfile 数据，请使用 cprofile 模式")
+
+        if fmt == "pstats":
+            return marshal.dumps(stats.stats), "profile.pstats", "application/octet-stream"
+
+        output = StringIO()
+        with self._lock:
+            stats.stream = output
+            stats.sort_stats("cumulative").print_stats(50)
+        return output.getvalue().encode("utf-8"), "profile.txt", "text/plain; charset=utf-8"
+
+
+# 全局实例
+request_profiler = RequestProfiler(
+    sample_interval=float(os.getenv("PROFILING_SAMPLE_INTERVAL", "0.005"))
+)
@@ -0,0 +1,337 @@
+"""
+速率限制计数存储
+提供进程内存、共享内存（mmap）和SQLite文件三种后端，后两者可在多个worker/进程间共享计数
+"""
+import os
+import mmap
+import struct
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitStorageBusy(Exception):
+    """共享存储的锁正被其他worker/线程持有"""
+
+
+class RateLimitStorage:
+    """
+    速率限制计数存储基类
+
+    每个客户端保存 (窗口序号, 当前窗口请求数, 上一窗口请求数)，
+    估算请求数 = 上一窗口请求数 * weight + 当前窗口请求数
+    """
+
+    def hit(self, client: str, window: int, weight: float, limit: int) -> bool:
+        """
+        原子地检查并记录一次请求
+
+        Args:
+            client: 客户端标识（IP地址）
+            window: 当前窗口序号
+            weight: 上一窗口计数的权重
+            limit: 最大请求数
+
+        Returns:
+            bool: 未超出限制并已记录时返回True
+
+        Raises:
+            RateLimitStorageBusy: 共享存储的锁正被占用（调用方运行在事件循环中，不等待锁）
+        """
+        raise NotImplementedError
+
+    def get(self, client: str, window: int) -> Tuple[int, int]:
+        """
+        读取客户端在当前窗口和上一窗口的请求数
+
+        Returns:
+            Tuple[int, int]: (当前窗口请求数, 上一窗口请求数)
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _roll(stored_window: int, current: int, previous: int, window: int) -> Tuple[int, int]:
+        """将计数推进到当前窗口"""
+        if stored_window == window:
+            return current, previous
+        if stored_window == window - 1:
+            return 0, current
+        return 0, 0
+
+
+class MemoryRateLimitStorage(RateLimitStorage):
+    """进程内存存储，只在单个worker内有效"""
+
+    def __init__(self, max_clients: int = 100000):
+        """
+        Args:
+            max_clients: 最多跟踪的客户端数量，超出时淘汰最久未访问的客户端
+        """
+        self.max_clients = max_clients
+        # {ip: [窗口序号, 当前窗口请求数, 上一窗口请求数]}，按最近访问顺序排列
+        self.clients: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict_idle(self, window: int):
+        """淘汰两个窗口内没有请求的客户端（需持有锁）"""
+        clients = self.clients
+        while clients:
+            client, state = next(iter(clients.items()))
+            if state[0] >= window - 1:
+                break
+            del clients[client]
+
+    def hit(self, client: str, window: int, weight: float, limit: int) -> bool:
+        with self._lock:
+            state = self.clients.get(client)
+            if state is None:
+                state = [window, 0, 0]
+                self.clients[client] = state
+                if len(self.clients) > self.max_clients:
+                    self.clients.popitem(last=False)
+            else:
+                state[1], state[2] = self._roll(state[0], state[1], state[2], window)
+                state[0] = window
+                self.clients.move_to_end(client)
+
+            # 最久未访问的客户端位于开头，顺带清理空闲客户端
+            self._evict_idle(window)
+
+            if state[2] * weight + state[1] >= limit:
+                return False
+            state[1] += 1
+            return True
+
+    def get(self, client: str, window: int) -> Tuple[int, int]:
+        with self._lock:
+            state = self.clients.get(client)
+            if state is None:
+                return 0, 0
+            return self._roll(state[0], state[1], state[2], window)
+
+
+class SharedMemoryRateLimitStorage(RateLimitStorage):
+    """
+    共享内存存储，同一主机上的多个worker通过mmap文件共享计数
+
+    文件是固定大小的开放寻址哈希表，过期的槽位在插入时直接复用
+    """
+
+    SLOT = struct.Struct("<QqII")  # 客户端哈希, 窗口序号, 当前窗口请求数, 上一窗口请求数
+    MAX_PROBES = 16
+
+    def __init__(self, path: str, slots: int = 65536):
+        """
+        Args:
+            path: 共享文件路径（所有worker使用同一路径）
+            slots: 哈希表槽位数，每个槽位24字节
+        """
+        try:
+            import fcntl
+        except ImportError:
+            raise RuntimeError("mmap 速率限制后端需要支持 fcntl 的操作系统")
+        self._fcntl = fcntl
+
+        self.path = path
+        self.slots = slots
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def _hash(self, client: str) -> int:
+        """计算客户端哈希（0表示空槽位）"""
+        digest = hashlib.blake2b(client.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    def _find(self, key_hash: int, window: int) -> Tuple[int, bool]:
+        """
+        查找客户端所在槽位（需持有锁）
+
+        Returns:
+            Tuple[int, bool]: (槽位偏移, 是否已存在)
+        """
+        slot_size = self.SLOT.size
+        start = key_hash % self.slots
+        candidate = None
+        oldest = None
+        oldest_window = None
+        for i in range(self.MAX_PROBES):
+            offset = ((start + i) % self.slots) * slot_size
+            stored_hash, stored_window, _, _ = self.SLOT.unpack_from(self._map, offset)
+            if stored_hash == key_hash:
+                return offset, True
+            if stored_hash == 0:
+                return (candidate if candidate is not None else offset), False
+            if candidate is None and stored_window < window - 1:
+                candidate = offset
+            if oldest_window is None or stored_window < oldest_window:
+                oldest, oldest_window = offset, stored_window
+        # 探测范围内没有空槽位时，覆盖最久未使用的槽位
+        return (candidate if candidate is not None else oldest), False
+
+    @contextmanager
+    def _locked(self):
+        """
+        同时持有线程锁和跨进程文件锁
+
+        调用方运行在事件循环中，两把锁都只尝试一次，被占用时立即抛出 RateLimitStorageBusy
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RateLimitStorageBusy(f"速率限制共享文件被占用: {self.path}")
+        try:
+            try:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RateLimitStorageBusy(f"速率限制共享文件被占用: {self.path}")
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+    def hit(self, client: str, window: int, weight: float, limit: int) -> bool:
+        key_hash = self._hash(client)
+        with self._locked():
+            offset, exists = self._find(key_hash, window)
+            current = previous = 0
+            if exists:
+                _, stored_window, current, previous = self.SLOT.unpack_from(self._map, offset)
+                current, previous = self._roll(stored_window, current, previous, window)
+            if previous * weight + current >= limit:
+                if exists:
+                    self.SLOT.pack_into(self._map, offset, key_hash, window, current, previous)
+                return False
+            self.SLOT.pack_into(self._map, offset, key_hash, window, current + 1, previous)
+            return True
+
+    def get(self, client: str, window: int) -> Tuple[int, int]:
+        key_hash = self._hash(client)
+        with self._locked():
+            offset, exists = self._find(key_hash, window)
+            if not exists:
+                return 0, 0
+            _, stored_window, current, previous = self.SLOT.unpack_from(self._map, offset)
+        return self._roll(stored_window, current, previous, window)
+
+    def close(self):
+        """关闭共享文件"""
+        self._map.close()
+        os.close(self._fd)
+
+
+class SQLiteRateLimitStorage(RateLimitStorage):
+    """SQLite文件存储，可在多个进程间共享计数"""
+
+    def __init__(self, path: str, purge_every: int = 1000):
+        """
+        Args:
+            path: SQLite数据库文件路径
+            purge_every: 每记录多少次请求批量清理一次过期计数
+        """
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._hits = 0
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                client TEXT PRIMARY KEY,
+                window_index INTEGER NOT NULL,
+                current_count INTEGER NOT NULL,
+                previous_count INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limits_window ON rate_limits(window_index)")
+
+    def _connection(self) -> "sqlite3.Connection":
+        """获取当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import sqlite3
+            # timeout=0：写锁被占用时立即失败，不在事件循环中等待
+            conn = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, client: str, window: int, weight: float, limit: int) -> bool:
+        import sqlite3
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            # 写锁被其他连接持有
+            raise RateLimitStorageBusy(f"速率限制数据库被占用: {self.path}") from e
+        try:
+            row = conn.execute(
+                "SELECT window_index, current_count, previous_count FROM rate_limits WHERE client = ?",
+                (client,)
+            ).fetchone()
+            current = previous = 0
+            if row:
+                current, previous = self._roll(row[0], row[1], row[2], window)
+            allowed = previous * weight + current < limit
+            if allowed:
+                current += 1
+            conn.execute(
+                """
+                INSERT INTO rate_limits (client, window_index, current_count, previous_count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(client) DO UPDATE SET
+                    window_index = excluded.window_index,
+                    current_count = excluded.current_count,
+                    previous_count = excluded.previous_count
+                """,
+                (client, window, current, previous)
+            )
+
+            # 批量清理两个窗口内没有请求的客户端
+            self._hits += 1
+            if self._hits % self.purge_every == 0:
+                conn.execute("DELETE FROM rate_limits WHERE window_index < ?", (window - 1,))
+
+            conn.execute("COMMIT")
+            return allowed
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, client: str, window: int) -> Tuple[int, int]:
+        row = self._connection().execute(
+            "SELECT window_index, current_count, previous_count FROM rate_limits WHERE client = ?",
+            (client,)
+        ).fetchone()
+        if not row:
+            return 0, 0
+        return self._roll(row[0], row[1], row[2], window)
+
+
+def create_rate_limit_storage(backend: str = "memory", path: str = None, max_clients: int = 100000) -> RateLimitStorage:
+    """
+    按名称创建速率限制存储
+
+    Args:
+        backend: memory、mmap 或 sqlite
+        path: mmap/sqlite 后端使用的文件路径
+        max_clients: 最多跟踪的客户端数量
+
+    Returns:
+        RateLimitStorage: 存储实例
+    """
+    if backend == "memory":
+        return MemoryRateLimitStorage(max_clients=max_clients)
+    if backend == "mmap":
+        return SharedMemoryRateLimitStorage(path or "rate_limit.mmap", slots=max_clients)
+    if backend == "sqlite":
+        return SQLiteRateLimitStorage(path or "rate_limit.db")
+    raise ValueError(f"未知的速率限制存储后端: {backend}")
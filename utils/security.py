@@ -3,6 +3,7 @@
 """
 import hashlib
 import hmac
+import math
 import time
 import secrets
 import os
@@ -10,8 +11,18 @@ from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 import logging
 
+from utils.rate_limit_storage import (
+    RateLimitStorage, RateLimitStorageBusy, MemoryRateLimitStorage, create_rate_limit_storage
+)
+from utils.metrics import rate_limit_rejections_total, rate_limit_storage_busy_total
+from utils.key_format import is_valid_license_key
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_SECRET_KEY = "default-secret-key"
+# 默认值和文档中的示例值都是公开的，不能用于签名
+INSECURE_SECRET_KEYS = frozenset({"", DEFAULT_SECRET_KEY, "your-secret-key", "your-secret-key-here"})
+
 
 class SecurityManager:
     """安全管理器"""
@@ -24,6 +35,7 @@ class SecurityManager:
             secret_key: 密钥
         """
         self.secret_key = secret_key.encode('utf-8')
+        self.insecure_key = secret_key in INSECURE_SECRET_KEYS
     
     def generate_hmac(self, data: str) -> str:
         """
@@ -53,7 +65,7 @@ class SecurityManager:
             bool: 签名是否有效
         """
         expected_signature = self.generate_hmac(data)
-        return hmac.compare_digest(expected_signature, signature)
+        return hmac.compare_digest(expected_signature.encode('ascii'), signature.encode('utf-8'))
     
     def generate_api_key(self) -> str:
         """
@@ -108,19 +120,36 @@ class SecurityManager:
 
 
 class RateLimiter:
-    """速率限制器"""
+    """
+    速率限制器
+    
+    使用滑动窗口计数算法：每个IP只保存当前窗口和上一个窗口的请求数，
+    按上一个窗口在滑动窗口中的剩余比例估算请求数，单次检查为O(1)
+    """
     
-    def __init__(self, max_requests: int = 100, window_seconds: int = 3600):
+    def __init__(self, max_requests: int = 100, window_seconds: int = 3600,
+                 max_clients: int = 100000, storage: Optional[RateLimitStorage] = None,
+                 fail_open: bool = True):
         """
         初始化速率限制器
         
         Args:
             max_requests: 最大请求数
             window_seconds: 时间窗口（秒）
+            max_clients: 最多跟踪的IP数量，超出时淘汰最久未访问的IP
+            storage: 计数存储，默认为进程内存存储
+            fail_open: 共享存储的锁被占用时是否放行请求（False 时按超限拒绝）
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = {}  # {ip: [timestamp1, timestamp2, ...]}
+        self.storage = storage or MemoryRateLimitStorage(max_clients=max_clients)
+        self.fail_open = fail_open
+    
+    def _window(self, now: float):
+        """计算当前窗口序号和上一窗口计数的权重"""
+        window = int(now // self.window_seconds)
+        elapsed = now - window * self.window_seconds
+        return window, 1.0 - elapsed / self.window_seconds
     
     def is_allowed(self, ip: str) -> bool:
         """
@@ -132,25 +161,18 @@ class RateLimiter:
         Returns:
             bool: 是否允许
         """
-        now = time.time()
-        window_start = now - self.window_seconds
-        
-        # 清理过期的请求记录
-        if ip in self.requests:
-            self.requests[ip] = [
-                timestamp for timestamp in self.requests[ip]
-                if timestamp > window_start
-            ]
-        else:
-            self.requests[ip] = []
-        
-        # 检查请求数量
-        if len(self.requests[ip]) >= self.max_requests:
-            return False
-        
-        # 记录当前请求
-        self.requests[ip].append(now)
-        return True
+        window, weight = self._window(time.time())
+        try:
+            allowed = self.storage.hit(ip, window, weight, self.max_requests)
+        except RateLimitStorageBusy as e:
+            # 在事件循环中不等待锁，按配置的策略立即放行或拒绝
+            rate_limit_storage_busy_total.inc("allowed" if self.fail_open else "rejected")
+            logger.warning("%s，按%s策略处理", e, "放行" if self.fail_open else "拒绝",
+                           extra={"event": "rate_limit.storage_busy"})
+            allowed = self.fail_open
+        if not allowed:
+            rate_limit_rejections_total.inc()
+        return allowed
     
     def get_remaining_requests(self, ip: str) -> int:
         """
@@ -162,17 +184,12 @@ class RateLimiter:
         Returns:
             int: 剩余请求数
         """
-        now = time.time()
-        window_start = now - self.window_seconds
-        
-        if ip in self.requests:
-            valid_requests = [
-                timestamp for timestamp in self.requests[ip]
-                if timestamp > window_start
-            ]
-            return max(0, self.max_requests - len(valid_requests))
-        
-        return self.max_requests
+        window, weight = self._window(time.time())
+        try:
+            current, previous = self.storage.get(ip, window)
+        except RateLimitStorageBusy:
+            return self.max_requests if self.fail_open else 0
+        return max(0, self.max_requests - math.ceil(previous * weight + current))
 
 
 class InputSanitizer:
@@ -210,7 +227,7 @@ class InputSanitizer:
     @staticmethod
     def validate_license_key_format(license_key: str) -> bool:
         """
-        验证授权码格式
+        验证授权码格式（见 utils/key_format.py）
         
         Args:
             license_key: 授权码
@@ -218,29 +235,35 @@ class InputSanitizer:
         Returns:
             bool: 格式是否正确
         """
-        if not license_key or not isinstance(license_key, str):
-            return False
-        
-        # 检查长度
-        if len(license_key) != 19:  # XXXX-XXXX-XXXX-XXXX
-            return False
-        
-        # 检查格式
-        parts = license_key.split('-')
-        if len(parts) != 4:
-            return False
-        
-        for part in parts:
-            if len(part) != 4:
-                return False
-            # 检查是否只包含允许的字符
-            if not all(c in "ABCDEFGHJKLMNPQRSTUVWXYZ23456789" for c in part):
-                return False
+        return is_valid_license_key(license_key)
+
+
+def verify_admin_token(token: Optional[str]) -> bool:
+    """
+    校验管理接口令牌
+    
+    Args:
+        token: 请求携带的令牌
         
-        return True
+    Returns:
+        bool: 是否有效；未配置 ADMIN_TOKEN 时管理接口不可用，始终返回False
+    """
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), admin_token.encode('utf-8'))
 
 
 # 全局实例
-security_manager = SecurityManager(os.getenv("SECRET_KEY", "default-secret-key"))
-rate_limiter = RateLimiter(max_requests=100, window_seconds=3600)
+security_manager = SecurityManager(os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY))
+rate_limiter = RateLimiter(
+    max_requests=100,
+    window_seconds=3600,
+    storage=create_rate_limit_storage(
+        os.getenv("RATE_LIMIT_BACKEND", "memory"),
+        path=os.getenv("RATE_LIMIT_STORAGE_PATH"),
+        max_clients=int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+    ),
+    fail_open=os.getenv("RATE_LIMIT_FAIL_OPEN", "True").lower() == "true"
+)
 input_sanitizer = InputSanitizer()
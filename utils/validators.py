@@ -1,14 +1,14 @@
 """
 验证工具
 """
-import re
 from typing import Optional
-from email_validator import validate_email, EmailNotValidError
+
+from utils.key_format import is_valid_license_key
 
 
 def validate_license_key_format(license_key: str) -> bool:
     """
-    验证授权码格式
+    验证授权码格式（见 utils/key_format.py）
     
     Args:
         license_key: 授权码
@@ -16,12 +16,7 @@ def validate_license_key_format(license_key: str) -> bool:
     Returns:
         bool: 是否有效
     """
-    if not license_key or not isinstance(license_key, str):
-        return False
-    
-    # 格式: XXXX-XXXX-XXXX-XXXX
-    pattern = r'^[A-Z0-9]{4}-[A-Z0-9]{4}-[A-Z0-9]{4}-[A-Z0-9]{4}$'
-    return bool(re.match(pattern, license_key))
+    return is_valid_license_key(license_key)
 
 
 def validate_email_format(email: str) -> bool:
@@ -37,6 +32,8 @@ def validate_email_format(email: str) -> bool:
     if not email or not isinstance(email, str):
         return False
     
+    # email_validator 导入较慢，只在需要时加载
+    from email_validator import validate_email, EmailNotValidError
     try:
         validate_email(email)
         return True
@@ -0,0 +1,134 @@
+"""
+验证结果的快速序列化
+授权码不存在、格式无效、已禁用、已过期的结果内容固定，启动时编码一次；
+有效授权的结果由 ValidLicenseResult 直接按数据库中的值编码，不解析到期时间、不构造 pydantic 模型。
+跳过 FastAPI 按 response_model 重新校验和 jsonable_encoder 的开销，输出与 FastAPI 默认的 JSONResponse 一致
+"""
+import os
+import json
+from typing import Dict, Iterable, Optional, Union
+
+from fastapi.responses import Response
+
+from database.models import LicenseVerifyResponse, LicenseStatus
+
+# 是否启用快速序列化，关闭时由 FastAPI 按 response_model 序列化
+VERIFY_FAST_RESPONSE = os.getenv("VERIFY_FAST_RESPONSE", "True").lower() == "true"
+
+# 内容固定的验证结果（共享实例，不能修改，需要附加字段时使用 model_copy）
+INVALID_FORMAT_RESPONSE = LicenseVerifyResponse(status=LicenseStatus.NOT_FOUND, message="授权码格式无效")
+NOT_FOUND_RESPONSE = LicenseVerifyResponse(status=LicenseStatus.NOT_FOUND, message="授权码不存在")
+DISABLED_RESPONSE = LicenseVerifyResponse(status=LicenseStatus.DISABLED, message="授权码已被禁用")
+EXPIRED_RESPONSE = LicenseVerifyResponse(status=LicenseStatus.EXPIRED, message="授权码已过期")
+
+_CONSTANT_BODIES: Dict[int, bytes] = {
+    id(response): response.model_dump_json().encode("utf-8")
+    for response in (INVALID_FORMAT_RESPONSE, NOT_FOUND_RESPONSE, DISABLED_RESPONSE, EXPIRED_RESPONSE)
+}
+
+VALID_MESSAGE = "授权码验证成功"
+
+# 与 json.dumps(ensure_ascii=False) 相同的字符串编码（C实现），非ASCII字符原样输出，与 pydantic 一致
+_encode_str = json.encoder.encode_basestring
+_VALID_MESSAGE_JSON = _encode_str(VALID_MESSAGE)
+
+
+def _json_str(value: Optional[str]) -> str:
+    """编码可为空的字符串字段"""
+    return "null" if value is None else _encode_str(value)
+
+
+class ValidLicenseResult:
+    """
+    有效授权的验证结果
+
+    保存数据库返回的到期时间文本和 end_ts，构造时编码一次JSON；
+    只有关闭快速序列化时才通过 to_model() 转换为 LicenseVerifyResponse
+    """
+
+    __slots__ = ("plan_type", "end_date", "end_ts", "user_email", "token", "body")
+    status = LicenseStatus.VALID
+    message = VALID_MESSAGE
+
+    def __init__(self, plan_type: str, end_date: Optional[str], end_ts: Optional[int],
+                 user_email: Optional[str], token: Optional[str] = None):
+        """
+        Args:
+            plan_type: 授权类型
+            end_date: ISO格式的到期时间（与 LicenseVerifyResponse 序列化结果一致），永久授权为空
+            end_ts: 到期时间epoch秒，永久授权为空
+            user_email: 用户邮箱
+            token: 离线验证令牌
+        """
+        self.plan_type = plan_type
+        self.end_date = end_date
+        self.end_ts = end_ts
+        self.user_email = user_email
+        self.token = token
+        # 字段顺序与 LicenseVerifyResponse 一致，只有字符串字段需要编码
+        self.body = (
+            f'{{"status":"valid","plan_type":{_json_str(plan_type)},"end_date":{_json_str(end_date)},'
+            f'"user_email":{_json_str(user_email)},"message":{_VALID_MESSAGE_JSON},"token":{_json_str(token)}}}'
+        ).encode("utf-8")
+
+    def with_token(self, token: str) -> "ValidLicenseResult":
+        """返回附加令牌的副本（不修改缓存中的结果）"""
+        return ValidLicenseResult(self.plan_type, self.end_date, self.end_ts, self.user_email, token)
+
+    def to_model(self) -> LicenseVerifyResponse:
+        """转换为响应模型，供 FastAPI 按 response_model 序列化"""
+        return LicenseVerifyResponse(
+            status=LicenseStatus.VALID,
+            plan_type=self.plan_type,
+            end_date=self.end_date,
+            user_email=self.user_email,
+            message=VALID_MESSAGE,
+            token=self.token
+        )
+
+
+VerifyResult = Union[LicenseVerifyResponse, ValidLicenseResult]
+
+
+def encode_verify_response(response: VerifyResult) -> bytes:
+    """
+    编码单个验证结果
+
+    Args:
+        response: 验证结果（字段已在构造时校验）
+
+    Returns:
+        bytes: UTF-8 JSON
+    """
+    if type(response) is ValidLicenseResult:
+        return response.body
+    body = _CONSTANT_BODIES.get(id(response))
+    if body is not None:
+        return body
+    # 由 pydantic-core 直接序列化，不再重新校验
+    return response.model_dump_json().encode("utf-8")
+
+
+def to_verify_model(response: VerifyResult) -> LicenseVerifyResponse:
+    """转换为响应模型（关闭快速序列化时使用）"""
+    if type(response) is ValidLicenseResult:
+        return response.to_model()
+    return response
+
+
+def encode_batch_verify_response(responses: Iterable[VerifyResult]) -> bytes:
+    """
+    编码批量验证结果，格式与 LicenseBatchVerifyResponse 相同
+
+    Args:
+        responses: 按请求顺序排列的验证结果
+
+    Returns:
+        bytes: UTF-8 JSON
+    """
+    return b'{"results":[' + b",".join(map(encode_verify_response, responses)) + b"]}"
+
+
+class PreEncodedJSONResponse(Response):
+    """内容已编码为JSON字节的响应"""
+    media_type = "application/json"